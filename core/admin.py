@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, CompanyMembership, CompanyInvitation, Company
+from .models import CustomUser, CompanyMembership, CompanyInvitation, Company, SearchSynonym
 
 
 @admin.register(CustomUser)
@@ -39,3 +39,14 @@ class CompanyInvitationAdmin(admin.ModelAdmin):
     list_filter = ['status', 'role']
     search_fields = ['email', 'company__name']
     readonly_fields = ['token', 'created_at']
+
+
+@admin.register(SearchSynonym)
+class SearchSynonymAdmin(admin.ModelAdmin):
+    list_display = ['term', 'expansions', 'company', 'updated_at']
+    list_filter = ['company']
+    search_fields = ['term', 'expansions']
+
+    def get_queryset(self, request):
+        # Sinónimos globales (sin empresa) y de todas las empresas
+        return SearchSynonym._base_manager.all()
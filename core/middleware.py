@@ -1,4 +1,5 @@
 import threading
+from contextlib import contextmanager
 
 _thread_locals = threading.local()
 
@@ -8,6 +9,20 @@ def get_current_company():
     """
     return getattr(_thread_locals, 'company', None)
 
+@contextmanager
+def tenant_context(company):
+    """
+    Fija la empresa del hilo fuera de un request (comandos de manage.py,
+    señales disparadas desde el admin) para que los TenantManagers filtren
+    exactamente igual que dentro de una vista. Restaura el tenant previo al salir.
+    """
+    previous = get_current_company()
+    _thread_locals.company = company
+    try:
+        yield company
+    finally:
+        _thread_locals.company = previous
+
 class ThreadLocalTenantMiddleware:
     """
     Middleware Multi-Tenant: Extrae silenciosamente la empresa
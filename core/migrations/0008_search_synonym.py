@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Alias que antes estaban fijos en sat_product_search / sat_unit_search
+DEFAULT_SYNONYMS = {
+    'abarrotes': 'alimentos, comestibles',
+    'software': 'programa, app',
+    'computadora': 'computador, pc, laptop',
+    'flete': 'transporte, envio, logistica',
+    'refresco': 'bebida, soda',
+    'kilo': 'kilogramo, kgm',
+    'kilogramo': 'kilo, kgm',
+    'litro': 'ltr, litros',
+    'litros': 'ltr, litro',
+    'pieza': 'h87, piezas, pza, pz',
+    'piezas': 'h87, pieza, pza, pz',
+    'caja': 'xbx, cajas',
+    'cajas': 'xbx, caja',
+}
+
+
+def seed_synonyms(apps, schema_editor):
+    SearchSynonym = apps.get_model('core', 'SearchSynonym')
+    SearchSynonym.objects.bulk_create([
+        SearchSynonym(company=None, term=term, expansions=expansions)
+        for term, expansions in DEFAULT_SYNONYMS.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_replace_role_permission_with_membership_and_invitation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSynonym',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('term', models.CharField(max_length=100, verbose_name='Término')),
+                ('expansions', models.CharField(help_text='Separados por coma, ej. computador, pc, laptop', max_length=255, verbose_name='Sinónimos')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+            ],
+            options={
+                'verbose_name': 'Sinónimo de Búsqueda',
+                'verbose_name_plural': 'Sinónimos de Búsqueda',
+                'ordering': ['term'],
+                'unique_together': {('company', 'term')},
+            },
+        ),
+        migrations.RunPython(seed_synonyms, migrations.RunPython.noop),
+    ]
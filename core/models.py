@@ -272,3 +272,42 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"[{self.notification_type.upper()}] {self.user.username}: {self.message}"
+
+
+class SearchSynonym(TenantAwareModel):
+    """
+    Search synonym: a query token and the extra tokens it should also match.
+
+    Rows without company apply to every tenant; a tenant's own rows extend
+    (and for the same term, add to) the global ones. See core.synonyms.
+    """
+    term = models.CharField(max_length=100, verbose_name="Término")
+    expansions = models.CharField(
+        max_length=255,
+        verbose_name="Sinónimos",
+        help_text="Separados por coma, ej. computador, pc, laptop",
+    )
+
+    class Meta:
+        verbose_name = "Sinónimo de Búsqueda"
+        verbose_name_plural = "Sinónimos de Búsqueda"
+        ordering = ['term']
+        unique_together = [['company', 'term']]
+
+    def __str__(self):
+        return f"{self.term} → {self.expansions}"
+
+
+class SearchCacheGeneration(models.Model):
+    """
+    Current generation token of a search cache scope (a company id, or 'global').
+
+    Lives in the database so every worker and manage.py process sees the same
+    token; changing it orphans the cached pages of that scope. See core.search_cache.
+    """
+    scope = models.CharField(max_length=64, unique=True)
+    token = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.scope}: {self.token}"
@@ -0,0 +1,121 @@
+"""
+Core Search Cache - Cached search result pages
+KoreBase ERP System
+
+Cada página de resultados se guarda en la caché 'search' bajo una llave de
+empresa + consulta normalizada + orden + cursor. Invalidar no borra llaves:
+las señales cambian el token de generación de la empresa (o el global del
+catálogo SAT) y las llaves viejas dejan de leerse hasta que el LRU/TTL las
+desaloja. Los tokens viven en la base de datos (SearchCacheGeneration), no en
+la caché del worker: un cambio hecho en otro worker o en un manage.py se ve en
+la siguiente búsqueda, a cambio de una consulta por llave primaria única. Se
+cambian al confirmar la transacción, para que ninguna búsqueda concurrente
+guarde filas aún no confirmadas bajo el token nuevo. Los contadores de
+aciertos/fallos van en su propia caché ('search-stats'), donde el culling de
+las páginas no los desaloja; con LocMem son por worker.
+"""
+import functools
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SearchCacheGeneration
+
+
+CACHE_ALIAS = 'search'
+STATS_ALIAS = 'search-stats'
+GLOBAL_SCOPE = 'global'
+INITIAL_TOKEN = '0'
+
+_MISSING = object()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search box value"""
+    return ' '.join((query or '').lower().split())
+
+
+def _generations(tenant):
+    """Current (tenant, global) generation tokens; a scope never invalidated is INITIAL_TOKEN"""
+    found = dict(SearchCacheGeneration.objects.filter(scope__in=[tenant, GLOBAL_SCOPE]).values_list('scope', 'token'))
+    return found.get(tenant, INITIAL_TOKEN), found.get(GLOBAL_SCOPE, INITIAL_TOKEN)
+
+
+def _count(endpoint, outcome):
+    key = f'search:stats:{endpoint}:{outcome}'
+    cache = caches[STATS_ALIAS]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def cached_search(endpoint, company, query, compute, sort='', cursor=''):
+    """
+    Return compute() for this search page, from the cache when possible.
+
+    compute must return something picklable (lists of tuples, dicts or model
+    instances); it is only called on a miss.
+    """
+    tenant = str(getattr(company, 'pk', company) or GLOBAL_SCOPE)
+    tenant_generation, global_generation = _generations(tenant)
+    digest = hashlib.blake2b(
+        '\x1f'.join([normalize_query(query), sort or '', cursor or '']).encode(),
+        digest_size=16,
+    ).hexdigest()
+    key = f'search:{endpoint}:{tenant}:{tenant_generation}:{global_generation}:{digest}'
+
+    cache = _cache()
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(endpoint, 'hits')
+        return value
+
+    _count(endpoint, 'misses')
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+def invalidate(company=None):
+    """Invalidate a tenant's cached searches, or every tenant's when company is None"""
+    scope = str(getattr(company, 'pk', company) or GLOBAL_SCOPE)
+    # Un token nuevo (no un contador): una llave vieja nunca vuelve a ser válida
+    SearchCacheGeneration.objects.bulk_create(
+        [SearchCacheGeneration(scope=scope, token=uuid.uuid4().hex, updated_at=timezone.now())],
+        update_conflicts=True, unique_fields=['scope'], update_fields=['token', 'updated_at'],
+    )
+
+
+def invalidate_on_commit(company=None):
+    """invalidate() once the current transaction commits (immediately outside one)"""
+    transaction.on_commit(functools.partial(invalidate, getattr(company, 'pk', company)))
+
+
+def stats_scope():
+    """'process' when the counters live in this worker's memory, 'shared' otherwise"""
+    return 'process' if isinstance(caches[STATS_ALIAS], LocMemCache) else 'shared'
+
+
+def stats(endpoints):
+    """{endpoint: {'hits': n, 'misses': n, 'hit_rate': r}} from the counters of stats_scope()"""
+    keys = [f'search:stats:{endpoint}:{outcome}' for endpoint in endpoints for outcome in ('hits', 'misses')]
+    found = caches[STATS_ALIAS].get_many(keys)
+    report = {}
+    for endpoint in endpoints:
+        hits = found.get(f'search:stats:{endpoint}:hits', 0)
+        misses = found.get(f'search:stats:{endpoint}:misses', 0)
+        report[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return report
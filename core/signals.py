@@ -0,0 +1,17 @@
+"""
+Core Signals
+KoreBase ERP System
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search_cache, synonyms
+from .models import SearchSynonym
+
+
+@receiver(post_save, sender=SearchSynonym)
+@receiver(post_delete, sender=SearchSynonym)
+def invalidate_synonyms(sender, instance, **kwargs):
+    synonyms.invalidate()
+    # Un sinónimo global cambia los resultados de todas las empresas
+    search_cache.invalidate_on_commit(instance.company_id)
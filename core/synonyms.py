@@ -0,0 +1,112 @@
+"""
+Core Synonyms - Search term expansion shared by every search box
+KoreBase ERP System
+
+La tabla SearchSynonym se compila en un dict token -> expansiones por empresa
+(globales + propias) y se guarda en memoria del worker. Un token se expande con
+todo término que sea prefijo suyo ('kilos' usa 'kilo', 'cajas' usa 'caja'),
+así que expandirlo cuesta una búsqueda en el dict por cada prefijo del token,
+no un recorrido de todos los alias con comparaciones de subcadenas.
+"""
+import re
+import threading
+import time
+import unicodedata
+
+from django.db.models import Count, Max, Q
+
+from .models import SearchSynonym
+
+
+RECHECK_SECONDS = 30
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Lowercase and strip accents ('Electrónica' -> 'electronica')"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+_lock = threading.Lock()
+_maps = {}
+_stamp = None
+_checked_at = 0.0
+
+
+def _table_stamp():
+    """Changes on every insert, edit or delete of a synonym row"""
+    stats = SearchSynonym._base_manager.aggregate(rows=Count('id'), last=Max('updated_at'))
+    return (stats['rows'], stats['last'])
+
+
+def _compile(company_id):
+    # _base_manager: se compilan juntas las filas globales y las de la empresa
+    rows = SearchSynonym._base_manager.filter(Q(company__isnull=True) | Q(company_id=company_id))
+    compiled = {}
+    for term, expansions in rows.values_list('term', 'expansions'):
+        for token in tokenize(term):
+            bucket = compiled.setdefault(token, [])
+            for expansion in tokenize(expansions):
+                if expansion != token and expansion not in bucket:
+                    bucket.append(expansion)
+    return {token: tuple(expansions) for token, expansions in compiled.items() if expansions}
+
+
+def synonym_map(company):
+    """
+    {token: (expansion, ...)} for a tenant (global synonyms plus its own).
+
+    Compiled once per worker and company; the table stamp is re-read at most
+    every RECHECK_SECONDS so edits made from another process are picked up.
+    """
+    global _stamp, _checked_at
+    company_id = getattr(company, 'pk', company)
+    now = time.monotonic()
+    with _lock:
+        if now - _checked_at >= RECHECK_SECONDS:
+            stamp = _table_stamp()
+            if stamp != _stamp:
+                _maps.clear()
+                _stamp = stamp
+            _checked_at = now
+        compiled = _maps.get(company_id)
+    if compiled is None:
+        compiled = _compile(company_id)
+        with _lock:
+            _maps[company_id] = compiled
+    return compiled
+
+
+def token_expansions(mapping, token):
+    """Expansions of every synonym term `token` starts with, longest term first"""
+    found = []
+    for end in range(len(token), 0, -1):
+        for expansion in mapping.get(token[:end], ()):
+            if expansion != token and expansion not in found:
+                found.append(expansion)
+    return found
+
+
+def expand_terms(company, query):
+    """The query followed by the expansions of each of its tokens (prefix match on the folded token)"""
+    mapping = synonym_map(company)
+    terms = [query]
+    for token in tokenize(query):
+        for expansion in token_expansions(mapping, token):
+            if expansion not in terms:
+                terms.append(expansion)
+    return terms
+
+
+def invalidate():
+    """Drop every compiled map of this worker (called on SearchSynonym save/delete)"""
+    global _checked_at
+    with _lock:
+        _maps.clear()
+        _checked_at = 0.0
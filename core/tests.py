@@ -1,3 +1,97 @@
+from django.core.cache import caches
 from django.test import TestCase
 
-# Create your tests here.
+from logistica.sat_index import SatCatalogIndex
+
+from . import search_cache, synonyms
+from .models import Company, SearchCacheGeneration, SearchSynonym
+
+
+class SynonymExpansionTests(TestCase):
+    """Los alias sembrados en 0008 deben seguir expandiendo como los alias fijos que reemplazaron"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Synonym Test')
+
+    def setUp(self):
+        synonyms.invalidate()
+
+    def expand(self, query):
+        return synonyms.expand_terms(self.company, query)
+
+    def test_seeded_aliases_exist(self):
+        terms = set(SearchSynonym._base_manager.filter(company__isnull=True).values_list('term', flat=True))
+        self.assertTrue({'abarrotes', 'computadora', 'kilo', 'litro', 'pieza', 'caja'} <= terms)
+
+    def test_exact_token(self):
+        self.assertEqual(self.expand('kilo'), ['kilo', 'kilogramo', 'kgm'])
+        self.assertEqual(self.expand('computadora'), ['computadora', 'computador', 'pc', 'laptop'])
+
+    def test_partial_words_still_hit_aliases(self):
+        # Los alias fijos comparaban por subcadena: 'kilos' y 'cajas de carton' los encontraban
+        self.assertIn('kgm', self.expand('kilos'))
+        self.assertIn('xbx', self.expand('cajas de carton'))
+        self.assertIn('h87', self.expand('piezas sueltas'))
+        self.assertIn('ltr', self.expand('Litros'))
+
+    def test_accents_are_folded(self):
+        self.assertIn('transporte', self.expand('Flete aéreo'))
+
+    def test_sat_index_uses_prefix_expansion(self):
+        index = SatCatalogIndex([('78101800', 'Servicios de transporte de carga por carretera')])
+        mapping = synonyms.synonym_map(self.company)
+        self.assertEqual([match.code for match in index.search('flete', synonyms=mapping)], ['78101800'])
+        self.assertEqual([match.code for match in index.search('fletes', synonyms=mapping)], ['78101800'])
+
+    def test_tenant_synonyms_extend_global(self):
+        SearchSynonym.objects.create(company=self.company, term='caja', expansions='empaque')
+        synonyms.invalidate()
+        self.assertIn('empaque', self.expand('cajas'))
+        other = Company.objects.create(name='Other')
+        self.assertNotIn('empaque', synonyms.expand_terms(other, 'cajas'))
+
+
+class SearchCacheTests(TestCase):
+    """Los tokens de generación son compartidos (BD) y solo cambian al confirmar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Cache Test')
+
+    def setUp(self):
+        search_cache._cache().clear()
+        caches[search_cache.STATS_ALIAS].clear()
+
+    def search(self, value):
+        return search_cache.cached_search('test', self.company, 'tornillo', lambda: value)
+
+    def test_invalidation_reaches_other_workers(self):
+        self.assertEqual(self.search('old'), 'old')
+        self.assertEqual(self.search('new'), 'old')
+        # Otro proceso solo comparte la base de datos: su invalidación cambia el token de la BD
+        SearchCacheGeneration.objects.create(scope=str(self.company.pk), token='other-worker')
+        self.assertEqual(self.search('new'), 'new')
+
+    def test_invalidation_waits_for_commit(self):
+        self.search('old')
+        with self.captureOnCommitCallbacks() as callbacks:
+            search_cache.invalidate_on_commit(self.company)
+            self.assertEqual(self.search('pending'), 'old')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.search('committed'), 'committed')
+
+    def test_global_scope(self):
+        self.search('old')
+        search_cache.invalidate()
+        self.assertEqual(self.search('new'), 'new')
+
+    def test_counters_survive_page_eviction(self):
+        self.search('old')
+        self.search('old')
+        # Simula el culling de MAX_ENTRIES: se van las páginas, no los contadores
+        search_cache._cache().clear()
+        self.search('old')
+        self.assertEqual(search_cache.stats(['test'])['test'], {'hits': 1, 'misses': 2, 'hit_rate': 0.3333})
+        self.assertEqual(search_cache.stats_scope(), 'process')
@@ -17,6 +17,7 @@ urlpatterns = [
     path('auth/google/', views.google_login_view, name='google_login'),
     path('auth/google/callback/', views.google_callback_view, name='google_callback'),
     path('search/', views.global_search_view, name='global_search'),
+    path('search/cache-stats/', views.search_cache_stats_view, name='search_cache_stats'),
     path('settings/', views.settings_view, name='settings'),
     path('invite/', views.invite_member_view, name='invite_member'),
     path('join/<uuid:token>/', views.join_company_view, name='join_company'),
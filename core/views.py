@@ -188,24 +188,25 @@ def logout_view(request):
     return redirect('core:login')
 
 
+FLOW_CHART_DAYS = 30
+
+
 @login_required
 def dashboard_view(request):
     """Main dashboard view with REAL data"""
     company = request.user.company
-    from logistica.models import Stock
+    from logistica import rollups, valuation
     from produccion.models import WorkOrder
-    from django.db.models import Sum, F
-    from decimal import Decimal
-    
-    # Logistica KPIs
-    raw_val = Stock.objects.filter(company=company, product__category='Materia Prima').annotate(
-        value=F('quantity') * F('product__unit_cost')
-    ).aggregate(t=Sum('value'))['t'] or Decimal('0.00')
-    
-    fin_val = Stock.objects.filter(company=company, product__category='Producto Terminado').annotate(
-        value=F('quantity') * F('product__unit_cost')
-    ).aggregate(t=Sum('value'))['t'] or Decimal('0.00')
+
+    # Logistica KPIs (resumen incremental, no agrega toda la tabla de Stock)
+    raw_val = valuation.total_value(company, category='Materia Prima')
+    fin_val = valuation.total_value(company, category='Producto Terminado')
+    other_val = valuation.total_value(company) - raw_val - fin_val
     
+    # Flujo de inventario de los últimos 30 días (una fila por día desde el resumen diario)
+    today = timezone.localdate()
+    flow = rollups.daily_totals(company, today - timedelta(days=FLOW_CHART_DAYS - 1), today)
+
     # Produccion KPIs
     active_orders = WorkOrder.objects.filter(company=company, status__in=['pending', 'in_progress']).count()
     
@@ -214,7 +215,12 @@ def dashboard_view(request):
         'active_orders': active_orders,
         'raw_material_val': float(raw_val),
         'finished_goods_val': float(fin_val),
-        'other_stock_val': 0.0,
+        'other_stock_val': float(other_val),
+        'flow_chart': {
+            'labels': [day['day'].strftime('%d/%m') for day in flow],
+            'value_in': [float(day['value_in']) for day in flow],
+            'value_out': [float(day['value_out']) for day in flow],
+        },
     }
     return render(request, 'core/dashboard.html', context)
 
@@ -496,6 +502,7 @@ def google_callback_view(request):
         return redirect('core:login')
 
 from django.db.models import Q
+from . import search_cache, synonyms
 from logistica.models import Product, Warehouse, Supplier
 from produccion.models import WorkOrder, BillOfMaterial
 from financiero.models import Invoice
@@ -507,20 +514,32 @@ def global_search_view(request):
     if not query or len(query) < 2:
         return render(request, 'core/search_results.html', {'results': []})
     
-    results = []
-    
-    # Busca Productos
-    for p in Product.objects.filter(Q(sku__icontains=query) | Q(name__icontains=query))[:3]:
-        results.append({'url': f"/logistica/inventory/", 'title': f"{p.sku} - {p.name}", 'type': 'Producto', 'icon': 'fa-box'})
-        
-    # Busca Almacenes
-    for w in Warehouse.objects.filter(Q(code__icontains=query) | Q(name__icontains=query))[:3]:
-        results.append({'url': f"/logistica/warehouses/", 'title': f"{w.code} - {w.name}", 'type': 'Almacén', 'icon': 'fa-warehouse'})
-        
-    # Busca Proveedores
-    for s in Supplier.objects.filter(Q(code__icontains=query) | Q(name__icontains=query))[:3]:
-        results.append({'url': f"/logistica/suppliers/", 'title': f"{s.code} - {s.name}", 'type': 'Proveedor', 'icon': 'fa-truck'})
+    query = search_cache.normalize_query(query)
+
+    def compute():
+        # Productos, almacenes y proveedores se cachean (se invalidan por señales de esos modelos)
+        results = []
+
+        # Los nombres también se buscan por sinónimos ("laptop" encuentra "Computadora ...")
+        name_q = Q()
+        for term in synonyms.expand_terms(request.user.company, query):
+            name_q |= Q(name__icontains=term)
         
+        # Busca Productos
+        for p in Product.objects.filter(Q(sku__icontains=query) | name_q)[:3]:
+            results.append({'url': f"/logistica/inventory/", 'title': f"{p.sku} - {p.name}", 'type': 'Producto', 'icon': 'fa-box'})
+            
+        # Busca Almacenes
+        for w in Warehouse.objects.filter(Q(code__icontains=query) | name_q)[:3]:
+            results.append({'url': f"/logistica/warehouses/", 'title': f"{w.code} - {w.name}", 'type': 'Almacén', 'icon': 'fa-warehouse'})
+            
+        # Busca Proveedores
+        for s in Supplier.objects.filter(Q(code__icontains=query) | name_q)[:3]:
+            results.append({'url': f"/logistica/suppliers/", 'title': f"{s.code} - {s.name}", 'type': 'Proveedor', 'icon': 'fa-truck'})
+        return results
+
+    results = list(search_cache.cached_search('global_search', request.user.company, query, compute))
+
     # Busca Ordenes de Trabajo
     for o in WorkOrder.objects.filter(work_order_number__icontains=query)[:3]:
         results.append({'url': f"/produccion/workorder/{o.pk}/", 'title': f"OT: {o.work_order_number}", 'type': 'Orden de Trabajo', 'icon': 'fa-clipboard-list'})
@@ -531,6 +550,22 @@ def global_search_view(request):
         
     return render(request, 'core/search_results.html', {'results': results})
 
+SEARCH_CACHE_ENDPOINTS = ['global_search', 'sat_product', 'sat_unit']
+
+
+@login_required
+def search_cache_stats_view(request):
+    """
+    JSON hit/miss counters of the search result cache (staff only, for
+    tuning). With scope 'process' they only count the worker that answered.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse({
+        'scope': search_cache.stats_scope(),
+        'endpoints': search_cache.stats(SEARCH_CACHE_ENDPOINTS),
+    })
+
 @login_required
 def notifications_list_view(request):
     """HTMX endpoint to render the notifications dropdown menu"""
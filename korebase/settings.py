@@ -188,6 +188,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Sessions stored in DB (not filesystem) so they survive Render restarts/redeploys
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 
+# Cache - memoria local por worker. 'search' guarda páginas de resultados de búsqueda:
+# LocMemCache desaloja en orden LRU al llegar a MAX_ENTRIES y expira por TIMEOUT (TTL).
+# Los tokens de invalidación no viven aquí sino en la BD (core.SearchCacheGeneration),
+# así que invalidar desde un worker o un manage.py alcanza a todos los workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'korebase-default',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'korebase-search',
+        'TIMEOUT': int(os.getenv('SEARCH_CACHE_TIMEOUT', '300')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000')),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # Contadores de aciertos/fallos de 'search', fuera de su culling. LocMem cuenta por worker;
+    # con un backend compartido (Redis/Memcached) las tasas cubren todo el despliegue
+    'search-stats': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'korebase-search-stats',
+        'TIMEOUT': None,
+    },
+}
+
 # Login URLs
 LOGIN_URL = 'core:login'
 LOGIN_REDIRECT_URL = 'core:dashboard'
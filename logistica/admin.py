@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Warehouse, Product, Stock, StockMovement, Supplier
+from .models import Warehouse, Product, Stock, StockMovement, CostLayer, InventoryValuation, StockCheckpoint, ReorderPoint, ProductClassification, DailyMovementRollup, Supplier
 
 
 @admin.register(Warehouse)
@@ -41,8 +41,66 @@ class StockMovementAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(CostLayer)
+class CostLayerAdmin(admin.ModelAdmin):
+    list_display = ['received_at', 'product', 'warehouse', 'unit_cost', 'quantity_received', 'quantity_remaining']
+    list_filter = ['warehouse']
+    search_fields = ['product__sku', 'reference']
+
+
+@admin.register(InventoryValuation)
+class InventoryValuationAdmin(admin.ModelAdmin):
+    list_display = ['warehouse', 'product_type', 'category', 'quantity', 'value', 'updated_at']
+    list_filter = ['warehouse', 'product_type']
+
+    def has_change_permission(self, request, obj=None):
+        # Derived data: rebuild with `manage.py rebuild_inventory_valuation`
+        return False
+
+
+@admin.register(StockCheckpoint)
+class StockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['as_of', 'product', 'warehouse', 'quantity']
+    list_filter = ['warehouse', 'as_of']
+    search_fields = ['product__sku']
+
+    def has_change_permission(self, request, obj=None):
+        # Cortes inmutables (ver `manage.py create_stock_checkpoints`)
+        return False
+
+
+@admin.register(DailyMovementRollup)
+class DailyMovementRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'product', 'warehouse', 'quantity_in', 'quantity_out', 'value_in', 'value_out', 'movement_count']
+    list_filter = ['warehouse', 'day']
+    search_fields = ['product__sku']
+
+    def has_change_permission(self, request, obj=None):
+        # Dato derivado: se reconstruye con `manage.py backfill_movement_rollups`
+        return False
+
+
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
     list_display = ['code', 'name', 'contact_name', 'email', 'phone', 'active']
     list_filter = ['active']
     search_fields = ['code', 'name', 'contact_name']
+
+
+@admin.register(ReorderPoint)
+class ReorderPointAdmin(admin.ModelAdmin):
+    list_display = ['product', 'warehouse', 'reorder_point', 'max_quantity', 'active', 'alerted_at']
+    list_filter = ['active', 'warehouse']
+    search_fields = ['product__sku', 'product__name']
+    readonly_fields = ['alerted_at']
+
+
+@admin.register(ProductClassification)
+class ProductClassificationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'abc_class', 'xyz_class', 'consumption_value', 'demand_cv', 'computed_at']
+    list_filter = ['abc_class', 'xyz_class']
+    search_fields = ['product__sku', 'product__name']
+
+    def has_change_permission(self, request, obj=None):
+        # Dato derivado: se recalcula con `manage.py classify_inventory`
+        return False
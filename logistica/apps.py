@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LogisticaConfig(AppConfig):
     name = 'logistica'
+
+    def ready(self):
+        from . import signals  # noqa: F401
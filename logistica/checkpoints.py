@@ -0,0 +1,137 @@
+"""
+Logística Checkpoints - Point-in-time stock ("al día")
+KoreBase ERP System
+
+Los movimientos son inmutables y se registran con timestamp del servidor, así
+que un corte (StockCheckpoint) nunca cambia una vez creado: la existencia a
+cualquier fecha es el corte anterior más cercano + los movimientos desde él.
+Un lote toma su timestamp antes de confirmarse, así que un corte solo se crea
+cuando ya pasó CHECKPOINT_SAFETY_MARGIN: para entonces todo lote fechado antes
+del corte está confirmado y entra en el snapshot.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .models import StockCheckpoint, StockMovement
+
+
+# Más que la duración de cualquier lote de post_movements
+CHECKPOINT_SAFETY_MARGIN = timedelta(minutes=10)
+
+def end_of_day(day):
+    """Cutoff that includes every movement of a local calendar date"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def period_cutoffs(start, end, period):
+    """Cutoffs (local midnight) for every day/month boundary in (start, end]"""
+    start = timezone.localtime(start).date()
+    end = timezone.localtime(end).date()
+    cutoffs = []
+    if period == 'day':
+        day = start + timedelta(days=1)
+        while day <= end:
+            cutoffs.append(timezone.make_aware(datetime.combine(day, time.min)))
+            day += timedelta(days=1)
+    else:
+        year, month = start.year, start.month
+        while True:
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            first = start.replace(year=year, month=month, day=1)
+            if first > end:
+                break
+            cutoffs.append(timezone.make_aware(datetime.combine(first, time.min)))
+    return cutoffs
+
+
+def latest_cutoff(company, when):
+    """Most recent checkpoint cutoff at or before `when` (None if there is none)"""
+    return StockCheckpoint.objects.filter(company=company, as_of__lte=when).aggregate(c=Max('as_of'))['c']
+
+
+def stock_as_of(company, when, product_ids=None, warehouse_ids=None):
+    """
+    Stock per (product_id, warehouse_id) including every movement before `when`.
+
+    Reads the nearest checkpoint plus the movements after it, both grouped in
+    the database. Restrict with product_ids/warehouse_ids to keep it bounded.
+    """
+    cutoff = latest_cutoff(company, when)
+    balances = defaultdict(Decimal)
+
+    if cutoff is not None:
+        checkpoint_rows = StockCheckpoint.objects.filter(company=company, as_of=cutoff)
+        if product_ids is not None:
+            checkpoint_rows = checkpoint_rows.filter(product_id__in=product_ids)
+        if warehouse_ids is not None:
+            checkpoint_rows = checkpoint_rows.filter(warehouse_id__in=warehouse_ids)
+        for product_id, warehouse_id, quantity in checkpoint_rows.values_list('product_id', 'warehouse_id', 'quantity'):
+            balances[(product_id, warehouse_id)] += quantity
+
+    movements = StockMovement.objects.filter(company=company, timestamp__lt=when)
+    if cutoff is not None:
+        movements = movements.filter(timestamp__gte=cutoff)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    if warehouse_ids is not None:
+        movements = movements.filter(warehouse_id__in=warehouse_ids)
+    grouped = movements.order_by().values('product_id', 'warehouse_id').annotate(total=Sum('quantity_change'))
+    for row in grouped:
+        balances[(row['product_id'], row['warehouse_id'])] += row['total']
+
+    return dict(balances)
+
+
+def product_totals_as_of(company, when, product_ids):
+    """stock_as_of summed over warehouses: {product_id: quantity}"""
+    totals = defaultdict(Decimal)
+    for (product_id, _), quantity in stock_as_of(company, when, product_ids=product_ids).items():
+        totals[product_id] += quantity
+    return totals
+
+
+def latest_safe_cutoff():
+    """Latest instant a checkpoint may be taken at: batches stamped before it have committed"""
+    return timezone.now() - CHECKPOINT_SAFETY_MARGIN
+
+
+@transaction.atomic
+def create_checkpoint(company, cutoff):
+    """
+    Snapshot every non-zero balance at `cutoff`; returns rows written (0 if
+    it already exists). Raises ValueError for a cutoff within
+    CHECKPOINT_SAFETY_MARGIN of now, which could miss uncommitted batches.
+    """
+    if cutoff > latest_safe_cutoff():
+        raise ValueError(
+            f'El corte debe tener al menos {CHECKPOINT_SAFETY_MARGIN.seconds // 60} minutos de antigüedad.'
+        )
+    if StockCheckpoint.objects.filter(company=company, as_of=cutoff).exists():
+        return 0
+    rows = [
+        StockCheckpoint(company=company, product_id=product_id, warehouse_id=warehouse_id, as_of=cutoff, quantity=quantity)
+        for (product_id, warehouse_id), quantity in sorted(stock_as_of(company, cutoff).items())
+        if quantity
+    ]
+    StockCheckpoint.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def backfill_checkpoints(company, period, until):
+    """
+    Create every missing day/month checkpoint from the first movement up to
+    `until`, leaving out cutoffs still within CHECKPOINT_SAFETY_MARGIN.
+    """
+    first = StockMovement.objects.filter(company=company).aggregate(t=Min('timestamp'))['t']
+    if first is None:
+        return []
+    created = []
+    for cutoff in period_cutoffs(first, min(until, latest_safe_cutoff()), period):
+        # Cada corte parte del anterior, así que el costo es O(movimientos del periodo)
+        created.append((cutoff, create_checkpoint(company, cutoff)))
+    return created
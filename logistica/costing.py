@@ -0,0 +1,145 @@
+"""
+Logística Costing - PEPS/UEPS layers and moving average
+KoreBase ERP System
+
+El motor trabaja sobre filas de Stock ya bloqueadas por services.post_movements:
+mientras la fila de Stock está bloqueada nadie más puede tocar sus capas, así
+que las capas no necesitan un SELECT ... FOR UPDATE propio.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.utils import timezone
+
+from .models import CostLayer
+
+
+COST_PLACES = Decimal('0.0001')
+MOVEMENT_COST_PLACES = Decimal('0.01')
+LAYERED_METHODS = ('fifo', 'lifo')
+LAYER_CHUNK_SIZE = 2000
+
+
+def quantize_cost(value):
+    return value.quantize(COST_PLACES, rounding=ROUND_HALF_UP)
+
+
+def movement_cost(value):
+    """Round an internal 4-decimal cost to StockMovement.unit_cost_at_movement precision"""
+    return value.quantize(MOVEMENT_COST_PLACES, rounding=ROUND_HALF_UP)
+
+
+class CostLedger:
+    """
+    In-memory view of the cost state of the Stock rows locked by one batch.
+
+    Open layers of every fifo/lifo product in the batch are read in one query
+    per LAYER_CHUNK_SIZE products (served by costlayer_open_idx), consumed in
+    memory, and written back with one bulk_update plus one bulk_create in
+    flush().
+    """
+
+    def __init__(self, company, stocks, products):
+        self.company = company
+        self.stocks = stocks
+        self._new_layers = []
+        self._dirty_layers = {}
+        self._open_layers = defaultdict(list)
+
+        layered_keys = {
+            key for key in stocks
+            if products[key[0]].costing_method in LAYERED_METHODS
+        }
+        product_ids = sorted({product_id for product_id, _ in layered_keys})
+        warehouse_ids = {warehouse_id for _, warehouse_id in layered_keys}
+        for offset in range(0, len(product_ids), LAYER_CHUNK_SIZE):
+            open_layers = CostLayer.objects.filter(
+                company=company,
+                product_id__in=product_ids[offset:offset + LAYER_CHUNK_SIZE],
+                warehouse_id__in=warehouse_ids,
+                quantity_remaining__gt=0,
+            ).order_by('product_id', 'warehouse_id', 'received_at', 'id')
+            for layer in open_layers:
+                key = (layer.product_id, layer.warehouse_id)
+                if key in layered_keys:
+                    self._open_layers[key].append(layer)
+
+    def receive(self, product, warehouse, quantity, unit_cost, received_at, reference=''):
+        """Register an inbound quantity at unit_cost; returns the cost to post on the movement"""
+        key = (product.pk, warehouse.pk)
+        unit_cost = quantize_cost(unit_cost)
+
+        if product.costing_method in LAYERED_METHODS:
+            layer = CostLayer(
+                company=self.company,
+                product=product,
+                warehouse=warehouse,
+                received_at=received_at,
+                unit_cost=unit_cost,
+                quantity_received=quantity,
+                quantity_remaining=quantity,
+                reference=reference,
+            )
+            self._open_layers[key].append(layer)
+            self._new_layers.append(layer)
+        else:
+            stock = self.stocks[key]
+            # stock.quantity is still the balance *before* this receipt
+            on_hand = max(stock.quantity, Decimal('0'))
+            if on_hand + quantity > 0:
+                stock.average_cost = quantize_cost(
+                    (on_hand * stock.average_cost + quantity * unit_cost) / (on_hand + quantity)
+                )
+        return unit_cost
+
+    def issue(self, product, warehouse, quantity):
+        """Consume an outbound quantity; returns the weighted unit cost of the goods issued"""
+        key = (product.pk, warehouse.pk)
+
+        if product.costing_method not in LAYERED_METHODS:
+            return self.current_cost(product, warehouse)
+
+        layers = self._open_layers[key]
+        pending = quantity
+        total_cost = Decimal('0')
+        while pending > 0 and layers:
+            # PEPS consume la capa más antigua, UEPS la más reciente
+            layer = layers[0] if product.costing_method == 'fifo' else layers[-1]
+            taken = min(pending, layer.quantity_remaining)
+            layer.quantity_remaining -= taken
+            total_cost += taken * layer.unit_cost
+            pending -= taken
+            if layer.pk is not None:
+                self._dirty_layers[layer.pk] = layer
+            if layer.quantity_remaining <= 0:
+                layers.pop(0 if product.costing_method == 'fifo' else -1)
+
+        if pending > 0:
+            # Existencia sin capas (saldo negativo permitido o histórico previo): costo estándar
+            total_cost += pending * product.unit_cost
+
+        return quantize_cost(total_cost / quantity)
+
+    def current_cost(self, product, warehouse):
+        """Unit cost the next issue would get, without consuming anything"""
+        key = (product.pk, warehouse.pk)
+        if product.costing_method in LAYERED_METHODS:
+            layers = self._open_layers[key]
+            if layers:
+                layer = layers[0] if product.costing_method == 'fifo' else layers[-1]
+                return layer.unit_cost
+            return quantize_cost(product.unit_cost)
+
+        stock = self.stocks[key]
+        if stock.average_cost > 0:
+            return stock.average_cost
+        return quantize_cost(product.unit_cost)
+
+    def flush(self):
+        if self._dirty_layers:
+            now = timezone.now()
+            for layer in self._dirty_layers.values():
+                layer.updated_at = now
+            CostLayer.objects.bulk_update(list(self._dirty_layers.values()), ['quantity_remaining', 'updated_at'])
+        if self._new_layers:
+            CostLayer.objects.bulk_create(self._new_layers)
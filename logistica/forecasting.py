@@ -0,0 +1,218 @@
+"""
+Logística Forecasting - Vectorized demand forecasting and safety stock
+KoreBase ERP System
+
+La demanda (salidas 'out' del Kardex) se lee agregada por producto y día en
+una sola consulta y se guarda como arreglos NumPy. Cada serie (diaria o
+semanal) es una matriz productos × periodos, y promedio móvil, suavizamiento
+exponencial y stock de seguridad se calculan para todos los SKUs a la vez con
+operaciones de matriz: el costo depende del tamaño de la matriz, no de un
+ciclo por producto.
+"""
+import datetime
+from statistics import NormalDist
+from typing import NamedTuple
+
+import numpy as np
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Product, Stock, StockMovement
+
+
+BUCKET_DAYS = {'day': 1, 'week': 7}
+DEMAND_TYPES = ('out',)
+FETCH_SIZE = 10000
+CSV_HEADER = [
+    'sku', 'nombre', 'promedio_movil_diario', 'suavizado_diario', 'desviacion_diaria',
+    'stock_seguridad', 'punto_reorden', 'maximo', 'existencia', 'sugerido',
+]
+
+
+class DemandHistory:
+    """
+    Outbound quantity per product and day over the `days` days before `end`.
+
+    Kept sparse (one entry per product/day with demand) and densified per
+    bucket in series(), so a weekly forecast never allocates the daily matrix.
+    Row i of every series belongs to product_ids[i].
+    """
+
+    def __init__(self, product_ids, day_index, quantities, end, days):
+        self.product_ids, self._rows = np.unique(np.asarray(product_ids, dtype=np.int64), return_inverse=True)
+        self._days = np.asarray(day_index, dtype=np.int64)
+        self._quantities = np.asarray(quantities, dtype=np.float64)
+        self.end = end
+        self.days = days
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def series(self, bucket='week'):
+        """(products × periods) demand matrix; the oldest period is dropped if incomplete"""
+        width = BUCKET_DAYS[bucket]
+        periods = self.days // width
+        # Los periodos se alinean al final: el más reciente siempre está completo
+        offset = self.days - periods * width
+        keep = self._days >= offset
+        flat = self._rows[keep] * periods + (self._days[keep] - offset) // width
+        matrix = np.bincount(flat, weights=self._quantities[keep], minlength=len(self) * periods)
+        return matrix.reshape(len(self), periods)
+
+
+def load_history(company, days=730, end=None, warehouse=None):
+    """
+    Read the outbound history of `company` into a DemandHistory.
+
+    One grouped query (product, day, SUM) served by the (company, timestamp)
+    index; rows are fetched in FETCH_SIZE batches straight into arrays,
+    without building model instances. `end` (exclusive) defaults to today,
+    so only whole days are counted.
+    """
+    end = end or timezone.localdate()
+    start = end - datetime.timedelta(days=days)
+    queryset = StockMovement.objects.filter(
+        company=company,
+        movement_type__in=DEMAND_TYPES,
+        quantity_change__lt=0,
+        timestamp__gte=timezone.make_aware(datetime.datetime.combine(start, datetime.time.min)),
+        timestamp__lt=timezone.make_aware(datetime.datetime.combine(end, datetime.time.min)),
+    )
+    if warehouse is not None:
+        queryset = queryset.filter(warehouse=warehouse)
+    queryset = queryset.annotate(day=TruncDate('timestamp')).values('product_id', 'day').annotate(
+        quantity=Sum('quantity_change'),
+    ).order_by()
+
+    product_ids, day_index, quantities = [], [], []
+    origin = np.datetime64(start, 'D')
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            products, dates, amounts = zip(*rows)
+            product_ids.append(np.array(products, dtype=np.int64))
+            # PostgreSQL devuelve date, SQLite 'YYYY-MM-DD': datetime64 acepta ambos
+            day_index.append((np.array(dates, dtype='datetime64[D]') - origin).astype(np.int64))
+            quantities.append(-np.array(amounts, dtype=np.float64))
+
+    def joined(chunks, dtype):
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    return DemandHistory(
+        joined(product_ids, np.int64), joined(day_index, np.int64), joined(quantities, np.float64), end, days,
+    )
+
+
+def stock_on_hand(company, product_ids, warehouse=None):
+    """Current quantity per product aligned with `product_ids` (one grouped query)"""
+    totals = Stock.objects.filter(company=company)
+    if warehouse is not None:
+        totals = totals.filter(warehouse=warehouse)
+    totals = dict(totals.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+    return np.array([float(totals.get(int(product_id), 0)) for product_id in product_ids], dtype=np.float64)
+
+
+def moving_average(series, window):
+    """Mean of the last `window` periods of every row"""
+    if series.shape[1] == 0:
+        return np.zeros(series.shape[0])
+    return series[:, -window:].mean(axis=1)
+
+
+def exponential_smoothing(series, alpha):
+    """
+    Simple exponential smoothing level after the last period, for every row.
+
+    level_0 = x_0 and level_t = alpha * x_t + (1 - alpha) * level_(t-1)
+    unrolls to a fixed weight per period, so the whole recursion is a single
+    matrix-vector product instead of a loop over periods.
+    """
+    periods = series.shape[1]
+    if periods == 0:
+        return np.zeros(series.shape[0])
+    weights = alpha * (1 - alpha) ** np.arange(periods - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (periods - 1)
+    return series @ weights
+
+
+class ForecastParams(NamedTuple):
+    bucket: str = 'week'
+    window: int = 8
+    alpha: float = 0.3
+    method: str = 'ses'
+    service_level: float = 0.95
+    lead_time_days: int = 7
+    review_days: int = 7
+
+
+class Forecast(NamedTuple):
+    """
+    Per-product arrays, all aligned with product_ids. Demand figures are
+    daily rates whatever the bucket; quantities are in the product's unit.
+    """
+    product_ids: np.ndarray
+    moving_average: np.ndarray
+    smoothed: np.ndarray
+    deviation: np.ndarray
+    safety_stock: np.ndarray
+    reorder_point: np.ndarray
+    order_up_to: np.ndarray
+    on_hand: np.ndarray
+    suggested: np.ndarray
+
+
+def forecast(series, product_ids, on_hand, params=ForecastParams()):
+    """
+    Forecast every row of a demand series at once.
+
+    The daily rate comes from the moving average ('ma') or exponential
+    smoothing ('ses'). Safety stock is z * sigma * sqrt(lead time), with z
+    for the service level and sigma the per-day deviation of the last
+    `window` periods. Suggested order = order-up-to level (demand over lead
+    time + review period, plus safety stock) minus stock on hand, never negative.
+    """
+    width = BUCKET_DAYS[params.bucket]
+    window = max(1, min(params.window, series.shape[1]))
+    average = moving_average(series, window) / width
+    smoothed = exponential_smoothing(series, params.alpha) / width
+    recent = series[:, -window:]
+    deviation = (recent.std(axis=1, ddof=1) if window > 1 else np.zeros(series.shape[0])) / np.sqrt(width)
+
+    rate = average if params.method == 'ma' else smoothed
+    z = NormalDist().inv_cdf(params.service_level)
+    safety_stock = z * deviation * np.sqrt(params.lead_time_days)
+    reorder_point = rate * params.lead_time_days + safety_stock
+    order_up_to = rate * (params.lead_time_days + params.review_days) + safety_stock
+    suggested = np.maximum(order_up_to - on_hand, 0)
+    return Forecast(
+        product_ids, average, smoothed, deviation, safety_stock, reorder_point, order_up_to, on_hand, suggested,
+    )
+
+
+def forecast_company(company, params=ForecastParams(), days=730, warehouse=None):
+    """Load the history of `company` and forecast every product with demand in it"""
+    history = load_history(company, days=days, warehouse=warehouse)
+    on_hand = stock_on_hand(company, history.product_ids, warehouse=warehouse)
+    return forecast(history.series(params.bucket), history.product_ids, on_hand, params)
+
+
+def csv_rows(company, result):
+    """
+    [sku, name, figures...] per forecast product, in CSV_HEADER order.
+
+    SKUs are read before returning: a streamed response consumes the rows
+    after the request (and its tenant context) is over.
+    """
+    names = Product.objects.filter(company=company).values_list('pk', 'sku', 'name')
+    products = {pk: (sku, name) for pk, sku, name in names}
+    columns = result[1:]
+    return (
+        [*products.get(product_id, (product_id, '')), *(f'{column[index]:.3f}' for column in columns)]
+        for index, product_id in enumerate(result.product_ids.tolist())
+    )
@@ -3,7 +3,8 @@ Forms for Logistics Module
 KoreBase ERP System
 """
 from django import forms
-from .models import Product, Warehouse, Supplier
+from django.forms import formset_factory
+from .models import Product, ReorderPoint, Warehouse, Supplier
 
 
 class ProductForm(forms.ModelForm):
@@ -220,3 +221,200 @@ class StockMovementForm(forms.Form):
             # Fallback: use the TenantManager (evaluated at request time)
             self.fields['warehouse'].queryset = Warehouse.objects.filter(active=True)
 
+
+
+class ProductImportForm(forms.Form):
+    """Upload form for the bulk product import (CSV/XLSX)"""
+    file = forms.FileField(
+        label="Archivo CSV o XLSX",
+        widget=forms.ClearableFileInput(attrs={'class': 'erp-form-input', 'accept': '.csv,.xlsx'})
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        label="Solo validar (no guardar cambios)",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError('Solo se aceptan archivos .csv o .xlsx')
+        return file
+
+
+class StockTransferForm(forms.Form):
+    """Header of a warehouse-to-warehouse transfer document"""
+    source = forms.ModelChoiceField(
+        queryset=Warehouse.objects.none(),
+        label="Almacén Origen",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    destination = forms.ModelChoiceField(
+        queryset=Warehouse.objects.none(),
+        label="Almacén Destino",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    reference = forms.CharField(
+        required=False,
+        max_length=100,
+        label="Referencia / Documento",
+        help_text="Si se deja vacía se genera un folio TRF-XXXXXXXX.",
+        widget=forms.TextInput(attrs={'class': 'erp-form-input', 'placeholder': 'Ej: Traspaso 45'})
+    )
+    notes = forms.CharField(
+        required=False,
+        label="Notas",
+        widget=forms.Textarea(attrs={'class': 'erp-form-textarea', 'rows': 2, 'placeholder': 'Motivo de la transferencia...'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        company = kwargs.pop('company', None)
+        super().__init__(*args, **kwargs)
+        warehouses = Warehouse.objects.filter(active=True)
+        if company:
+            warehouses = warehouses.filter(company=company)
+        self.fields['source'].queryset = warehouses
+        self.fields['destination'].queryset = warehouses
+
+    def clean(self):
+        cleaned_data = super().clean()
+        source, destination = cleaned_data.get('source'), cleaned_data.get('destination')
+        if source and destination and source == destination:
+            self.add_error('destination', 'El almacén destino debe ser distinto al de origen.')
+        return cleaned_data
+
+
+class StockTransferLineForm(forms.Form):
+    """One product line of a transfer document"""
+    product = forms.ModelChoiceField(
+        queryset=Product.objects.none(),
+        label="Producto",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    quantity = forms.DecimalField(
+        min_value=0.001,
+        max_digits=15,
+        decimal_places=3,
+        label="Cantidad",
+        widget=forms.NumberInput(attrs={'class': 'erp-form-input', 'placeholder': '0.000', 'step': '0.001', 'min': '0.001'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        product_qs = kwargs.pop('product_qs', None)
+        super().__init__(*args, **kwargs)
+        if product_qs is not None:
+            self.fields['product'].queryset = product_qs
+
+
+StockTransferLineFormSet = formset_factory(
+    StockTransferLineForm,
+    extra=4,
+    min_num=1,
+    validate_min=True,
+)
+
+
+class ReorderPointForm(forms.ModelForm):
+    """Min/max reorder parameters of one product in one warehouse"""
+
+    class Meta:
+        model = ReorderPoint
+        fields = ['product', 'warehouse', 'reorder_point', 'max_quantity', 'active']
+        widgets = {
+            'product': forms.Select(attrs={'class': 'erp-form-input'}),
+            'warehouse': forms.Select(attrs={'class': 'erp-form-input'}),
+            'reorder_point': forms.NumberInput(attrs={'class': 'erp-form-input', 'step': '0.001', 'min': '0', 'placeholder': '0.000'}),
+            'max_quantity': forms.NumberInput(attrs={'class': 'erp-form-input', 'step': '0.001', 'min': '0', 'placeholder': '0.000'}),
+            'active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        company = kwargs.pop('company', None)
+        super().__init__(*args, **kwargs)
+        self.company = company
+        products = Product.objects.filter(active=True).order_by('sku')
+        warehouses = Warehouse.objects.filter(active=True).order_by('code')
+        if company:
+            products = products.filter(company=company)
+            warehouses = warehouses.filter(company=company)
+        self.fields['product'].queryset = products
+        self.fields['warehouse'].queryset = warehouses
+        self.fields['product'].label = 'Producto'
+        self.fields['warehouse'].label = 'Almacén'
+        self.fields['reorder_point'].label = 'Punto de Reorden (mínimo)'
+        self.fields['max_quantity'].label = 'Máximo (pedir hasta)'
+        self.fields['active'].label = 'Activo'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        reorder_point, max_quantity = cleaned_data.get('reorder_point'), cleaned_data.get('max_quantity')
+        if reorder_point is not None and max_quantity is not None and max_quantity < reorder_point:
+            self.add_error('max_quantity', 'El máximo no puede ser menor al punto de reorden.')
+
+        product, warehouse = cleaned_data.get('product'), cleaned_data.get('warehouse')
+        if product and warehouse:
+            duplicates = ReorderPoint.objects.filter(company=self.company, product=product, warehouse=warehouse)
+            if self.instance.pk:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                self.add_error('warehouse', f'{product.sku} ya tiene punto de reorden en {warehouse.code}.')
+        return cleaned_data
+
+
+class ForecastForm(forms.Form):
+    """Parameters of the demand forecast report (GET)"""
+    warehouse = forms.ModelChoiceField(
+        queryset=Warehouse.objects.none(),
+        required=False,
+        empty_label="Todos los almacenes",
+        label="Almacén",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    bucket = forms.ChoiceField(
+        choices=[('week', 'Semanal'), ('day', 'Diario')],
+        initial='week',
+        label="Periodo",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    method = forms.ChoiceField(
+        choices=[('ses', 'Suavizamiento exponencial'), ('ma', 'Promedio móvil')],
+        initial='ses',
+        label="Método",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    window = forms.IntegerField(
+        min_value=1, max_value=104, initial=8,
+        label="Ventana (periodos)",
+        widget=forms.NumberInput(attrs={'class': 'erp-form-input'})
+    )
+    alpha = forms.FloatField(
+        min_value=0.01, max_value=1, initial=0.3,
+        label="Alfa",
+        widget=forms.NumberInput(attrs={'class': 'erp-form-input', 'step': '0.05'})
+    )
+    service_level = forms.TypedChoiceField(
+        choices=[('0.9', '90%'), ('0.95', '95%'), ('0.975', '97.5%'), ('0.99', '99%')],
+        coerce=float,
+        initial='0.95',
+        label="Nivel de Servicio",
+        widget=forms.Select(attrs={'class': 'erp-form-input'})
+    )
+    lead_time_days = forms.IntegerField(
+        min_value=0, max_value=365, initial=7,
+        label="Entrega (días)",
+        widget=forms.NumberInput(attrs={'class': 'erp-form-input'})
+    )
+    review_days = forms.IntegerField(
+        min_value=0, max_value=365, initial=7,
+        label="Revisión (días)",
+        widget=forms.NumberInput(attrs={'class': 'erp-form-input'})
+    )
+
+    def __init__(self, *args, **kwargs):
+        company = kwargs.pop('company', None)
+        super().__init__(*args, **kwargs)
+        warehouses = Warehouse.objects.filter(active=True).order_by('code')
+        if company:
+            warehouses = warehouses.filter(company=company)
+        self.fields['warehouse'].queryset = warehouses
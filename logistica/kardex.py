@@ -0,0 +1,119 @@
+"""
+Logística Kardex - Ledger verification and rebuild
+KoreBase ERP System
+
+El saldo correcto de cada movimiento es la suma acumulada de quantity_change
+por (empresa, producto, almacén) en orden de timestamp/id; el de Stock es la
+suma total. Ambos se calculan en la base de datos con funciones de ventana y
+subconsultas: Python solo recibe las filas que no cuadran. Las sumas se
+redondean a las 3 decimales de la cantidad antes de comparar (en SQLite son de
+punto flotante).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from . import valuation
+from .models import Stock, StockMovement
+
+
+REBUILD_BATCH_SIZE = 1000
+QUANTITY = DecimalField(max_digits=15, decimal_places=3)
+ZERO_QTY = Decimal('0.000')
+
+
+def _quantized(rows):
+    """
+    Drift rows with both quantities as 3-place Decimals, whatever type the
+    backend returned; rows that agree once quantized are dropped.
+    """
+    found = []
+    for pk, product_id, warehouse_id, stored, expected in rows:
+        stored, expected = Decimal(str(stored)).quantize(ZERO_QTY), Decimal(str(expected)).quantize(ZERO_QTY)
+        if stored != expected:
+            found.append((pk, product_id, warehouse_id, stored, expected))
+    return found
+
+
+def _movement_drift(company):
+    """Movements whose stored running_balance differs from the ledger's cumulative sum"""
+    # ROUND: en SQLite la suma es de punto flotante; en PostgreSQL no cambia nada
+    expected = Round(Window(
+        Sum('quantity_change'),
+        partition_by=[F('company_id'), F('product_id'), F('warehouse_id')],
+        order_by=[F('timestamp').asc(), F('id').asc()],
+    ), 3, output_field=QUANTITY)
+    return StockMovement.objects.filter(company=company).annotate(
+        expected_balance=expected,
+    ).filter(~Q(running_balance=F('expected_balance'))).order_by().values_list(
+        'id', 'product_id', 'warehouse_id', 'running_balance', 'expected_balance'
+    )
+
+
+def _stock_drift(company):
+    """Stock rows whose quantity differs from the sum of their movements"""
+    ledger_total = StockMovement.objects.filter(
+        company=company,
+        product_id=OuterRef('product_id'),
+        warehouse_id=OuterRef('warehouse_id'),
+    ).order_by().values('product_id').annotate(total=Sum('quantity_change')).values('total')
+
+    return Stock.objects.filter(company=company).annotate(
+        expected_quantity=Round(
+            Coalesce(Subquery(ledger_total), Value(Decimal('0')), output_field=QUANTITY), 3, output_field=QUANTITY,
+        ),
+    ).filter(~Q(quantity=F('expected_quantity'))).order_by().values_list(
+        'id', 'product_id', 'warehouse_id', 'quantity', 'expected_quantity'
+    )
+
+
+def verify(company, rebuild=False):
+    """
+    Check (and optionally rebuild) a tenant's Kardex.
+
+    Returns a JSON-serializable report with every drifting movement and stock
+    row. With rebuild=True the stored values are overwritten with the ledger
+    values inside one transaction.
+    """
+    with transaction.atomic():
+        if rebuild:
+            # Mismo orden de bloqueo que services._lock_stock_rows
+            list(Stock.objects.filter(company=company).select_for_update().order_by('product_id', 'warehouse_id').values_list('id'))
+
+        movement_rows = _quantized(_movement_drift(company))
+        stock_rows = _quantized(_stock_drift(company))
+
+        if rebuild:
+            # StockMovement.save() rechaza updates; bulk_update es la única vía y solo toca el saldo derivado
+            StockMovement.objects.bulk_update(
+                [StockMovement(pk=pk, running_balance=expected) for pk, _, _, _, expected in movement_rows],
+                ['running_balance'],
+                batch_size=REBUILD_BATCH_SIZE,
+            )
+            now = timezone.now()
+            Stock.objects.bulk_update(
+                [Stock(pk=pk, quantity=expected, updated_at=now) for pk, _, _, _, expected in stock_rows],
+                ['quantity', 'updated_at'],
+                batch_size=REBUILD_BATCH_SIZE,
+            )
+            if stock_rows:
+                valuation.rebuild(company)
+
+    return {
+        'company_id': str(company.pk),
+        'company': company.name,
+        'rebuilt': rebuild,
+        'movement_drift': [
+            {'movement_id': pk, 'product_id': product_id, 'warehouse_id': warehouse_id,
+             'stored': str(stored), 'expected': str(expected)}
+            for pk, product_id, warehouse_id, stored, expected in movement_rows
+        ],
+        'stock_drift': [
+            {'stock_id': pk, 'product_id': product_id, 'warehouse_id': warehouse_id,
+             'stored': str(stored), 'expected': str(expected)}
+            for pk, product_id, warehouse_id, stored, expected in stock_rows
+        ],
+    }
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica import classification
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la clasificación ABC (valor consumido) / XYZ (variabilidad de la demanda) "
+        "de los productos activos de cada empresa. Pensado para correr periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+        parser.add_argument(
+            '--days', type=int, default=classification.HISTORY_DAYS,
+            help=f"Días de historia de salidas (por defecto: {classification.HISTORY_DAYS})",
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 7:
+            raise CommandError("--days debe cubrir al menos una semana")
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        for company in companies:
+            with tenant_context(company):
+                counts = classification.classify(company, days=options['days'])
+            by_class = ' '.join(f"{abc}: {sum(n for key, n in counts.items() if key[0] == abc)}" for abc in 'ABC')
+            self.stdout.write(f"[*] {company.name}: {sum(counts.values())} productos ({by_class})")
+
+        self.stdout.write(self.style.SUCCESS("[OK] Clasificación ABC/XYZ calculada"))
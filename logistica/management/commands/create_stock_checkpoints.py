@@ -0,0 +1,56 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica import checkpoints
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea cortes de existencias (StockCheckpoint) por empresa, producto y almacén. "
+        "Pensado para cron diario o mensual; --backfill genera los cortes históricos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=['day', 'month'], default='day')
+        parser.add_argument('--date', help="Fecha de corte YYYY-MM-DD (medianoche local; por defecto: hoy / día 1 del mes)")
+        parser.add_argument('--backfill', action='store_true', help="Crea todos los cortes faltantes desde el primer movimiento")
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        today = timezone.localdate()
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Formato de fecha inválido, use YYYY-MM-DD")
+        else:
+            day = today if options['period'] == 'day' else today.replace(day=1)
+        cutoff = timezone.make_aware(datetime.combine(day, time.min))
+        if cutoff > now:
+            raise CommandError("No se puede crear un corte en el futuro")
+        if not options['backfill'] and cutoff > checkpoints.latest_safe_cutoff():
+            minutes = checkpoints.CHECKPOINT_SAFETY_MARGIN.seconds // 60
+            raise CommandError(f"El corte debe tener al menos {minutes} minutos de antigüedad (lotes aún sin confirmar)")
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        for company in companies:
+            with tenant_context(company):
+                if options['backfill']:
+                    created = checkpoints.backfill_checkpoints(company, options['period'], cutoff)
+                    rows = sum(count for _, count in created)
+                    self.stdout.write(f"[*] {company.name}: {len(created)} cortes, {rows} filas")
+                else:
+                    rows = checkpoints.create_checkpoint(company, cutoff)
+                    self.stdout.write(f"[*] {company.name}: corte {day:%Y-%m-%d}, {rows} filas")
+
+        self.stdout.write(self.style.SUCCESS("[OK] Cortes de existencias creados"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica import reorder
+
+
+class Command(BaseCommand):
+    help = (
+        "Evalúa los puntos de reorden de cada empresa y envía las alertas de stock bajo pendientes. "
+        "Pensado para correr periódicamente (cron); los lotes de movimientos ya evalúan sus propias filas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        for company in companies:
+            with tenant_context(company):
+                alerted, recovered = reorder.evaluate(company)
+            self.stdout.write(f"[*] {company.name}: {alerted} alertas nuevas, {recovered} recuperados")
+
+        self.stdout.write(self.style.SUCCESS("[OK] Puntos de reorden evaluados"))
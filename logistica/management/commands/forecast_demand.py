@@ -0,0 +1,140 @@
+import csv
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica.forecasting import (
+    BUCKET_DAYS, CSV_HEADER, DemandHistory, ForecastParams, csv_rows, forecast, load_history, stock_on_hand,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pronostica la demanda (salidas del Kardex) de todos los productos a la vez con NumPy: "
+        "promedio móvil, suavizamiento exponencial, stock de seguridad y cantidad sugerida. "
+        "Con --benchmark mide el cálculo sobre datos sintéticos; con --company mide además la carga "
+        "desde la base de datos. Los tiempos se reportan por fase."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+        parser.add_argument('--days', type=int, default=730, help="Días de historia (por defecto: 730)")
+        parser.add_argument('--bucket', choices=sorted(BUCKET_DAYS), default='week', help="Periodo de la serie")
+        parser.add_argument('--window', type=int, default=8, help="Periodos del promedio móvil y la desviación")
+        parser.add_argument('--alpha', type=float, default=0.3, help="Constante de suavizamiento (0-1]")
+        parser.add_argument('--method', choices=['ma', 'ses'], default='ses', help="Tasa usada para sugerir: ma o ses")
+        parser.add_argument('--service-level', type=float, default=0.95, help="Nivel de servicio del stock de seguridad")
+        parser.add_argument('--lead-time', type=int, default=7, help="Tiempo de entrega en días")
+        parser.add_argument('--review', type=int, default=7, help="Periodo de revisión en días")
+        parser.add_argument('--output', help="CSV con el pronóstico por producto (requiere --company)")
+        parser.add_argument(
+            '--benchmark', type=int, metavar='SKUS',
+            help="Mide con SKUS productos sintéticos; con --company también la carga de su historia",
+        )
+        parser.add_argument('--density', type=float, default=0.3, help="Benchmark: fracción de días con salida por SKU")
+
+    @contextmanager
+    def _phase(self, name):
+        start = time.perf_counter()
+        yield
+        self.timings.append((name, time.perf_counter() - start))
+
+    def handle(self, *args, **options):
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError("--alpha debe estar en (0, 1]")
+        if not 0.5 <= options['service_level'] < 1:
+            raise CommandError("--service-level debe estar en [0.5, 1)")
+        if options['days'] < BUCKET_DAYS[options['bucket']]:
+            raise CommandError("--days debe cubrir al menos un periodo")
+        params = ForecastParams(
+            bucket=options['bucket'], window=options['window'], alpha=options['alpha'], method=options['method'],
+            service_level=options['service_level'], lead_time_days=options['lead_time'], review_days=options['review'],
+        )
+        self.timings = []
+
+        if options['output'] and not options['company']:
+            raise CommandError("--output requiere --company")
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        if options['benchmark']:
+            company = companies.get() if options['company'] else None
+            self._benchmark(options['benchmark'], options['days'], options['density'], params, company)
+            return
+
+        for company in companies:
+            with tenant_context(company):
+                history, on_hand = self._load(company, company.name, options['days'])
+                with self._phase(f'{company.name}: serie'):
+                    series = history.series(params.bucket)
+                with self._phase(f'{company.name}: pronóstico'):
+                    result = forecast(series, history.product_ids, on_hand, params)
+                if options['output']:
+                    with self._phase(f'{company.name}: CSV'), \
+                            open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                        writer = csv.writer(output)
+                        writer.writerow(CSV_HEADER)
+                        writer.writerows(csv_rows(company, result))
+            self.stdout.write(
+                f"[*] {company.name}: {len(result.product_ids)} productos con demanda, "
+                f"{int(np.count_nonzero(result.suggested))} con pedido sugerido"
+            )
+
+        for name, seconds in self.timings:
+            self.stdout.write(f"    {name:<32} {seconds:8.2f} s")
+        self.stdout.write(self.style.SUCCESS("[OK] Pronóstico de demanda calculado"))
+
+    def _load(self, company, label, days):
+        """Read the demand history (fetchmany into arrays) and on-hand stock, timing each query"""
+        with self._phase(f'{label}: carga historia'):
+            history = load_history(company, days=days)
+        with self._phase(f'{label}: carga existencias'):
+            on_hand = stock_on_hand(company, history.product_ids)
+        return history, on_hand
+
+    def _benchmark(self, skus, days, density, params, company=None):
+        """
+        Time the vectorized path on a synthetic skus × days history (Poisson
+        demand). With a company, its real history is loaded first so the
+        database read is measured as its own phase.
+        """
+        if company is not None:
+            with tenant_context(company):
+                history, _ = self._load(company, 'BD', days)
+            self.stdout.write(f"[*] {company.name}: {len(history)} SKUs con demanda en {days} días")
+
+        rng = np.random.default_rng(42)
+        entries = int(skus * days * density)
+        with self._phase('datos sintéticos'):
+            product_ids = rng.integers(1, skus + 1, entries)
+            day_index = rng.integers(0, days, entries)
+            quantities = rng.poisson(4, entries) + 1.0
+        with self._phase('DemandHistory'):
+            history = DemandHistory(product_ids, day_index, quantities, timezone.localdate(), days)
+        on_hand = rng.integers(0, 200, len(history)).astype(np.float64)
+
+        for bucket in ('day', 'week'):
+            with self._phase(f'serie {bucket}'):
+                series = history.series(bucket)
+            with self._phase(f'pronóstico {bucket}'):
+                result = forecast(series, history.product_ids, on_hand, params._replace(bucket=bucket))
+            self.stdout.write(
+                f"[*] {bucket}: matriz {series.shape[0]} x {series.shape[1]}, "
+                f"{int(np.count_nonzero(result.suggested))} con pedido sugerido"
+            )
+            del series
+
+        self.stdout.write(f"[*] {len(history)} SKUs x {days} días, {entries} registros producto/día")
+        for name, seconds in self.timings:
+            self.stdout.write(f"    {name:<32} {seconds:8.2f} s")
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] Benchmark ({sum(seconds for _, seconds in self.timings):.2f} seg)"
+        ))
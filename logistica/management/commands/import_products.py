@@ -0,0 +1,52 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company, CustomUser
+from logistica.product_import import ProductImportError, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos (y saldos iniciales) desde un CSV/XLSX con las mismas reglas que la "
+        "pantalla de importación. Pensado para catálogos grandes que no caben en un request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Archivo .csv o .xlsx")
+        parser.add_argument('--company', required=True, help="UUID de la empresa")
+        parser.add_argument('--user', required=True, help="Usuario (username) que firma los movimientos de saldo inicial")
+        parser.add_argument('--dry-run', action='store_true', help="Solo valida; no escribe nada")
+        parser.add_argument('--errors', help="Escribe el reporte de errores por fila en este CSV")
+
+    def handle(self, *args, **options):
+        company = Company.objects.filter(pk=options['company']).first()
+        if company is None:
+            raise CommandError(f"Empresa no encontrada: {options['company']}")
+        user = CustomUser.objects.filter(username=options['user'], company=company).first()
+        if user is None:
+            raise CommandError(f"Usuario no encontrado en {company.name}: {options['user']}")
+
+        try:
+            with open(options['path'], 'rb') as file, tenant_context(company):
+                result = import_products(company, user, file, options['path'], dry_run=options['dry_run'])
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer el archivo: {exc}")
+        except ProductImportError as exc:
+            raise CommandError(str(exc))
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='', encoding='utf-8') as report:
+                writer = csv.writer(report)
+                writer.writerow(['fila', 'sku', 'campo', 'error'])
+                writer.writerows(result.errors)
+        else:
+            for error in result.errors:
+                self.stdout.write(f"    fila {error.row} [{error.sku}] {error.field}: {error.message}")
+
+        mode = "Validación (sin guardar)" if result.dry_run else "Importación"
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] {mode}: {result.rows} filas, {result.created} nuevos, {result.updated} actualizados, "
+            f"{result.opening_lines} saldos iniciales, {result.skipped_rows} filas con errores"
+        ))
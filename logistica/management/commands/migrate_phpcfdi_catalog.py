@@ -0,0 +1,186 @@
+import bz2
+import datetime
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from logistica import sat_index
+from logistica.models import SatCatalogRelease, SatProductCode, SatUnitCode
+
+
+URL_CATALOGO = "https://github.com/phpcfdi/resources-sat-catalogs/releases/latest/download/catalogs.db.bz2"
+
+# (etiqueta, modelo, tabla phpcfdi con columnas id/texto/vigencia_hasta, campo de texto del modelo)
+CATALOGS = [
+    ('productos', SatProductCode, 'cfdi_40_productos_servicios', 'description'),
+    ('unidades', SatUnitCode, 'cfdi_40_claves_unidades', 'name'),
+]
+
+
+def content_hash(text, active=True):
+    """Digest of the mutable content of a catalog row"""
+    return hashlib.blake2b(f'{int(active)}|{text}'.encode(), digest_size=16).digest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Sincroniza los catálogos SAT (CFDI 4.0) con la base de phpcfdi. "
+        "Solo escribe altas, cambios de descripción y bajas (active=False): una clave es baja si ya no "
+        "está en la tabla o si su vigencia_hasta ya pasó; "
+        "acepta un archivo local catalogs.db[.bz2] para correr sin red."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Ruta local a catalogs.db o catalogs.db.bz2 (por defecto: descarga de phpcfdi)")
+        parser.add_argument('--url', default=URL_CATALOGO, help="URL del catalogs.db.bz2 a descargar")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Filas por fetchmany y por escritura")
+
+    @contextmanager
+    def _phase(self, name):
+        start = time.perf_counter()
+        yield
+        self.timings.append((name, time.perf_counter() - start))
+
+    def handle(self, *args, **options):
+        self.timings = []
+        self.today = timezone.localdate().isoformat()
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size debe ser mayor que cero")
+
+        # El directorio temporal nunca vive en el repositorio y se borra solo
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = self._resolve_source(options['path'], options['url'], workdir)
+            conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+            try:
+                with transaction.atomic():
+                    results = {
+                        label: self._sync(conn, label, model, table, field, batch_size)
+                        for label, model, table, field in CATALOGS
+                    }
+                    SatCatalogRelease.objects.create(
+                        source=options['path'] or options['url'],
+                        product_count=results['productos']['total'],
+                        unit_count=results['unidades']['total'],
+                    )
+                    # Los demás workers detectan la nueva versión por SatCatalogRelease
+                    transaction.on_commit(sat_index.invalidate)
+            except sqlite3.DatabaseError as exc:
+                tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+                raise CommandError(
+                    f"Error leyendo la DB de phpcfdi (¿cambiaron los nombres de tablas?): {exc}. "
+                    f"Tablas disponibles: {tables}"
+                )
+            finally:
+                conn.close()
+
+        for label, stats in results.items():
+            self.stdout.write(
+                f"[*] {label}: {stats['total']} vigentes, {stats['inserted']} altas, "
+                f"{stats['updated']} cambios, {stats['deactivated']} bajas, {stats['unchanged']} sin cambio"
+            )
+        for name, seconds in self.timings:
+            self.stdout.write(f"    {name:<32} {seconds:8.2f} s")
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] Catálogos SAT sincronizados ({sum(seconds for _, seconds in self.timings):.2f} seg)"
+        ))
+
+    def _resolve_source(self, path, url, workdir):
+        """Return the path of an uncompressed catalogs.db, downloading/decompressing as needed"""
+        if path:
+            if not os.path.isfile(path):
+                raise CommandError(f"Archivo no encontrado: {path}")
+            if not path.endswith('.bz2'):
+                return path
+            bz2_path = path
+        else:
+            bz2_path = os.path.join(workdir, 'catalogs.db.bz2')
+            self.stdout.write(f"[*] Descargando catálogo desde {url}...")
+            with self._phase('descarga'):
+                urllib.request.urlretrieve(url, bz2_path)
+
+        db_path = os.path.join(workdir, 'catalogs.db')
+        with self._phase('descompresión'):
+            with bz2.BZ2File(bz2_path, 'rb') as source, open(db_path, 'wb') as dest:
+                shutil.copyfileobj(source, dest, 1024 * 1024)
+        return db_path
+
+    def _is_current(self, valid_until):
+        """phpcfdi keeps withdrawn codes with vigencia_hasta set: only an empty or future date is current"""
+        if not valid_until:
+            return True
+        if isinstance(valid_until, (datetime.date, datetime.datetime)):
+            valid_until = valid_until.isoformat()
+        return str(valid_until)[:10] >= self.today
+
+    def _sync(self, conn, label, model, table, field, batch_size):
+        """Stream one phpcfdi table and apply only the rows whose content changed"""
+        max_length = model._meta.get_field(field).max_length
+        stats = {'total': 0, 'inserted': 0, 'updated': 0, 'deactivated': 0, 'unchanged': 0}
+
+        with self._phase(f'{label}: lectura actual'):
+            current = {
+                code: (pk, content_hash(text, active), active)
+                for pk, code, text, active in model.objects.values_list('pk', 'code', field, 'active').iterator(chunk_size=batch_size)
+            }
+
+        seen = set()
+        inserts, updates = [], []
+        write_seconds = 0.0
+        start = time.perf_counter()
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        valid_until = 'vigencia_hasta' if 'vigencia_hasta' in columns else "''"
+        cursor = conn.execute(f"SELECT id, texto, {valid_until} FROM {table}")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for code, text, until in rows:
+                # Una clave con vigencia vencida cuenta como ausente: no se da de alta y la guardada se da de baja
+                if not self._is_current(until):
+                    continue
+                code, text = str(code), (text or '')[:max_length]
+                seen.add(code)
+                existing = current.get(code)
+                if existing is None:
+                    inserts.append(model(code=code, active=True, **{field: text}))
+                elif existing[1] != content_hash(text):
+                    updates.append(model(pk=existing[0], code=code, active=True, **{field: text}))
+                else:
+                    stats['unchanged'] += 1
+            if len(inserts) >= batch_size or len(updates) >= batch_size:
+                write_seconds += self._flush(model, field, inserts, updates, stats)
+        write_seconds += self._flush(model, field, inserts, updates, stats)
+
+        withdrawn = [pk for code, (pk, _, active) in current.items() if active and code not in seen]
+        write_start = time.perf_counter()
+        for offset in range(0, len(withdrawn), batch_size):
+            stats['deactivated'] += model.objects.filter(pk__in=withdrawn[offset:offset + batch_size]).update(active=False)
+        write_seconds += time.perf_counter() - write_start
+
+        stats['total'] = len(seen)
+        self.timings.append((f'{label}: diff', time.perf_counter() - start - write_seconds))
+        self.timings.append((f'{label}: escritura', write_seconds))
+        return stats
+
+    def _flush(self, model, field, inserts, updates, stats):
+        """Write the pending inserts/updates; returns the seconds spent"""
+        start = time.perf_counter()
+        if inserts:
+            model.objects.bulk_create(inserts)
+            stats['inserted'] += len(inserts)
+            inserts.clear()
+        if updates:
+            model.objects.bulk_update(updates, [field, 'active'], batch_size=1000)
+            stats['updated'] += len(updates)
+            updates.clear()
+        return time.perf_counter() - start
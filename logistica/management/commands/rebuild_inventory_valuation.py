@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica import valuation
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde Stock el resumen de valuación de inventario (InventoryValuation)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        for company in companies:
+            with tenant_context(company):
+                rows = valuation.rebuild(company)
+            self.stdout.write(f"[*] {company.name}: {rows} filas de valuación")
+
+        self.stdout.write(self.style.SUCCESS("[OK] Valuación reconstruida"))
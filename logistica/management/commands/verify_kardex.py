@@ -0,0 +1,80 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica import kardex
+
+
+def _init_worker():
+    # Cada proceso abre su propia conexión; nunca compartir el socket heredado del padre
+    django.setup()
+    connections.close_all()
+
+
+def _verify_company(company_id, rebuild):
+    company = Company.objects.get(pk=company_id)
+    try:
+        with tenant_context(company):
+            return kardex.verify(company, rebuild=rebuild)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica running_balance de StockMovement y Stock.quantity contra el Kardex "
+        "(suma acumulada por empresa/producto/almacén) y opcionalmente los reconstruye. "
+        "Emite un reporte JSON con las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', action='append', help="UUID de empresa (repetible; por defecto: todas)")
+        parser.add_argument('--rebuild', action='store_true', help="Sobrescribe los saldos con los valores del Kardex")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Procesos en paralelo (1 = en el mismo proceso)")
+        parser.add_argument('--output', help="Archivo donde escribir el reporte JSON (por defecto: stdout)")
+        parser.add_argument('--fail-on-drift', action='store_true', help="Termina con error si se encontraron diferencias")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.order_by('created_at')
+        if options['company']:
+            companies = companies.filter(pk__in=options['company'])
+        company_ids = [str(pk) for pk in companies.values_list('pk', flat=True)]
+        if options['company'] and len(company_ids) != len(set(options['company'])):
+            raise CommandError("Alguna de las empresas indicadas no existe")
+
+        rebuild = options['rebuild']
+        workers = max(1, min(options['workers'], len(company_ids) or 1))
+
+        if workers == 1:
+            reports = [_verify_company(company_id, rebuild) for company_id in company_ids]
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                reports = list(pool.map(_verify_company, company_ids, [rebuild] * len(company_ids)))
+
+        drifting = [r for r in reports if r['movement_drift'] or r['stock_drift']]
+        report = {
+            'rebuild': rebuild,
+            'companies_checked': len(reports),
+            'companies_with_drift': len(drifting),
+            'movement_drift_total': sum(len(r['movement_drift']) for r in reports),
+            'stock_drift_total': sum(len(r['stock_drift']) for r in reports),
+            'companies': drifting,
+        }
+
+        payload = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(payload)
+            self.stderr.write(f"[*] Reporte escrito en {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        if drifting and options['fail_on_drift'] and not rebuild:
+            raise CommandError(f"{len(drifting)} empresa(s) con diferencias en el Kardex")
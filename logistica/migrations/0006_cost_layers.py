@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:51
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def seed_opening_cost(apps, schema_editor):
+    """Existing stock becomes one opening layer / average at the product's standard cost"""
+    Product = apps.get_model('logistica', 'Product')
+    Stock = apps.get_model('logistica', 'Stock')
+    CostLayer = apps.get_model('logistica', 'CostLayer')
+
+    Stock.objects.update(average_cost=Subquery(
+        Product.objects.filter(pk=OuterRef('product_id')).values('unit_cost')[:1]
+    ))
+
+    layers = []
+    open_stock = Stock.objects.filter(
+        quantity__gt=0, product__costing_method__in=['fifo', 'lifo']
+    ).select_related('product')
+    for stock in open_stock.iterator(chunk_size=2000):
+        layers.append(CostLayer(
+            company_id=stock.company_id,
+            product_id=stock.product_id,
+            warehouse_id=stock.warehouse_id,
+            received_at=stock.updated_at,
+            unit_cost=stock.product.unit_cost,
+            quantity_received=stock.quantity,
+            quantity_remaining=stock.quantity,
+            reference='Saldo inicial',
+        ))
+    CostLayer.objects.bulk_create(layers, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_replace_role_permission_with_membership_and_invitation'),
+        ('logistica', '0005_merge_20260421_1942'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=15, verbose_name='Costo Promedio'),
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('received_at', models.DateTimeField(verbose_name='Fecha de Entrada')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=15, verbose_name='Costo Unitario')),
+                ('quantity_received', models.DecimalField(decimal_places=3, max_digits=15, verbose_name='Cantidad Recibida')),
+                ('quantity_remaining', models.DecimalField(decimal_places=3, max_digits=15, verbose_name='Cantidad Disponible')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Referencia')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='cost_layers', to='logistica.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='cost_layers', to='logistica.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Capa de Costo',
+                'verbose_name_plural': 'Capas de Costo',
+                'ordering': ['received_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('quantity_remaining__gt', 0)), fields=['company', 'product', 'warehouse', 'received_at', 'id'], name='costlayer_open_idx')],
+            },
+        ),
+        migrations.RunPython(seed_opening_cost, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:53
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Sum
+
+
+def build_valuation(apps, schema_editor):
+    """Initial summary for every tenant from the current Stock table"""
+    Stock = apps.get_model('logistica', 'Stock')
+    InventoryValuation = apps.get_model('logistica', 'InventoryValuation')
+
+    grouped = Stock.objects.values(
+        'company_id', 'warehouse_id', 'product__product_type', 'product__category'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_value=Sum(ExpressionWrapper(
+            F('quantity') * F('product__unit_cost'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=5),
+        )),
+    ).order_by()
+    InventoryValuation.objects.bulk_create([
+        InventoryValuation(
+            company_id=row['company_id'],
+            warehouse_id=row['warehouse_id'],
+            product_type=row['product__product_type'],
+            category=row['product__category'],
+            quantity=row['total_quantity'] or 0,
+            value=row['total_value'] or 0,
+        )
+        for row in grouped
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_replace_role_permission_with_membership_and_invitation'),
+        ('logistica', '0006_cost_layers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product_type', models.CharField(choices=[('finished', 'Producto Terminado'), ('raw', 'Materia Prima'), ('component', 'Componente')], max_length=20, verbose_name='Tipo de Producto')),
+                ('category', models.CharField(max_length=100, verbose_name='Categoría')),
+                ('quantity', models.DecimalField(decimal_places=3, default=Decimal('0.000'), max_digits=18, verbose_name='Cantidad')),
+                ('value', models.DecimalField(decimal_places=5, default=Decimal('0.00000'), max_digits=20, verbose_name='Valor')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to='logistica.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Valuación de Inventario',
+                'verbose_name_plural': 'Valuaciones de Inventario',
+                'ordering': ['warehouse', 'product_type', 'category'],
+                'unique_together': {('company', 'warehouse', 'product_type', 'category')},
+            },
+        ),
+        migrations.RunPython(build_valuation, migrations.RunPython.noop),
+    ]
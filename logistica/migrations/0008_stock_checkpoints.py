@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_replace_role_permission_with_membership_and_invitation'),
+        ('logistica', '0007_inventory_valuation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('as_of', models.DateTimeField(verbose_name='Corte')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=15, verbose_name='Cantidad')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='logistica.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='logistica.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Corte de Existencias',
+                'verbose_name_plural': 'Cortes de Existencias',
+                'ordering': ['-as_of'],
+                'indexes': [models.Index(fields=['company', 'as_of'], name='stockcheckpoint_asof_idx')],
+                'unique_together': {('company', 'product', 'warehouse', 'as_of')},
+            },
+        ),
+    ]
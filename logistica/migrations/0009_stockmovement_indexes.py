@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_replace_role_permission_with_membership_and_invitation'),
+        ('logistica', '0008_stock_checkpoints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['company', 'product', '-timestamp', '-id'], name='stockmov_co_prod_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['company', '-timestamp', '-id'], name='stockmov_co_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistica', '0009_stockmovement_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SatCatalogRelease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imported_at', models.DateTimeField(auto_now_add=True, verbose_name='Importado')),
+                ('source', models.CharField(blank=True, max_length=255, verbose_name='Origen')),
+                ('product_count', models.PositiveIntegerField(default=0, verbose_name='Claves de Producto')),
+                ('unit_count', models.PositiveIntegerField(default=0, verbose_name='Claves de Unidad')),
+            ],
+            options={
+                'verbose_name': 'Actualización de Catálogo SAT',
+                'verbose_name_plural': 'Actualizaciones de Catálogo SAT',
+                'ordering': ['-imported_at'],
+            },
+        ),
+    ]
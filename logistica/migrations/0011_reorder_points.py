@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:14
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_synonym'),
+        ('logistica', '0010_sat_catalog_release'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reorder_point', models.DecimalField(decimal_places=3, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.000'))], verbose_name='Punto de Reorden')),
+                ('max_quantity', models.DecimalField(decimal_places=3, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.000'))], verbose_name='Máximo')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('alerted_at', models.DateTimeField(blank=True, null=True, verbose_name='Alerta Enviada')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_points', to='logistica.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_points', to='logistica.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Punto de Reorden',
+                'verbose_name_plural': 'Puntos de Reorden',
+                'ordering': ['product__sku', 'warehouse__code'],
+                'unique_together': {('company', 'product', 'warehouse')},
+            },
+        ),
+    ]
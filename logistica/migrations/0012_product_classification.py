@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_synonym'),
+        ('logistica', '0011_reorder_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductClassification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('abc_class', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], max_length=1, verbose_name='Clase ABC')),
+                ('xyz_class', models.CharField(choices=[('X', 'X'), ('Y', 'Y'), ('Z', 'Z')], max_length=1, verbose_name='Clase XYZ')),
+                ('consumption_value', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='Valor Consumido')),
+                ('value_share', models.DecimalField(decimal_places=4, max_digits=7, verbose_name='Participación Acumulada')),
+                ('demand_cv', models.DecimalField(decimal_places=4, max_digits=9, null=True, verbose_name='Coef. de Variación')),
+                ('inventory_value', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='Valor en Existencia')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculado')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='classification', to='logistica.product')),
+            ],
+            options={
+                'verbose_name': 'Clasificación ABC/XYZ',
+                'verbose_name_plural': 'Clasificaciones ABC/XYZ',
+                'ordering': ['abc_class', 'xyz_class', '-consumption_value'],
+                'indexes': [models.Index(fields=['company', 'abc_class', 'xyz_class'], name='classification_class_idx')],
+            },
+        ),
+    ]
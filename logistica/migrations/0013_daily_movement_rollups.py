@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_search_synonym'),
+        ('logistica', '0012_product_classification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField(verbose_name='Día')),
+                ('quantity_in', models.DecimalField(decimal_places=3, default=Decimal('0.000'), max_digits=15, verbose_name='Cantidad Entrada')),
+                ('quantity_out', models.DecimalField(decimal_places=3, default=Decimal('0.000'), max_digits=15, verbose_name='Cantidad Salida')),
+                ('value_in', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18, verbose_name='Valor Entrada')),
+                ('value_out', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18, verbose_name='Valor Salida')),
+                ('movement_count', models.PositiveIntegerField(default=0, verbose_name='Movimientos')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_related', to='core.company')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='logistica.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='logistica.warehouse')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Movimientos',
+                'verbose_name_plural': 'Resúmenes Diarios de Movimientos',
+                'ordering': ['-day', 'warehouse', 'product'],
+                'indexes': [models.Index(fields=['company', 'product', 'day'], name='rollup_co_prod_day_idx')],
+                'unique_together': {('company', 'day', 'warehouse', 'product')},
+            },
+        ),
+    ]
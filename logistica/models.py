@@ -122,6 +122,13 @@ class Stock(TenantAwareModel):
         validators=[MinValueValidator(Decimal('0.000'))],
         verbose_name="Cantidad"
     )
+    # Costo promedio móvil (solo productos con costing_method='average')
+    average_cost = models.DecimalField(
+        max_digits=15,
+        decimal_places=4,
+        default=Decimal('0.0000'),
+        verbose_name="Costo Promedio"
+    )
 
     class Meta:
         verbose_name = "Stock"
@@ -164,6 +171,11 @@ class StockMovement(TenantAwareModel):
         verbose_name = "Movimiento de Stock"
         verbose_name_plural = "Movimientos de Stock"
         ordering = ['-timestamp']
+        indexes = [
+            # Kardex de un producto (product_history, cortes "al día") y feed reciente del tenant
+            models.Index(fields=['company', 'product', '-timestamp', '-id'], name='stockmov_co_prod_ts_idx'),
+            models.Index(fields=['company', '-timestamp', '-id'], name='stockmov_co_ts_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Registro inmutable - no permitir updates
@@ -175,6 +187,188 @@ class StockMovement(TenantAwareModel):
         return f"{self.get_movement_type_display()}: {self.product.sku} ({self.quantity_change})"
 
 
+class CostLayer(TenantAwareModel):
+    """
+    Capa de costo PEPS/UEPS — Tenant-Isolated
+
+    Cada entrada de un producto fifo/lifo empuja una capa; las salidas la
+    consumen (quantity_remaining) en orden de received_at. Las capas agotadas
+    quedan como historial y salen del índice parcial de capas abiertas.
+    """
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='cost_layers')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='cost_layers')
+    received_at = models.DateTimeField(verbose_name="Fecha de Entrada")
+    unit_cost = models.DecimalField(max_digits=15, decimal_places=4, verbose_name="Costo Unitario")
+    quantity_received = models.DecimalField(max_digits=15, decimal_places=3, verbose_name="Cantidad Recibida")
+    quantity_remaining = models.DecimalField(max_digits=15, decimal_places=3, verbose_name="Cantidad Disponible")
+    reference = models.CharField(max_length=100, blank=True, verbose_name="Referencia")
+
+    class Meta:
+        verbose_name = "Capa de Costo"
+        verbose_name_plural = "Capas de Costo"
+        ordering = ['received_at', 'id']
+        indexes = [
+            models.Index(
+                fields=['company', 'product', 'warehouse', 'received_at', 'id'],
+                condition=models.Q(quantity_remaining__gt=0),
+                name='costlayer_open_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product.sku} @ {self.warehouse.code}: {self.quantity_remaining}/{self.quantity_received} x {self.unit_cost}"
+
+
+class InventoryValuation(TenantAwareModel):
+    """
+    Resumen de valuación del inventario — Tenant-Isolated
+
+    Una fila por almacén + tipo de producto + categoría con la cantidad y el
+    valor a costo estándar (quantity * product.unit_cost). Se mantiene de forma
+    incremental (ver logistica.valuation) para que los dashboards lean unas
+    cuantas filas en vez de agregar toda la tabla de Stock.
+    """
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='valuations')
+    product_type = models.CharField(max_length=20, choices=Product.PRODUCT_TYPE_CHOICES, verbose_name="Tipo de Producto")
+    category = models.CharField(max_length=100, verbose_name="Categoría")
+    quantity = models.DecimalField(max_digits=18, decimal_places=3, default=Decimal('0.000'), verbose_name="Cantidad")
+    # 3 decimales de cantidad x 2 de costo: se guarda exacto para que los incrementos no acumulen redondeo
+    value = models.DecimalField(max_digits=20, decimal_places=5, default=Decimal('0.00000'), verbose_name="Valor")
+
+    class Meta:
+        verbose_name = "Valuación de Inventario"
+        verbose_name_plural = "Valuaciones de Inventario"
+        ordering = ['warehouse', 'product_type', 'category']
+        unique_together = [['company', 'warehouse', 'product_type', 'category']]
+
+    def __str__(self):
+        return f"{self.warehouse.code} / {self.product_type} / {self.category}: {self.value}"
+
+
+class StockCheckpoint(TenantAwareModel):
+    """
+    Saldo de cierre del Kardex — Tenant-Isolated
+
+    Foto de la existencia por producto y almacén al corte as_of (incluye todos
+    los movimientos con timestamp < as_of). Una consulta "al día X" lee el
+    corte más cercano anterior y solo suma los movimientos posteriores.
+    Las existencias en cero no se guardan.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='checkpoints')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='checkpoints')
+    as_of = models.DateTimeField(verbose_name="Corte")
+    quantity = models.DecimalField(max_digits=15, decimal_places=3, verbose_name="Cantidad")
+
+    class Meta:
+        verbose_name = "Corte de Existencias"
+        verbose_name_plural = "Cortes de Existencias"
+        ordering = ['-as_of']
+        unique_together = [['company', 'product', 'warehouse', 'as_of']]
+        indexes = [
+            models.Index(fields=['company', 'as_of'], name='stockcheckpoint_asof_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.sku} @ {self.warehouse.code} {self.as_of:%Y-%m-%d}: {self.quantity}"
+
+
+class DailyMovementRollup(TenantAwareModel):
+    """
+    Movimientos del Kardex acumulados por día, almacén y producto — Tenant-Isolated
+
+    Entradas y salidas se guardan por separado (cantidad y valor al costo del
+    movimiento), así una gráfica de tendencia lee una fila por día en lugar de
+    cada movimiento. post_movements suma cada lote al día en curso;
+    `manage.py backfill_movement_rollups` reconstruye rangos de fechas.
+    """
+    day = models.DateField(verbose_name="Día")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='daily_rollups')
+    quantity_in = models.DecimalField(max_digits=15, decimal_places=3, default=Decimal('0.000'), verbose_name="Cantidad Entrada")
+    quantity_out = models.DecimalField(max_digits=15, decimal_places=3, default=Decimal('0.000'), verbose_name="Cantidad Salida")
+    value_in = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'), verbose_name="Valor Entrada")
+    value_out = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'), verbose_name="Valor Salida")
+    movement_count = models.PositiveIntegerField(default=0, verbose_name="Movimientos")
+
+    class Meta:
+        verbose_name = "Resumen Diario de Movimientos"
+        verbose_name_plural = "Resúmenes Diarios de Movimientos"
+        ordering = ['-day', 'warehouse', 'product']
+        unique_together = [['company', 'day', 'warehouse', 'product']]
+        indexes = [
+            models.Index(fields=['company', 'product', 'day'], name='rollup_co_prod_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d} {self.product.sku} @ {self.warehouse.code}: +{self.quantity_in} / -{self.quantity_out}"
+
+
+class ReorderPoint(TenantAwareModel):
+    """
+    Parámetros de reabasto por producto y almacén — Tenant-Isolated
+
+    Cuando la existencia llega a reorder_point (o menos) el producto entra en
+    alerta y se sugiere pedir hasta max_quantity. alerted_at marca que la alerta
+    ya se notificó: no se repite hasta que la existencia se recupere.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reorder_points')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='reorder_points')
+    reorder_point = models.DecimalField(
+        max_digits=15, decimal_places=3,
+        validators=[MinValueValidator(Decimal('0.000'))],
+        verbose_name="Punto de Reorden"
+    )
+    max_quantity = models.DecimalField(
+        max_digits=15, decimal_places=3,
+        validators=[MinValueValidator(Decimal('0.000'))],
+        verbose_name="Máximo"
+    )
+    active = models.BooleanField(default=True, verbose_name="Activo")
+    alerted_at = models.DateTimeField(null=True, blank=True, verbose_name="Alerta Enviada")
+
+    class Meta:
+        verbose_name = "Punto de Reorden"
+        verbose_name_plural = "Puntos de Reorden"
+        ordering = ['product__sku', 'warehouse__code']
+        unique_together = [['company', 'product', 'warehouse']]
+
+    def __str__(self):
+        return f"{self.product.sku} @ {self.warehouse.code}: min {self.reorder_point} / max {self.max_quantity}"
+
+
+class ProductClassification(TenantAwareModel):
+    """
+    Clasificación ABC / XYZ de un producto — Tenant-Isolated
+
+    ABC por participación en el valor consumido (salidas × costo unitario) y
+    XYZ por variabilidad de la demanda semanal (coeficiente de variación).
+    Dato derivado: lo recalcula `manage.py classify_inventory` para toda la
+    empresa a la vez, todas las filas con el mismo computed_at.
+    """
+    ABC_CHOICES = [('A', 'A'), ('B', 'B'), ('C', 'C')]
+    XYZ_CHOICES = [('X', 'X'), ('Y', 'Y'), ('Z', 'Z')]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='classification')
+    abc_class = models.CharField(max_length=1, choices=ABC_CHOICES, verbose_name="Clase ABC")
+    xyz_class = models.CharField(max_length=1, choices=XYZ_CHOICES, verbose_name="Clase XYZ")
+    consumption_value = models.DecimalField(max_digits=18, decimal_places=2, verbose_name="Valor Consumido")
+    value_share = models.DecimalField(max_digits=7, decimal_places=4, verbose_name="Participación Acumulada")
+    demand_cv = models.DecimalField(max_digits=9, decimal_places=4, null=True, verbose_name="Coef. de Variación")
+    inventory_value = models.DecimalField(max_digits=18, decimal_places=2, verbose_name="Valor en Existencia")
+    computed_at = models.DateTimeField(verbose_name="Calculado")
+
+    class Meta:
+        verbose_name = "Clasificación ABC/XYZ"
+        verbose_name_plural = "Clasificaciones ABC/XYZ"
+        ordering = ['abc_class', 'xyz_class', '-consumption_value']
+        indexes = [
+            models.Index(fields=['company', 'abc_class', 'xyz_class'], name='classification_class_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.sku}: {self.abc_class}{self.xyz_class}"
+
+
 class Supplier(TenantAwareModel):
     """Supplier/Vendor model — Tenant-Isolated"""
     RFC_VALIDATOR = RegexValidator(
@@ -238,3 +432,24 @@ class SatUnitCode(models.Model):
 
     def __str__(self):
         return f"{self.code} - {self.name}"
+
+
+class SatCatalogRelease(models.Model):
+    """
+    One run of migrate_phpcfdi_catalog (Global for all tenants).
+
+    The latest id is the catalog version: workers compare it against the one
+    their in-memory search index was built from (see logistica.sat_index).
+    """
+    imported_at = models.DateTimeField(auto_now_add=True, verbose_name="Importado")
+    source = models.CharField(max_length=255, blank=True, verbose_name="Origen")
+    product_count = models.PositiveIntegerField(default=0, verbose_name="Claves de Producto")
+    unit_count = models.PositiveIntegerField(default=0, verbose_name="Claves de Unidad")
+
+    class Meta:
+        verbose_name = "Actualización de Catálogo SAT"
+        verbose_name_plural = "Actualizaciones de Catálogo SAT"
+        ordering = ['-imported_at']
+
+    def __str__(self):
+        return f"Catálogo SAT {self.imported_at:%Y-%m-%d %H:%M}"
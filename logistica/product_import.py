@@ -0,0 +1,304 @@
+"""
+Logística Product Import - Bulk CSV/XLSX product catalog import
+KoreBase ERP System
+
+El archivo se lee fila por fila y se procesa en bloques de IMPORT_CHUNK_SIZE:
+cada bloque consulta los SKUs existentes una sola vez y escribe con
+bulk_create/bulk_update. Las reglas de cada campo son las de ProductForm (se
+reutilizan sus campos, sin instanciar un formulario por fila) y las claves SAT
+se validan contra sets en memoria. Los saldos iniciales se postean al final
+como un solo lote de StockMovements.
+"""
+import csv
+import io
+from typing import NamedTuple
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from core import search_cache
+from core.synonyms import fold
+
+from . import valuation
+from .signals import unit_costs_changed
+from .forms import ProductForm
+from .models import Product, SatProductCode, SatUnitCode, Warehouse
+from .services import MovementLine, post_movements
+
+
+IMPORT_CHUNK_SIZE = 1000
+PRODUCT_FIELDS = ProductForm.Meta.fields
+OPENING_REFERENCE = 'Saldo inicial'
+
+# Valores que se usan cuando un producto nuevo no trae la columna (o viene vacía)
+CREATE_DEFAULTS = {
+    'product_type': 'finished',
+    'unit_of_measure': 'PZA',
+    'costing_method': 'average',
+    'active': True,
+}
+BOOLEAN_VALUES = {'si': True, 'yes': True, 'x': True, 'no': False}
+EXTRA_COLUMNS = {
+    'warehouse': 'warehouse', 'almacen': 'warehouse', 'codigo almacen': 'warehouse',
+    'opening_quantity': 'opening_quantity', 'existencia inicial': 'opening_quantity',
+    'saldo inicial': 'opening_quantity', 'stock inicial': 'opening_quantity', 'cantidad': 'opening_quantity',
+}
+
+
+class ProductImportError(ValueError):
+    """The file itself cannot be imported (format, header); nothing was written."""
+
+
+class RowError(NamedTuple):
+    row: int
+    sku: str
+    field: str
+    message: str
+
+
+class ImportResult:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.opening_lines = 0
+        self.errors = []
+
+    @property
+    def skipped_rows(self):
+        return len({error.row for error in self.errors})
+
+
+def _read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        dialect = csv.Sniffer().sniff(text.read(4096), delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    text.seek(0)
+    yield from csv.reader(text, dialect)
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ProductImportError('La importación de XLSX requiere el paquete openpyxl.')
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def _column_key(title):
+    return ' '.join(fold(str(title or '')).replace('_', ' ').split())
+
+
+def _column_map(header):
+    """{column index: field name} for the recognised columns of the header row"""
+    form = ProductForm()
+    aliases = {_column_key(title): name for title, name in EXTRA_COLUMNS.items()}
+    for name in PRODUCT_FIELDS:
+        for title in (name, form.fields[name].label, Product._meta.get_field(name).verbose_name):
+            aliases[_column_key(title)] = name
+
+    columns = {}
+    for position, title in enumerate(header):
+        name = aliases.get(_column_key(title))
+        if name and name not in columns.values():
+            columns[position] = name
+    if 'sku' not in columns.values():
+        raise ProductImportError('El archivo no tiene columna SKU en la primera fila.')
+    return columns
+
+
+def read_rows(file, filename):
+    """Yield (row_number, {field: raw value}) for every non-empty data row"""
+    rows = _read_xlsx(file) if filename.lower().endswith('.xlsx') else _read_csv(file)
+    try:
+        header = next(rows)
+    except StopIteration:
+        raise ProductImportError('El archivo está vacío.')
+    except UnicodeDecodeError:
+        raise ProductImportError('El CSV debe estar codificado en UTF-8.')
+    columns = _column_map(header)
+
+    for row_number, row in enumerate(rows, start=2):
+        values = {name: (row[position] if position < len(row) else '').strip() for position, name in columns.items()}
+        if any(values.values()):
+            yield row_number, values
+
+
+class ProductImporter:
+    """
+    Validate and write product rows for one company.
+
+    Usage: ProductImporter(company, user, dry_run).run(read_rows(file, name)).
+    """
+
+    def __init__(self, company, user, dry_run=False):
+        self.company = company
+        self.user = user
+        self.result = ImportResult(dry_run)
+        self.fields = ProductForm().fields
+        self.choice_labels = {
+            name: {fold(str(label)): value for value, label in self.fields[name].choices}
+            for name in ('product_type', 'unit_of_measure', 'costing_method')
+        }
+        self.quantity_field = forms.DecimalField(min_value=0, max_digits=15, decimal_places=3, required=False)
+        self.product_codes = set(SatProductCode.objects.filter(active=True).values_list('code', flat=True))
+        self.unit_codes = set(SatUnitCode.objects.filter(active=True).values_list('code', flat=True))
+        self.warehouses = {warehouse.code: warehouse for warehouse in Warehouse.objects.filter(company=company)}
+        self.seen_skus = set()
+        self.opening_lines = []
+
+    def run(self, rows):
+        with transaction.atomic():
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    self._process_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._process_chunk(chunk)
+
+            self.result.opening_lines = len(self.opening_lines)
+            if self.opening_lines and not self.result.dry_run:
+                post_movements(self.company, self.user, self.opening_lines)
+
+        if not self.result.dry_run and (self.result.created or self.result.updated):
+            # bulk_create/bulk_update no disparan las señales de Product
+            search_cache.invalidate_on_commit(self.company)
+        return self.result
+
+    def _error(self, row_number, sku, field, message):
+        self.result.errors.append(RowError(row_number, sku, field, message))
+
+    def _raw_value(self, name, raw):
+        if name in self.choice_labels:
+            return self.choice_labels[name].get(fold(raw), raw)
+        if name == 'active':
+            return BOOLEAN_VALUES.get(fold(raw), raw)
+        return raw
+
+    def _clean(self, row_number, values, existing):
+        """
+        Cleaned {field: value} with ProductForm's field rules, or None if the
+        row has errors. New products fill missing or blank cells from
+        CREATE_DEFAULTS; updates leave those fields untouched.
+        """
+        sku = values.get('sku', '')
+        cleaned = {}
+        ok = True
+        for name in PRODUCT_FIELDS:
+            if values.get(name, '') != '':
+                raw = self._raw_value(name, values[name])
+            elif existing is not None:
+                # Una celda vacía en una actualización conserva el valor guardado
+                continue
+            else:
+                raw = CREATE_DEFAULTS.get(name, '')
+            try:
+                cleaned[name] = self.fields[name].clean(raw)
+            except ValidationError as exc:
+                self._error(row_number, sku, name, ' '.join(exc.messages))
+                ok = False
+
+        product_code = cleaned.get('clave_producto_sat')
+        if product_code and product_code not in self.product_codes:
+            self._error(row_number, sku, 'clave_producto_sat', f'La clave {product_code} no existe en el catálogo SAT.')
+            ok = False
+        unit_code = cleaned.get('clave_unidad_sat')
+        if unit_code and unit_code not in self.unit_codes:
+            self._error(row_number, sku, 'clave_unidad_sat', f'La clave de unidad {unit_code} no existe en el catálogo SAT.')
+            ok = False
+        return cleaned if ok else None
+
+    def _opening(self, row_number, values, existing):
+        """(warehouse, quantity) of the row's opening balance, None if absent, False on error"""
+        sku = values.get('sku', '')
+        code = values.get('warehouse', '')
+        try:
+            quantity = self.quantity_field.clean(values.get('opening_quantity', ''))
+        except ValidationError as exc:
+            self._error(row_number, sku, 'opening_quantity', ' '.join(exc.messages))
+            return False
+        if not quantity:
+            return None
+        if existing is not None:
+            self._error(row_number, sku, 'opening_quantity', 'El saldo inicial solo aplica a productos nuevos; use un ajuste de stock.')
+            return False
+        warehouse = self.warehouses.get(code)
+        if warehouse is None:
+            self._error(row_number, sku, 'warehouse', f'Almacén "{code}" no encontrado.' if code else 'Indique el almacén del saldo inicial.')
+            return False
+        return warehouse, quantity
+
+    def _process_chunk(self, chunk):
+        skus = {values.get('sku', '') for _, values in chunk}
+        existing_by_sku = {product.sku: product for product in Product.objects.filter(company=self.company, sku__in=skus)}
+
+        to_create, to_update, openings, revalue = [], [], [], []
+        update_fields = set()
+        now = timezone.now()
+        for row_number, values in chunk:
+            self.result.rows += 1
+            sku = values.get('sku', '')
+            if sku and sku in self.seen_skus:
+                self._error(row_number, sku, 'sku', 'SKU repetido en el archivo.')
+                continue
+            self.seen_skus.add(sku)
+
+            existing = existing_by_sku.get(sku)
+            cleaned = self._clean(row_number, values, existing)
+            opening = self._opening(row_number, values, existing)
+            if cleaned is None or opening is False:
+                continue
+
+            if existing is None:
+                product = Product(company=self.company, **cleaned)
+                to_create.append(product)
+                if opening:
+                    openings.append((product, *opening))
+            else:
+                before = (existing.unit_cost, existing.product_type, existing.category)
+                changed = [name for name, value in cleaned.items() if getattr(existing, name) != value]
+                if not changed:
+                    continue
+                for name in changed:
+                    setattr(existing, name, cleaned[name])
+                existing.updated_at = now
+                update_fields.update(changed)
+                to_update.append(existing)
+                if before != (existing.unit_cost, existing.product_type, existing.category):
+                    revalue.append((existing, before))
+
+        self.result.created += len(to_create)
+        self.result.updated += len(to_update)
+        if self.result.dry_run:
+            self.opening_lines.extend(openings)
+            return
+
+        Product.objects.bulk_create(to_create)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(update_fields | {'updated_at'}))
+        for product, before in revalue:
+            valuation.revalue_product(product, *before)
+        cost_changed = [product.pk for product, before in revalue if before[0] != product.unit_cost]
+        if cost_changed:
+            unit_costs_changed.send(sender=Product, company_id=self.company.pk, product_ids=cost_changed)
+        self.opening_lines.extend(
+            MovementLine(product, warehouse, 'in', quantity, OPENING_REFERENCE, 'Importación de productos', product.unit_cost)
+            for product, warehouse, quantity in openings
+        )
+
+
+def import_products(company, user, file, filename, dry_run=False):
+    """Import a CSV/XLSX product file; returns an ImportResult"""
+    return ProductImporter(company, user, dry_run).run(read_rows(file, filename))
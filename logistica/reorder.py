@@ -0,0 +1,118 @@
+"""
+Logística Reorder - Reorder points and low-stock alerts
+KoreBase ERP System
+
+El evaluador compara todos los ReorderPoint de un alcance contra su Stock en
+una sola consulta y solo trae las filas cuyo estado cambió: las que acaban de
+caer a su punto de reorden (se notifican y se marcan con alerted_at) y las que
+ya se recuperaron (se desmarcan). Un faltante se notifica una sola vez, sin
+importar cuántos lotes de movimientos pasen mientras sigue abajo.
+
+Corre después de cada lote de post_movements (solo sobre las filas tocadas) y
+periódicamente por empresa con `manage.py evaluate_reorder_points`.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import CompanyMembership, CustomUser
+from core.notifications import notify
+
+from .models import ReorderPoint, Stock
+
+
+ALERT_ROLES = ('owner', 'admin', 'operator')
+ALERT_SKUS_IN_MESSAGE = 3
+# Más productos que esto en un lote: se evalúa la empresa completa (una consulta sin IN gigante)
+SCOPE_LIMIT = 2000
+UPDATE_CHUNK_SIZE = 2000
+
+
+def with_on_hand(queryset):
+    """Annotate ReorderPoint rows with the quantity of their Stock row (0 if none)"""
+    stock = Stock.objects.filter(
+        company=OuterRef('company'), product=OuterRef('product'), warehouse=OuterRef('warehouse'),
+    ).values('quantity')[:1]
+    return queryset.annotate(
+        on_hand=Coalesce(Subquery(stock), Value(Decimal('0')), output_field=DecimalField(max_digits=15, decimal_places=3)),
+    )
+
+
+def below_reorder_point(company):
+    """Active reorder points at or below their minimum, with on_hand annotated"""
+    return with_on_hand(ReorderPoint.objects.filter(company=company, active=True)).filter(
+        on_hand__lte=F('reorder_point'),
+    )
+
+
+def _scope(company, keys):
+    points = ReorderPoint.objects.filter(company=company, active=True)
+    if keys is None:
+        return points
+    product_ids = {product_id for product_id, _ in keys}
+    if len(product_ids) > SCOPE_LIMIT:
+        return points
+    return points.filter(product_id__in=product_ids, warehouse_id__in={warehouse_id for _, warehouse_id in keys})
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for offset in range(0, len(ids), UPDATE_CHUNK_SIZE):
+        yield ids[offset:offset + UPDATE_CHUNK_SIZE]
+
+
+def _recipients(company):
+    """Active users of the company with write access (same rule as require_can_write)"""
+    read_only = CompanyMembership.objects.filter(company=company).exclude(role__in=ALERT_ROLES)
+    return CustomUser.objects.filter(is_active=True, company=company).exclude(pk__in=read_only.values('user_id'))
+
+
+def _alert_message(points):
+    if len(points) == 1:
+        point = points[0]
+        return (f'Stock bajo: {point.product.sku} en {point.warehouse.code} '
+                f'({point.on_hand.normalize():f} / mínimo {point.reorder_point.normalize():f})')
+    skus = ', '.join(point.product.sku for point in points[:ALERT_SKUS_IN_MESSAGE])
+    more = '…' if len(points) > ALERT_SKUS_IN_MESSAGE else ''
+    return f'{len(points)} productos llegaron a su punto de reorden: {skus}{more}'[:255]
+
+
+def evaluate(company, keys=None):
+    """
+    Raise low-stock alerts for `company` and clear the recovered ones.
+
+    `keys` limits the evaluation to {(product_id, warehouse_id)} (the rows a
+    batch touched); None evaluates every reorder point of the tenant. Each
+    user with write access gets at most one notification per call, however
+    many items fell below their minimum. Returns (alerted, recovered) counts.
+    """
+    points = with_on_hand(_scope(company, keys)).filter(
+        Q(on_hand__lte=F('reorder_point'), alerted_at__isnull=True)
+        | Q(on_hand__gt=F('reorder_point'), alerted_at__isnull=False)
+    ).select_related('product', 'warehouse').order_by('product__sku', 'warehouse__code')
+
+    low, recovered = [], []
+    for point in points:
+        (low if point.on_hand <= point.reorder_point else recovered).append(point)
+
+    for ids in _chunks(point.pk for point in recovered):
+        ReorderPoint.objects.filter(pk__in=ids).update(alerted_at=None)
+
+    # Se reclaman solo las filas aún sin alerta: dos evaluaciones simultáneas no notifican dos veces
+    now = timezone.now()
+    for ids in _chunks(point.pk for point in low):
+        ReorderPoint.objects.filter(pk__in=ids, alerted_at__isnull=True).update(alerted_at=now)
+    claimed = set()
+    for ids in _chunks(point.pk for point in low):
+        claimed.update(ReorderPoint.objects.filter(pk__in=ids, alerted_at=now).values_list('pk', flat=True))
+    low = [point for point in low if point.pk in claimed]
+
+    if low:
+        message = _alert_message(low)
+        link = reverse('logistica:reorder_point_list') + '?below=1'
+        for user in _recipients(company):
+            notify(user, message, 'warning', link)
+    return len(low), len(recovered)
@@ -0,0 +1,220 @@
+"""
+Logística Rollups - Daily movement totals
+KoreBase ERP System
+
+DailyMovementRollup acumula el Kardex por empresa, día, almacén y producto.
+Cada lote de post_movements suma sus totales con un INSERT ... ON CONFLICT DO
+UPDATE (la suma la hace la base de datos, sin leer la fila antes), y
+rebuild() recalcula un rango de días cerrados (hasta ayer; el día en curso
+solo lo escribe post_movements) desde StockMovement con una consulta
+agrupada, y lo repite si un lote de medianoche le gana una fila nueva;
+`manage.py backfill_movement_rollups` reparte los rangos entre varios
+hilos. Ambos caminos redondean el valor de cada movimiento antes de
+sumarlo, así que dan el mismo total. Las gráficas leen O(días) filas en lugar
+de O(movimientos).
+"""
+import datetime
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Abs, Round, TruncDate
+from django.utils import timezone
+
+from .models import DailyMovementRollup, StockMovement
+
+
+ZERO_QTY = Decimal('0.000')
+ZERO_VALUE = Decimal('0.00')
+UPSERT_CHUNK_SIZE = 500
+WRITE_BATCH_SIZE = 2000
+REBUILD_ATTEMPTS = 3
+SUMMED = ('quantity_in', 'quantity_out', 'value_in', 'value_out', 'movement_count')
+
+
+def _supports_upsert():
+    """INSERT ... ON CONFLICT DO UPDATE: PostgreSQL, SQLite >= 3.24"""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 24, 0)
+
+
+def _day_bounds(start, end):
+    """Aware datetimes covering the local days start..end (inclusive)"""
+    return (
+        timezone.make_aware(datetime.datetime.combine(start, datetime.time.min)),
+        timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)),
+    )
+
+
+def _movement_totals(movement):
+    # Mitad hacia arriba, como ROUND() en SQL: rebuild() redondea igual cada movimiento
+    value = (abs(movement.quantity_change) * movement.unit_cost_at_movement).quantize(ZERO_VALUE, ROUND_HALF_UP)
+    if movement.quantity_change >= 0:
+        return movement.quantity_change, ZERO_QTY, value, ZERO_VALUE
+    return ZERO_QTY, -movement.quantity_change, ZERO_VALUE, value
+
+
+def _upsert(company, deltas, now):
+    """Add every delta with one INSERT ... ON CONFLICT DO UPDATE per chunk"""
+    opts = DailyMovementRollup._meta
+    names = ('company', 'day', 'warehouse', 'product', *SUMMED, 'created_at', 'updated_at')
+    fields = [opts.get_field(name) for name in names]
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    columns = ', '.join(qn(field.column) for field in fields)
+    key_columns = ', '.join(qn(field.column) for field in fields[:4])
+    # ROUND: en SQLite la suma es de punto flotante; en PostgreSQL no cambia nada
+    assignments = []
+    for field in fields[4:9]:
+        column = qn(field.column)
+        total = f'{table}.{column} + EXCLUDED.{column}'
+        if field.name != 'movement_count':
+            total = f'ROUND({total}, {field.decimal_places})'
+        assignments.append(f'{column} = {total}')
+    updated_at = qn(fields[-1].column)
+    assignments.append(f'{updated_at} = EXCLUDED.{updated_at}')
+
+    items = sorted(deltas.items())
+    for offset in range(0, len(items), UPSERT_CHUNK_SIZE):
+        chunk = items[offset:offset + UPSERT_CHUNK_SIZE]
+        params = []
+        for (day, warehouse_id, product_id), totals in chunk:
+            values = (company.pk, day, warehouse_id, product_id, *totals, now, now)
+            params.extend(field.get_db_prep_save(value, connection) for field, value in zip(fields, values))
+        placeholders = ', '.join([f"({', '.join(['%s'] * len(fields))})"] * len(chunk))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+                f'ON CONFLICT ({key_columns}) DO UPDATE SET {", ".join(assignments)}',
+                params,
+            )
+
+
+def _increment(company, deltas, now):
+    """Fallback without upserts: insert missing rows, then one UPDATE ... = col + delta per row"""
+    DailyMovementRollup.objects.bulk_create(
+        [
+            DailyMovementRollup(company=company, day=day, warehouse_id=warehouse_id, product_id=product_id)
+            for day, warehouse_id, product_id in sorted(deltas)
+        ],
+        ignore_conflicts=True,
+    )
+    for (day, warehouse_id, product_id), totals in sorted(deltas.items()):
+        DailyMovementRollup.objects.filter(
+            company=company, day=day, warehouse_id=warehouse_id, product_id=product_id,
+        ).update(updated_at=now, **{name: F(name) + total for name, total in zip(SUMMED, totals)})
+
+
+def record_movements(company, movements):
+    """
+    Fold a batch of freshly posted StockMovements into the daily rollups.
+
+    Must run in the posting transaction: the rollup rows are locked (in key
+    order, so concurrent batches never deadlock) until it commits.
+    """
+    deltas = defaultdict(lambda: [ZERO_QTY, ZERO_QTY, ZERO_VALUE, ZERO_VALUE, 0])
+    for movement in movements:
+        delta = deltas[(timezone.localdate(movement.timestamp), movement.warehouse_id, movement.product_id)]
+        for position, total in enumerate(_movement_totals(movement)):
+            delta[position] += total
+        delta[4] += 1
+    if not deltas:
+        return
+
+    now = timezone.now()
+    if _supports_upsert():
+        _upsert(company, deltas, now)
+    else:
+        _increment(company, deltas, now)
+
+
+def _grouped(company, start, end):
+    """One row per (day, warehouse, product) of the movements of the local days start..end"""
+    since, until = _day_bounds(start, end)
+    # Valor de cada movimiento redondeado a centavos antes de sumar, igual que _movement_totals
+    value = Round(
+        ExpressionWrapper(
+            Abs(F('quantity_change')) * F('unit_cost_at_movement'),
+            output_field=DecimalField(max_digits=30, decimal_places=5),
+        ),
+        2,
+        output_field=DecimalField(max_digits=30, decimal_places=2),
+    )
+    return StockMovement.objects.filter(
+        company=company, timestamp__gte=since, timestamp__lt=until,
+    ).annotate(day=TruncDate('timestamp')).values('day', 'warehouse_id', 'product_id').annotate(
+        quantity_in=Sum(Case(When(quantity_change__gt=0, then=F('quantity_change')), default=Value(ZERO_QTY))),
+        quantity_out=Sum(Case(When(quantity_change__lt=0, then=-F('quantity_change')), default=Value(ZERO_QTY))),
+        value_in=Sum(Case(When(quantity_change__gt=0, then=value), default=Value(ZERO_VALUE))),
+        value_out=Sum(Case(When(quantity_change__lt=0, then=value), default=Value(ZERO_VALUE))),
+        movement_count=Count('id'),
+    ).order_by()
+
+
+def rebuild(company, start, end):
+    """
+    Recompute the rollups of the local days start..end (inclusive) from the ledger.
+
+    `end` is capped at yesterday: today's rows are only written by
+    record_movements. The range is deleted before the ledger is read, which
+    takes the write locks first (row locks in PostgreSQL, the database write
+    lock in SQLite), so a batch still committing is waited for and read. A
+    batch from just before midnight can still insert a row for a key the
+    range did not have; the insert then conflicts and the whole range is
+    rebuilt again, now seeing that batch. Ranges of one tenant do not overlap
+    so several can be rebuilt in parallel. Returns the number of rows written.
+    """
+    end = min(end, timezone.localdate() - datetime.timedelta(days=1))
+    if start > end:
+        return 0
+    for attempt in range(1, REBUILD_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                DailyMovementRollup.objects.filter(company=company, day__gte=start, day__lte=end).delete()
+                rows = [
+                    DailyMovementRollup(
+                        company=company,
+                        day=row['day'],
+                        warehouse_id=row['warehouse_id'],
+                        product_id=row['product_id'],
+                        quantity_in=Decimal(str(row['quantity_in'])).quantize(ZERO_QTY),
+                        quantity_out=Decimal(str(row['quantity_out'])).quantize(ZERO_QTY),
+                        value_in=Decimal(str(row['value_in'])).quantize(ZERO_VALUE),
+                        value_out=Decimal(str(row['value_out'])).quantize(ZERO_VALUE),
+                        movement_count=row['movement_count'],
+                    )
+                    for row in _grouped(company, start, end).iterator(chunk_size=WRITE_BATCH_SIZE)
+                ]
+                DailyMovementRollup.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+            return len(rows)
+        except IntegrityError:
+            # Un lote confirmó una fila nueva del rango mientras se reconstruía: se repite con ella
+            if attempt == REBUILD_ATTEMPTS:
+                raise
+
+
+def daily_totals(company, start, end, **filters):
+    """
+    [{'day', 'quantity_in', 'quantity_out', 'value_in', 'value_out'}] for every
+    day start..end, zero-filled. `filters` narrow the rollups
+    (warehouse=..., product__category=...).
+    """
+    totals = {
+        row['day']: row
+        for row in DailyMovementRollup.objects.filter(
+            company=company, day__gte=start, day__lte=end, **filters,
+        ).values('day').annotate(
+            quantity_in=Sum('quantity_in'), quantity_out=Sum('quantity_out'),
+            value_in=Sum('value_in'), value_out=Sum('value_out'),
+        ).order_by()
+    }
+    days = []
+    day = start
+    while day <= end:
+        days.append(totals.get(day, {
+            'day': day, 'quantity_in': ZERO_QTY, 'quantity_out': ZERO_QTY, 'value_in': ZERO_VALUE, 'value_out': ZERO_VALUE,
+        }))
+        day += datetime.timedelta(days=1)
+    return days
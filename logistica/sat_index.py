@@ -0,0 +1,244 @@
+"""
+Logística SAT Index - In-process search over the SAT product catalog
+KoreBase ERP System
+
+El catálogo de claves (~52k filas) es global y solo cambia cuando corre
+migrate_phpcfdi_catalog, así que cada worker lo carga una vez en memoria y
+responde las búsquedas sin tocar la base de datos. El ranking es el mismo en
+PostgreSQL y en SQLite porque ya no depende de pg_trgm ni de icontains.
+"""
+import bisect
+import functools
+import threading
+import time
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.db.models import Max
+
+from core.synonyms import fold, token_expansions, tokenize
+
+from .models import SatCatalogRelease, SatProductCode
+
+
+RECHECK_SECONDS = 30
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.75
+FUZZY_WEIGHT = 0.5
+FUZZY_THRESHOLD = 0.45
+RANK_CACHE_SIZE = 256
+
+def _trigrams(word):
+    """Trigram set of a word, padded like pg_trgm"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SatMatch(NamedTuple):
+    """One search hit; results are ordered by (-similarity, description, code)"""
+    similarity: float
+    description: str
+    code: str
+
+    @property
+    def cursor(self):
+        """Opaque keyset position of this hit (see SatCatalogIndex.parse_cursor)"""
+        return f'{self.similarity:.6f}:{self.code}'
+
+
+class SatCatalogIndex:
+    """
+    Token and prefix index over the active SatProductCode rows.
+
+    Entries are numbered in (description, code) order, so an entry id doubles
+    as the tie-breaker of the ranking and the catalog listing needs no sort.
+
+    Every listing is read by seeking past a cursor (similarity, code) instead of
+    an offset: there is no COUNT and page 50 costs the same as page 1.
+    """
+
+    def __init__(self, rows):
+        rows = sorted((description, code) for code, description in rows)
+        self.descriptions = [description for description, _ in rows]
+        self.codes = [code for _, code in rows]
+        self._word_counts = []
+
+        postings = defaultdict(list)
+        for entry_id, description in enumerate(self.descriptions):
+            words = set(tokenize(description))
+            self._word_counts.append(len(words) or 1)
+            for word in words:
+                postings[word].append(entry_id)
+
+        self._postings = dict(postings)
+        self._vocabulary = sorted(self._postings)
+        self._code_order = sorted(range(len(self.codes)), key=self.codes.__getitem__)
+        self._sorted_codes = [self.codes[entry_id] for entry_id in self._code_order]
+        self._entry_by_code = {code: entry_id for entry_id, code in enumerate(self.codes)}
+        self._trigram_index = None
+        # Ranking por consulta: el scroll infinito pide varias páginas de la misma búsqueda
+        self._ranked = functools.lru_cache(maxsize=RANK_CACHE_SIZE)(self._rank)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def match(self, entry_id, similarity=1.0):
+        return SatMatch(similarity, self.descriptions[entry_id], self.codes[entry_id])
+
+    def parse_cursor(self, cursor):
+        """(similarity, entry_id) of a SatMatch.cursor, or None if it is not in this index"""
+        similarity, _, code = (cursor or '').partition(':')
+        try:
+            similarity = float(similarity)
+        except ValueError:
+            return None
+        entry_id = self._entry_by_code.get(code)
+        return None if entry_id is None else (similarity, entry_id)
+
+    def catalog(self, reverse=False, after=None, limit=30):
+        """Active entries ordered by description, starting after `after`"""
+        if after is None:
+            start = len(self) - 1 if reverse else 0
+        else:
+            start = after[1] - 1 if reverse else after[1] + 1
+        entry_ids = range(start, max(start - limit, -1), -1) if reverse else range(start, min(start + limit, len(self)))
+        return [self.match(entry_id) for entry_id in entry_ids]
+
+    def search_code(self, prefix, after=None, limit=30):
+        """Entries whose code starts with `prefix`, ordered by code, starting after `after`"""
+        start = bisect.bisect_left(self._sorted_codes, prefix)
+        if after is not None:
+            start = max(start, bisect.bisect_right(self._sorted_codes, self.codes[after[1]]))
+        end = min(bisect.bisect_left(self._sorted_codes, prefix + '\uffff'), start + limit)
+        return [self.match(entry_id) for entry_id in self._code_order[start:end]]
+
+    def _prefix_words(self, token):
+        start = bisect.bisect_left(self._vocabulary, token)
+        end = bisect.bisect_left(self._vocabulary, token + '\uffff')
+        return self._vocabulary[start:end]
+
+    def _fuzzy_words(self, token):
+        """Vocabulary words within FUZZY_THRESHOLD trigram similarity of `token`"""
+        if self._trigram_index is None:
+            # Solo se construye la primera vez que una búsqueda no encuentra nada exacto
+            trigram_index = defaultdict(list)
+            for word in self._vocabulary:
+                for trigram in _trigrams(word):
+                    trigram_index[trigram].append(word)
+            self._trigram_index = dict(trigram_index)
+
+        wanted = _trigrams(token)
+        shared = defaultdict(int)
+        for trigram in wanted:
+            for word in self._trigram_index.get(trigram, ()):
+                shared[word] += 1
+        words = []
+        for word, common in shared.items():
+            similarity = common / (len(wanted) + len(_trigrams(word)) - common)
+            if similarity >= FUZZY_THRESHOLD:
+                words.append((word, similarity))
+        return words
+
+    def _token_hits(self, alternatives):
+        """{entry_id: weight} for one query token and its synonyms"""
+        hits = {}
+        for token in alternatives:
+            for entry_id in self._postings.get(token, ()):
+                hits[entry_id] = EXACT_WEIGHT
+        for token in alternatives:
+            for word in self._prefix_words(token):
+                for entry_id in self._postings[word]:
+                    hits.setdefault(entry_id, PREFIX_WEIGHT)
+        if not hits:
+            for token in alternatives:
+                for word, similarity in self._fuzzy_words(token):
+                    weight = FUZZY_WEIGHT * similarity
+                    for entry_id in self._postings[word]:
+                        if hits.get(entry_id, 0) < weight:
+                            hits[entry_id] = weight
+        return hits
+
+    def _rank(self, groups, reverse):
+        """Sorted [(-similarity, order, entry_id)] of the entries matching every token group"""
+        scores = None
+        for alternatives in groups:
+            hits = self._token_hits(alternatives)
+            if scores is None:
+                scores = hits
+            else:
+                scores = {entry_id: scores[entry_id] + weight for entry_id, weight in hits.items() if entry_id in scores}
+            if not scores:
+                return []
+
+        ranked = []
+        for entry_id, weight in scores.items():
+            coverage = min(len(groups) / self._word_counts[entry_id], 1.0)
+            similarity = round((weight + coverage) / (len(groups) + 1), 6)
+            ranked.append((-similarity, -entry_id if reverse else entry_id, entry_id))
+        ranked.sort()
+        return ranked
+
+    def search(self, query, synonyms=None, reverse=False, after=None, limit=30):
+        """
+        Entries matching every token of `query` (accent-folded, prefix-aware).
+
+        Each token also matches the synonyms of every term it starts with
+        ({term: [expansions]}, see core.synonyms.token_expansions). Similarity
+        is the mean token weight (exact > prefix > fuzzy) blended with how much
+        of the description the query covers, so short exact hits rank first.
+        """
+        synonyms = synonyms or {}
+        groups = tuple(
+            (token, *(fold(alt) for alt in token_expansions(synonyms, token)))
+            for token in dict.fromkeys(tokenize(query))
+        )
+        if not groups:
+            return []
+
+        ranked = self._ranked(groups, reverse)
+        start = 0
+        if after is not None:
+            similarity, entry_id = after
+            start = bisect.bisect_right(ranked, (-round(similarity, 6), -entry_id if reverse else entry_id, entry_id))
+        return [self.match(entry_id, -negated) for negated, _, entry_id in ranked[start:start + limit]]
+
+
+_lock = threading.Lock()
+_index = None
+_release = None
+_checked_at = 0.0
+
+
+def _latest_release():
+    return SatCatalogRelease.objects.aggregate(latest=Max('id'))['latest']
+
+
+def get_index():
+    """
+    This worker's catalog index, rebuilt when a newer SatCatalogRelease exists.
+
+    The release id is read at most every RECHECK_SECONDS, so a catalog import
+    reaches every worker within that window without a query per keystroke.
+    """
+    global _index, _release, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < RECHECK_SECONDS:
+        return _index
+
+    with _lock:
+        if _index is None or now - _checked_at >= RECHECK_SECONDS:
+            release = _latest_release()
+            if _index is None or release != _release:
+                rows = SatProductCode.objects.filter(active=True).values_list('code', 'description')
+                _index = SatCatalogIndex(rows.iterator(chunk_size=5000))
+                _release = release
+            _checked_at = now
+    return _index
+
+
+def invalidate():
+    """Drop this worker's index; the next search reloads it from the database"""
+    global _index, _checked_at
+    with _lock:
+        _index = None
+        _checked_at = 0.0
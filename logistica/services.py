@@ -0,0 +1,406 @@
+"""
+Logística Services - Stock posting
+KoreBase ERP System
+
+Todas las escrituras al Kardex deben pasar por aquí: las vistas solo validan
+formularios y delegan el posteo para que el bloqueo de filas y el cálculo de
+saldos sea idéntico en una captura manual y en un lote de cientos de líneas.
+"""
+import functools
+import uuid
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import reorder, rollups, valuation
+from .costing import COST_PLACES, CostLedger, movement_cost
+from .models import Stock, StockMovement
+
+
+ZERO_QTY = Decimal('0.000')
+LOCK_CHUNK_SIZE = 2000
+# unit_cost de una entrada de producción: el costo real de lo emitido antes en el mismo lote
+ISSUED_COST = object()
+
+
+class StockPostingError(ValueError):
+    """Raised when a batch cannot be posted; the whole batch is rolled back."""
+
+    def __init__(self, message, line=None, available=None, key=None):
+        super().__init__(message)
+        self.line = line
+        self.available = available
+        self.key = key
+
+
+class MovementLine(NamedTuple):
+    """
+    One line of a posting batch.
+
+    quantity semantics follow StockMovementForm:
+      - in:         quantity received (added)
+      - out:        quantity issued (subtracted)
+      - adjustment: counted quantity (stock is set to this value)
+      - transfer:   signed delta (positive arrives, negative leaves)
+
+    unit_cost only applies to inbound quantities; when omitted the product's
+    standard unit_cost is used, except for an arriving transfer line, which
+    takes the cost of the leaving transfer line of the same product posted
+    before it in the batch (see post_transfer). With unit_cost=ISSUED_COST an
+    inbound line is costed at the goods issued by the batch since the previous
+    ISSUED_COST line (a production receipt: components out, finished good in).
+    Outbound quantities are always costed by the product's costing_method (see
+    costing.CostLedger).
+    """
+    product: object
+    warehouse: object
+    movement_type: str
+    quantity: Decimal
+    reference: str = ''
+    notes: str = ''
+    unit_cost: Decimal = None
+
+
+def _lock_stock_rows(company, keys):
+    """
+    Upsert and lock every Stock row touched by the batch.
+
+    Missing rows are inserted first (ON CONFLICT DO NOTHING), then all rows are
+    locked ordered by (product, warehouse) so two batches touching the same
+    rows always acquire locks in the same order: for a transfer both rows of a
+    product are taken in warehouse-id order whichever way the goods move.
+    Very large batches (e.g. an opening-balance import) are read in product-id
+    chunks, which keeps both the lock order and the query parameter count
+    bounded.
+    """
+    product_ids = sorted({product_id for product_id, _ in keys})
+    warehouse_ids = {warehouse_id for _, warehouse_id in keys}
+    scopes = [
+        Stock.objects.filter(
+            company=company,
+            product_id__in=product_ids[offset:offset + LOCK_CHUNK_SIZE],
+            warehouse_id__in=warehouse_ids,
+        )
+        for offset in range(0, len(product_ids), LOCK_CHUNK_SIZE)
+    ]
+
+    existing = set()
+    for scope in scopes:
+        existing.update(scope.values_list('product_id', 'warehouse_id'))
+    missing = sorted(key for key in keys if key not in existing)
+    if missing:
+        Stock.objects.bulk_create(
+            [
+                Stock(company=company, product_id=product_id, warehouse_id=warehouse_id, quantity=ZERO_QTY)
+                for product_id, warehouse_id in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+    stocks = {}
+    for scope in scopes:
+        for stock in scope.select_for_update().order_by('product_id', 'warehouse_id'):
+            if (stock.product_id, stock.warehouse_id) in keys:
+                stocks[(stock.product_id, stock.warehouse_id)] = stock
+    return stocks
+
+
+def _supports_returning_upsert():
+    """INSERT ... ON CONFLICT DO UPDATE ... RETURNING: PostgreSQL, SQLite >= 3.35"""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35, 0)
+
+
+def _upsert_increments(company, deltas, allow_negative, now):
+    """
+    Apply every delta with one INSERT ... ON CONFLICT DO UPDATE per chunk.
+
+    The database adds the delta to whatever the row holds at that instant and
+    returns the result, so there is no read-modify-write in Python: the row
+    lock is taken by the UPDATE itself and no value read earlier can be stale.
+    Rows are written in (product, warehouse) order, the same lock order as
+    _lock_stock_rows. Returns ({key: Stock}, refused keys).
+    """
+    opts = Stock._meta
+    fields = [opts.get_field(name) for name in (
+        'company', 'product', 'warehouse', 'quantity', 'average_cost', 'created_at', 'updated_at',
+    )]
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    columns = ', '.join(qn(field.column) for field in fields)
+    company_col, product_col, warehouse_col, quantity_col = (qn(field.column) for field in fields[:4])
+    # ROUND: en SQLite la suma es de punto flotante; en PostgreSQL no cambia nada
+    new_quantity = f'ROUND({table}.{quantity_col} + EXCLUDED.{quantity_col}, 3)'
+    # Solo se rechazan decrementos: una entrada a un saldo ya negativo siempre procede
+    guard = '' if allow_negative else f'WHERE EXCLUDED.{quantity_col} >= 0 OR {new_quantity} >= 0'
+
+    stocks, refused = {}, []
+    items = sorted(deltas.items())
+    for offset in range(0, len(items), LOCK_CHUNK_SIZE):
+        chunk = items[offset:offset + LOCK_CHUNK_SIZE]
+        params = []
+        for (product_id, warehouse_id), delta in chunk:
+            values = (company.pk, product_id, warehouse_id, delta, Decimal('0'), now, now)
+            params.extend(field.get_db_prep_save(value, connection) for field, value in zip(fields, values))
+        placeholders = ', '.join([f"({', '.join(['%s'] * len(fields))})"] * len(chunk))
+        sql = (
+            f'INSERT INTO {table} ({columns}) VALUES {placeholders} '
+            f'ON CONFLICT ({company_col}, {product_col}, {warehouse_col}) DO UPDATE '
+            f'SET {quantity_col} = {new_quantity}, {qn(fields[6].column)} = EXCLUDED.{qn(fields[6].column)} {guard} '
+            f'RETURNING {qn(opts.pk.column)}, {product_col}, {warehouse_col}, {quantity_col}, {qn(fields[4].column)}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            returned = cursor.fetchall()
+
+        for pk, product_id, warehouse_id, quantity, average_cost in returned:
+            stocks[(product_id, warehouse_id)] = Stock(
+                pk=pk, company=company, product_id=product_id, warehouse_id=warehouse_id,
+                quantity=Decimal(str(quantity)).quantize(ZERO_QTY),
+                average_cost=Decimal(str(average_cost)).quantize(COST_PLACES),
+                updated_at=now,
+            )
+        for key, delta in chunk:
+            # Sin fila devuelta: el WHERE la rechazó. Negativa: fila nueva insertada con delta < 0
+            if key not in stocks or (delta < 0 and not allow_negative and stocks[key].quantity < 0):
+                refused.append(key)
+    return stocks, refused
+
+
+def _locked_increments(company, deltas, allow_negative, now):
+    """Same contract as _upsert_increments for backends without RETURNING upserts"""
+    stocks = _lock_stock_rows(company, set(deltas))
+    refused = []
+    for key, delta in sorted(deltas.items()):
+        stock = stocks[key]
+        if delta < 0 and stock.quantity + delta < 0 and not allow_negative:
+            refused.append(key)
+        stock.quantity += delta
+        stock.updated_at = now
+    if not refused:
+        Stock.objects.bulk_update(list(stocks.values()), ['quantity', 'updated_at'])
+    return stocks, refused
+
+
+def increment_stock(company, deltas, allow_negative=False):
+    """
+    Atomically add signed quantities to Stock rows, creating missing rows.
+
+    `deltas` is {(product_id, warehouse_id): Decimal}. The increment happens
+    in the database (INSERT ... ON CONFLICT DO UPDATE SET quantity = quantity
+    + delta RETURNING quantity) and leaves the rows locked until the
+    surrounding transaction ends. Unless allow_negative is set, a negative
+    delta that would leave its row below zero is refused and StockPostingError is raised (with
+    `key` and `available`); the caller's transaction must then roll back.
+    Backends without RETURNING upserts fall back to SELECT ... FOR UPDATE with
+    the same result. Returns {key: Stock} holding the new quantities.
+    """
+    if not deltas:
+        return {}
+    now = timezone.now()
+    with transaction.atomic():
+        if _supports_returning_upsert():
+            stocks, refused = _upsert_increments(company, deltas, allow_negative, now)
+        else:
+            stocks, refused = _locked_increments(company, deltas, allow_negative, now)
+
+        if refused:
+            key = refused[0]
+            if key in stocks:
+                available = stocks[key].quantity - deltas[key]
+            else:
+                available = Stock.objects.filter(
+                    company=company, product_id=key[0], warehouse_id=key[1],
+                ).values_list('quantity', flat=True).first() or ZERO_QTY
+            raise StockPostingError(
+                f'Stock insuficiente (producto {key[0]}, almacén {key[1]}). Disponible: {available}',
+                key=key,
+                available=available,
+            )
+    return stocks
+
+
+def _signed_change(line, balance):
+    """Return the quantity_change a line produces against the current balance."""
+    if line.movement_type == 'in':
+        return line.quantity
+    if line.movement_type == 'out':
+        return -line.quantity
+    if line.movement_type == 'adjustment':
+        return line.quantity - balance
+    if line.movement_type == 'transfer':
+        return line.quantity
+    raise StockPostingError(f'Tipo de movimiento inválido: {line.movement_type}', line=line)
+
+
+def _insufficient(line, available):
+    return StockPostingError(
+        f'Stock insuficiente de {line.product.sku} en {line.warehouse.name}. '
+        f'Disponible: {available}',
+        line=line,
+        available=available,
+    )
+
+
+def post_movements(company, user, lines, allow_negative=False):
+    """
+    Post a batch of stock movements in one transaction.
+
+    Lines are applied in the given order, so several lines for the same
+    product/warehouse produce a consistent running_balance sequence. If any
+    line would leave stock negative a StockPostingError is raised and nothing
+    is written (unless allow_negative is set). Each movement is stamped with
+    the real cost of the goods it moved. Returns the created StockMovement
+    instances.
+
+    Quantities are applied with increment_stock: the net delta of every row
+    is added in the database, which also locks the rows. Rows with an
+    'adjustment' line (a counted quantity, so the delta depends on the
+    balance) get a zero delta to lock them and are written afterwards.
+    """
+    lines = [line if isinstance(line, MovementLine) else MovementLine(*line) for line in lines]
+    if not lines:
+        return []
+
+    products = {line.product.pk: line.product for line in lines}
+    counted = {(line.product.pk, line.warehouse.pk) for line in lines if line.movement_type == 'adjustment'}
+    deltas = {}
+    for line in lines:
+        key = (line.product.pk, line.warehouse.pk)
+        delta = ZERO_QTY if key in counted else _signed_change(line, None)
+        deltas[key] = deltas.get(key, ZERO_QTY) + delta
+
+    with transaction.atomic():
+        try:
+            stocks = increment_stock(company, deltas, allow_negative)
+        except StockPostingError as exc:
+            line = next(line for line in lines if (line.product.pk, line.warehouse.pk) == exc.key)
+            raise _insufficient(line, exc.available) from None
+
+        # Se reproduce el lote desde el saldo anterior para los saldos corridos y el costeo
+        for key, stock in stocks.items():
+            stock.quantity -= deltas[key]
+        average_costs = {key: stock.average_cost for key, stock in stocks.items()}
+        ledger = CostLedger(company, stocks, products)
+        now = timezone.now()
+
+        movements = []
+        transfer_costs = {}
+        issued = None
+        for line in lines:
+            stock = stocks[(line.product.pk, line.warehouse.pk)]
+            quantity_change = _signed_change(line, stock.quantity)
+            new_balance = stock.quantity + quantity_change
+
+            if quantity_change < 0 and new_balance < 0 and not allow_negative:
+                raise _insufficient(line, stock.quantity)
+
+            if quantity_change > 0:
+                unit_cost = line.unit_cost
+                if unit_cost is ISSUED_COST:
+                    unit_cost = issued / quantity_change if issued is not None else None
+                    issued = None
+                elif unit_cost is None and line.movement_type == 'transfer':
+                    unit_cost = transfer_costs.get(line.product.pk)
+                unit_cost = ledger.receive(
+                    line.product, line.warehouse, quantity_change,
+                    unit_cost if unit_cost is not None else line.product.unit_cost,
+                    now, line.reference,
+                )
+            elif quantity_change < 0:
+                unit_cost = ledger.issue(line.product, line.warehouse, -quantity_change)
+                issued = (issued or Decimal('0')) - quantity_change * movement_cost(unit_cost)
+                if line.movement_type == 'transfer':
+                    # La entrada del otro almacén hereda el costo real de lo que salió
+                    transfer_costs[line.product.pk] = unit_cost
+            else:
+                unit_cost = ledger.current_cost(line.product, line.warehouse)
+
+            stock.quantity = new_balance
+            movements.append(StockMovement(
+                company=company,
+                product=line.product,
+                warehouse=line.warehouse,
+                quantity_change=quantity_change,
+                movement_type=line.movement_type,
+                reference=line.reference,
+                notes=line.notes,
+                user=user,
+                unit_cost_at_movement=movement_cost(unit_cost),
+                running_balance=new_balance,
+            ))
+
+        # La cantidad ya quedó escrita salvo en filas con conteo; el costo promedio solo si cambió
+        rewrite = [
+            stock for key, stock in stocks.items()
+            if key in counted or stock.average_cost != average_costs[key]
+        ]
+        if rewrite:
+            Stock.objects.bulk_update(rewrite, ['quantity', 'average_cost'])
+        ledger.flush()
+
+        movements = StockMovement.objects.bulk_create(movements)
+        valuation.record_movements(company, movements)
+        rollups.record_movements(company, movements)
+        # Alertas de reorden solo sobre las filas tocadas y solo si el lote se confirma
+        transaction.on_commit(functools.partial(reorder.evaluate, company, set(deltas)), robust=True)
+        return movements
+
+
+class TransferLine(NamedTuple):
+    """One product moved from `source` to `destination` by post_transfer"""
+    product: object
+    source: object
+    destination: object
+    quantity: Decimal
+    notes: str = ''
+
+
+def new_transfer_reference():
+    """Reference shared by both movements of every line of a transfer document"""
+    return f'TRF-{uuid.uuid4().hex[:8].upper()}'
+
+
+def post_transfer(company, user, lines, reference='', notes=''):
+    """
+    Move stock between warehouses as one transfer document.
+
+    Every line becomes a pair of 'transfer' movements (leaving the source,
+    arriving at the destination) that share `reference`, and the whole
+    document is posted as a single post_movements batch: either every line
+    moves or nothing does. The arriving side is received at the real cost of
+    the goods that left. Returns (reference, movements).
+    """
+    lines = [line if isinstance(line, TransferLine) else TransferLine(*line) for line in lines]
+    reference = reference or new_transfer_reference()
+
+    batch = []
+    for line in lines:
+        if line.source.pk == line.destination.pk:
+            raise StockPostingError(
+                f'El almacén de origen y destino de {line.product.sku} es el mismo ({line.source.name}).',
+                line=line,
+            )
+        if line.quantity <= 0:
+            raise StockPostingError(f'La cantidad a transferir de {line.product.sku} debe ser mayor a cero.', line=line)
+        line_notes = line.notes or notes
+        batch.append(MovementLine(
+            line.product, line.source, 'transfer', -line.quantity, reference,
+            line_notes or f'Transferencia a {line.destination.code}',
+        ))
+        batch.append(MovementLine(
+            line.product, line.destination, 'transfer', line.quantity, reference,
+            line_notes or f'Transferencia desde {line.source.code}',
+        ))
+    return reference, post_movements(company, user, batch)
+
+
+def issued_cost(movements):
+    """Total cost of the goods issued by a list of posted movements"""
+    return sum(
+        (-m.quantity_change * m.unit_cost_at_movement for m in movements if m.quantity_change < 0),
+        Decimal('0'),
+    )
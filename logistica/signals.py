@@ -0,0 +1,61 @@
+"""
+Logística Signals
+KoreBase ERP System
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from core import search_cache
+from core.middleware import tenant_context
+
+from . import valuation
+from .models import Product, SatCatalogRelease, SatProductCode, SatUnitCode, Supplier, Warehouse
+
+
+# bulk_update no dispara post_save: la importación de productos avisa qué
+# productos cambiaron de unit_cost. Argumentos: company_id, product_ids
+unit_costs_changed = Signal()
+
+
+@receiver(pre_save, sender=Product)
+def remember_valuation_fields(sender, instance, **kwargs):
+    """
+    Keep the stored cost/type/category so post_save handlers act only on
+    change; produccion reads the same snapshot for BOM cost refreshes.
+    """
+    instance._valuation_before = None
+    if instance.pk is not None:
+        # _base_manager: el admin puede guardar productos sin tenant en el hilo
+        instance._valuation_before = sender._base_manager.filter(pk=instance.pk).values_list(
+            'unit_cost', 'product_type', 'category'
+        ).first()
+
+
+@receiver(post_save, sender=Product)
+def revalue_product_stock(sender, instance, created, **kwargs):
+    before = getattr(instance, '_valuation_before', None)
+    if created or before is None or instance.company_id is None:
+        return
+    if before != (instance.unit_cost, instance.product_type, instance.category):
+        with tenant_context(instance.company):
+            valuation.revalue_product(instance, *before)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Warehouse)
+@receiver(post_delete, sender=Warehouse)
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+def invalidate_tenant_searches(sender, instance, **kwargs):
+    search_cache.invalidate_on_commit(instance.company_id)
+
+
+@receiver(post_save, sender=SatProductCode)
+@receiver(post_delete, sender=SatProductCode)
+@receiver(post_save, sender=SatUnitCode)
+@receiver(post_delete, sender=SatUnitCode)
+@receiver(post_save, sender=SatCatalogRelease)
+def invalidate_catalog_searches(sender, **kwargs):
+    # migrate_phpcfdi_catalog escribe con bulk_* (sin señales) y cierra con un SatCatalogRelease
+    search_cache.invalidate_on_commit()
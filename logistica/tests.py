@@ -1,3 +1,629 @@
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.utils import timezone
+
+from core.middleware import tenant_context
+from core.models import Company, CompanyMembership, CustomUser, Notification
+
+from . import checkpoints, kardex, reorder, rollups, services, valuation
+from .models import (
+    CostLayer, DailyMovementRollup, InventoryValuation, Product, ReorderPoint, SatProductCode, SatUnitCode, Stock,
+    StockMovement, Warehouse,
+)
+from .product_import import import_products
+from .services import MovementLine, StockPostingError, TransferLine, post_movements, post_transfer
+
+
+class StockMovementIndexTests(TestCase):
+    """Las consultas de Kardex deben resolverse por los índices compuestos, no por un scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Planner Test')
+        cls.user = CustomUser.objects.create_user(username='planner', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.product = Product.objects.create(
+                company=cls.company, sku='IDX-1', name='Indexed', category='Materia Prima', unit_cost=Decimal('1.00'),
+            )
+            post_movements(cls.company, cls.user, [
+                MovementLine(cls.product, cls.warehouse, 'in', Decimal('1')) for _ in range(20)
+            ])
+
+    def _plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Con pocas filas el planner prefiere seq scan; se desactiva para ver si el índice es elegible
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, StockMovement._meta.db_table)
+        self.assertIn('stockmov_co_prod_ts_idx', constraints)
+        self.assertIn('stockmov_co_ts_idx', constraints)
+
+    def test_product_history_uses_index(self):
+        with tenant_context(self.company):
+            queryset = StockMovement.objects.filter(product=self.product).order_by('-timestamp', '-id')[:100]
+            self.assertIn('stockmov_co_prod_ts_idx', self._plan(queryset))
+
+    def test_recent_movements_uses_index(self):
+        with tenant_context(self.company):
+            queryset = StockMovement.objects.order_by('-timestamp', '-id')[:5]
+            self.assertIn('stockmov_co_ts_idx', self._plan(queryset))
+
+
+class ProductImportUpdateTests(TestCase):
+    """Una celda vacía al actualizar un producto conserva lo guardado en vez de borrarlo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Import Test')
+        cls.user = CustomUser.objects.create_user(username='importer', password='x', company=cls.company)
+        SatProductCode.objects.create(code='43211500', description='Computadoras')
+        SatUnitCode.objects.create(code='H87', name='Pieza')
+        with tenant_context(cls.company):
+            cls.product = Product.objects.create(
+                company=cls.company, sku='IMP-1', name='Laptop', description='14 pulgadas', category='Equipo',
+                product_type='component', unit_of_measure='KG', brand='Kore', unit_cost=Decimal('10.00'),
+                costing_method='fifo', clave_producto_sat='43211500', clave_unidad_sat='H87', active=True,
+            )
+
+    def _import(self, text):
+        with tenant_context(self.company):
+            return import_products(self.company, self.user, io.BytesIO(text.encode()), 'productos.csv')
+
+    def test_blank_cells_keep_stored_values(self):
+        result = self._import(
+            'sku,name,description,category,product_type,unit_of_measure,brand,unit_cost,costing_method,'
+            'clave_producto_sat,clave_unidad_sat,active\n'
+            'IMP-1,Laptop Pro,,,,,,12.50,,,,\n'
+        )
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.updated, 1)
+
+        product = Product._base_manager.get(pk=self.product.pk)
+        self.assertEqual(product.name, 'Laptop Pro')
+        self.assertEqual(product.unit_cost, Decimal('12.50'))
+        self.assertEqual(product.description, '14 pulgadas')
+        self.assertEqual(product.category, 'Equipo')
+        self.assertEqual(product.product_type, 'component')
+        self.assertEqual(product.unit_of_measure, 'KG')
+        self.assertEqual(product.brand, 'Kore')
+        self.assertEqual(product.costing_method, 'fifo')
+        self.assertEqual(product.clave_producto_sat, '43211500')
+        self.assertEqual(product.clave_unidad_sat, 'H87')
+        self.assertTrue(product.active)
+
+    def test_new_products_use_defaults(self):
+        result = self._import('sku,name,category,unit_cost,active\nIMP-2,Mouse,Accesorios,5,\n')
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.created, 1)
+
+        product = Product._base_manager.get(company=self.company, sku='IMP-2')
+        self.assertEqual(product.product_type, 'finished')
+        self.assertEqual(product.unit_of_measure, 'PZA')
+        self.assertEqual(product.costing_method, 'average')
+        self.assertTrue(product.active)
+
+
+class RollupRebuildTests(TestCase):
+    """rebuild() debe reproducir lo que sumó post_movements, centavo por centavo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Rollup Test')
+        cls.user = CustomUser.objects.create_user(username='roller', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.product = Product.objects.create(
+                company=cls.company, sku='ROL-1', name='Tornillo', category='Ferretería', unit_cost=Decimal('0.01'),
+            )
+
+    def _rows(self):
+        return list(DailyMovementRollup._base_manager.filter(company=self.company).order_by('day').values_list(
+            'day', 'quantity_in', 'quantity_out', 'value_in', 'value_out', 'movement_count',
+        ))
+
+    def test_rebuild_matches_incremental_rounding(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        with tenant_context(self.company):
+            # Cada entrada vale medio centavo: redondear por movimiento o sobre la suma da distinto
+            for _ in range(3):
+                post_movements(self.company, self.user, [
+                    MovementLine(self.product, self.warehouse, 'in', Decimal('0.5'), unit_cost=Decimal('0.01')),
+                ])
+            StockMovement._base_manager.filter(company=self.company).update(
+                timestamp=timezone.make_aware(datetime.datetime.combine(yesterday, datetime.time(12))),
+            )
+            DailyMovementRollup._base_manager.filter(company=self.company).update(day=yesterday)
+            incremental = self._rows()
+
+            self.assertEqual(rollups.rebuild(self.company, yesterday, yesterday), 1)
+        self.assertEqual(incremental[0][3], Decimal('0.03'))
+        self.assertEqual(self._rows(), incremental)
+
+    def test_rebuild_retries_when_a_posting_wins_a_new_row(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        with tenant_context(self.company):
+            post_movements(self.company, self.user, [MovementLine(self.product, self.warehouse, 'in', Decimal('4'))])
+            StockMovement._base_manager.filter(company=self.company).update(
+                timestamp=timezone.make_aware(datetime.datetime.combine(yesterday, datetime.time(23, 59))),
+            )
+            DailyMovementRollup._base_manager.filter(company=self.company).delete()
+
+            bulk_create = DailyMovementRollup.objects.bulk_create
+            outcomes = [IntegrityError('duplicate key')]
+
+            def first_conflicts(*args, **kwargs):
+                # El primer intento choca con la fila que insertó un lote concurrente
+                if outcomes:
+                    raise outcomes.pop()
+                return bulk_create(*args, **kwargs)
+
+            with mock.patch.object(DailyMovementRollup.objects, 'bulk_create', side_effect=first_conflicts) as patched:
+                self.assertEqual(rollups.rebuild(self.company, yesterday, yesterday), 1)
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual(self._rows()[0][1], Decimal('4.000'))
+
+    def test_rebuild_leaves_today_to_postings(self):
+        today = timezone.localdate()
+        with tenant_context(self.company):
+            post_movements(self.company, self.user, [MovementLine(self.product, self.warehouse, 'in', Decimal('2'))])
+            before = self._rows()
+            self.assertEqual(rollups.rebuild(self.company, today, today), 0)
+        self.assertEqual(self._rows(), before)
+
+
+class KardexVerifyTests(TestCase):
+    """Un Kardex correcto con cantidades fraccionarias no debe reportar diferencias"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Kardex Test')
+        cls.user = CustomUser.objects.create_user(username='auditor', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.product = Product.objects.create(
+                company=cls.company, sku='KDX-1', name='Cable', category='Materia Prima', unit_cost=Decimal('3.00'),
+            )
+            for quantity in ('0.1', '0.2', '0.3', '0.7'):
+                post_movements(cls.company, cls.user, [
+                    MovementLine(cls.product, cls.warehouse, 'in', Decimal(quantity)),
+                ])
+
+    def test_fractional_ledger_has_no_drift(self):
+        with tenant_context(self.company):
+            report = kardex.verify(self.company)
+        self.assertEqual(report['movement_drift'], [])
+        self.assertEqual(report['stock_drift'], [])
+
+        output = io.StringIO()
+        call_command(
+            'verify_kardex', '--company', str(self.company.pk), '--workers', '1', '--fail-on-drift', stdout=output,
+        )
+        self.assertIn('"companies_with_drift": 0', output.getvalue())
+
+    def test_rebuild_restores_exact_decimals(self):
+        last = StockMovement._base_manager.filter(company=self.company).order_by('-timestamp', '-id').first()
+        StockMovement._base_manager.filter(pk=last.pk).update(running_balance=Decimal('9.000'))
+        Stock._base_manager.filter(company=self.company).update(quantity=Decimal('9.000'))
+
+        with tenant_context(self.company):
+            report = kardex.verify(self.company, rebuild=True)
+        self.assertEqual(report['movement_drift'][0]['expected'], '1.300')
+        self.assertEqual(report['stock_drift'][0]['expected'], '1.300')
+
+        self.assertEqual(StockMovement._base_manager.get(pk=last.pk).running_balance, Decimal('1.300'))
+        self.assertEqual(Stock._base_manager.get(company=self.company).quantity, Decimal('1.300'))
+        with tenant_context(self.company):
+            report = kardex.verify(self.company)
+        self.assertEqual((report['movement_drift'], report['stock_drift']), ([], []))
+
+
+class CheckpointTests(TestCase):
+    """Existencia al día: corte más cercano + movimientos posteriores"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Checkpoint Test')
+        cls.user = CustomUser.objects.create_user(username='closer', password='x', company=cls.company)
+        cls.today = timezone.localdate()
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.product = Product.objects.create(
+                company=cls.company, sku='CHK-1', name='Caja', category='Empaque', unit_cost=Decimal('1.00'),
+            )
+            for days_ago, movement_type, quantity in ((3, 'in', '10'), (2, 'out', '3'), (0, 'in', '5')):
+                movement, = post_movements(cls.company, cls.user, [
+                    MovementLine(cls.product, cls.warehouse, movement_type, Decimal(quantity)),
+                ])
+                if days_ago:
+                    day = cls.today - datetime.timedelta(days=days_ago)
+                    StockMovement._base_manager.filter(pk=movement.pk).update(
+                        timestamp=timezone.make_aware(datetime.datetime.combine(day, datetime.time(12))),
+                    )
+
+    def _quantity(self, when):
+        key = (self.product.pk, self.warehouse.pk)
+        with tenant_context(self.company):
+            return checkpoints.stock_as_of(self.company, when).get(key, Decimal('0'))
+
+    def test_stock_as_of_with_and_without_checkpoint(self):
+        three_days_ago = checkpoints.end_of_day(self.today - datetime.timedelta(days=3))
+        self.assertEqual(self._quantity(three_days_ago), Decimal('10'))
+
+        cutoff = timezone.make_aware(datetime.datetime.combine(self.today - datetime.timedelta(days=1), datetime.time.min))
+        with tenant_context(self.company):
+            self.assertEqual(checkpoints.create_checkpoint(self.company, cutoff), 1)
+            self.assertEqual(checkpoints.create_checkpoint(self.company, cutoff), 0)
+        self.assertEqual(self._quantity(cutoff), Decimal('7'))
+        self.assertEqual(self._quantity(timezone.now() + datetime.timedelta(seconds=1)), Decimal('12'))
+        self.assertEqual(self._quantity(three_days_ago), Decimal('10'))
+
+    def test_recent_cutoff_is_refused(self):
+        with tenant_context(self.company), self.assertRaises(ValueError):
+            checkpoints.create_checkpoint(self.company, timezone.now() - datetime.timedelta(minutes=1))
+
+
+class PostMovementsTests(TestCase):
+    """Un lote se aplica línea por línea y se confirma completo o no se escribe nada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Posting Test')
+        cls.user = CustomUser.objects.create_user(username='poster', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.product = Product.objects.create(
+                company=cls.company, sku='POST-1', name='Posted', category='Materia Prima', unit_cost=Decimal('1.00'),
+            )
+            cls.other = Product.objects.create(
+                company=cls.company, sku='POST-2', name='Other', category='Materia Prima', unit_cost=Decimal('1.00'),
+            )
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+        post_movements(self.company, self.user, [MovementLine(self.product, self.warehouse, 'in', Decimal('5'))])
+
+    def line(self, product, movement_type, quantity):
+        return MovementLine(product, self.warehouse, movement_type, Decimal(quantity))
+
+    def on_hand(self, product):
+        return Stock.objects.filter(product=product, warehouse=self.warehouse).values_list('quantity', flat=True).first()
+
+    def test_running_balances_follow_line_order(self):
+        movements = post_movements(self.company, self.user, [
+            self.line(self.product, 'out', '2'), self.line(self.product, 'in', '4'), self.line(self.product, 'adjustment', '10'),
+        ])
+        self.assertEqual([m.quantity_change for m in movements], [Decimal('-2'), Decimal('4'), Decimal('3')])
+        self.assertEqual([m.running_balance for m in movements], [Decimal('3'), Decimal('7'), Decimal('10')])
+        self.assertEqual(self.on_hand(self.product), Decimal('10'))
+
+    def test_intermediate_negative_is_refused(self):
+        # El neto del lote es +2, pero la salida deja el saldo en -3 antes de la entrada
+        with self.assertRaises(StockPostingError) as raised:
+            post_movements(self.company, self.user, [
+                self.line(self.product, 'out', '8'), self.line(self.product, 'in', '10'),
+            ])
+        self.assertEqual(raised.exception.available, Decimal('5'))
+        self.assertEqual(raised.exception.line.movement_type, 'out')
+        self.assertEqual(self.on_hand(self.product), Decimal('5'))
+        self.assertEqual(StockMovement.objects.count(), 1)
+
+    def test_insufficient_stock_rolls_back_whole_batch(self):
+        with self.assertRaises(StockPostingError) as raised:
+            post_movements(self.company, self.user, [
+                self.line(self.other, 'in', '3'), self.line(self.product, 'out', '6'),
+            ])
+        self.assertEqual((raised.exception.line.product, raised.exception.available), (self.product, Decimal('5')))
+        self.assertEqual(self.on_hand(self.product), Decimal('5'))
+        self.assertIsNone(self.on_hand(self.other))
+        self.assertFalse(StockMovement.objects.filter(product=self.other).exists())
+
+    def test_allow_negative(self):
+        movements = post_movements(self.company, self.user, [self.line(self.product, 'out', '8')], allow_negative=True)
+        self.assertEqual(movements[0].running_balance, Decimal('-3'))
+        self.assertEqual(self.on_hand(self.product), Decimal('-3'))
+
+
+class CostLedgerTests(TestCase):
+    """Las salidas se costean por el costing_method del producto: capas PEPS/UEPS o promedio"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Costing Test')
+        cls.user = CustomUser.objects.create_user(username='costing', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+
+    def received(self, costing_method):
+        product = Product.objects.create(
+            company=self.company, sku=costing_method.upper(), name=costing_method, category='Materia Prima',
+            unit_cost=Decimal('9.00'), costing_method=costing_method,
+        )
+        post_movements(self.company, self.user, [
+            MovementLine(product, self.warehouse, 'in', Decimal('10'), unit_cost=Decimal('1.00')),
+            MovementLine(product, self.warehouse, 'in', Decimal('10'), unit_cost=Decimal('2.00')),
+        ])
+        return product
+
+    def issue(self, product, quantity, allow_negative=False):
+        movements = post_movements(self.company, self.user, [
+            MovementLine(product, self.warehouse, 'out', Decimal(quantity)),
+        ], allow_negative=allow_negative)
+        return movements[0].unit_cost_at_movement
+
+    def remaining(self, product):
+        return list(CostLayer.objects.filter(product=product).order_by('unit_cost').values_list('quantity_remaining', flat=True))
+
+    def test_fifo_consumes_oldest_layers(self):
+        product = self.received('fifo')
+        # 10 × 1.00 + 5 × 2.00 = 20.00 / 15
+        self.assertEqual(self.issue(product, '15'), Decimal('1.33'))
+        self.assertEqual(self.remaining(product), [Decimal('0'), Decimal('5')])
+        self.assertEqual(self.issue(product, '5'), Decimal('2.00'))
+
+    def test_lifo_consumes_newest_layers(self):
+        product = self.received('lifo')
+        # 10 × 2.00 + 5 × 1.00 = 25.00 / 15
+        self.assertEqual(self.issue(product, '15'), Decimal('1.67'))
+        self.assertEqual(self.remaining(product), [Decimal('5'), Decimal('0')])
+
+    def test_average_cost_has_no_layers(self):
+        product = self.received('average')
+        self.assertEqual(self.issue(product, '15'), Decimal('1.50'))
+        self.assertFalse(CostLayer.objects.filter(product=product).exists())
+        self.assertEqual(Stock.objects.get(product=product).average_cost, Decimal('1.5000'))
+
+    def test_issue_beyond_layers_uses_standard_cost(self):
+        product = self.received('fifo')
+        # 10 × 1.00 + 10 × 2.00 + 5 × 9.00 (sin capas) = 75.00 / 25
+        self.assertEqual(self.issue(product, '25', allow_negative=True), Decimal('3.00'))
+        self.assertEqual(self.remaining(product), [Decimal('0'), Decimal('0')])
+
+
+class ValuationDeltaTests(TestCase):
+    """El resumen de valuación aplica solo el delta de cada lote o cambio de producto"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Valuation Test')
+        cls.user = CustomUser.objects.create_user(username='valuer', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+        self.product = Product.objects.create(
+            company=self.company, sku='VAL-1', name='Valued', category='Materia Prima',
+            product_type='raw', unit_cost=Decimal('2.50'),
+        )
+        post_movements(self.company, self.user, [
+            MovementLine(self.product, self.warehouse, 'in', Decimal('10')),
+            MovementLine(self.product, self.warehouse, 'out', Decimal('4')),
+        ])
+
+    def summary(self):
+        return {
+            (row.product_type, row.category): (row.quantity, row.value)
+            for row in InventoryValuation.objects.filter(company=self.company, warehouse=self.warehouse)
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = {key: value for key, value in self.summary().items() if any(value)}
+        valuation.rebuild(self.company)
+        self.assertEqual(incremental, self.summary())
+
+    def test_postings_apply_their_delta(self):
+        self.assertEqual(self.summary(), {('raw', 'Materia Prima'): (Decimal('6'), Decimal('15'))})
+        self.assertEqual(valuation.total_value(self.company), Decimal('15'))
+        self.assertMatchesRebuild()
+
+    def test_unit_cost_change_revalues_stock(self):
+        self.product.unit_cost = Decimal('3.00')
+        self.product.save()
+        self.assertEqual(self.summary(), {('raw', 'Materia Prima'): (Decimal('6'), Decimal('18'))})
+        self.assertMatchesRebuild()
+
+    def test_category_change_moves_value_between_buckets(self):
+        self.product.category = 'Empaque'
+        self.product.product_type = 'component'
+        self.product.save()
+        self.assertEqual(self.summary(), {
+            ('raw', 'Materia Prima'): (Decimal('0'), Decimal('0')),
+            ('component', 'Empaque'): (Decimal('6'), Decimal('15')),
+        })
+        self.assertMatchesRebuild()
+
+
+class TransferTests(TestCase):
+    """Una transferencia consume capas en el origen y las recibe en el destino al mismo costo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Transfer Test')
+        cls.user = CustomUser.objects.create_user(username='mover', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.source = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.destination = Warehouse.objects.create(company=cls.company, name='Sucursal', code='SUC')
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+        self.product = Product.objects.create(
+            company=self.company, sku='TRF-1', name='Moved', category='Materia Prima',
+            unit_cost=Decimal('9.00'), costing_method='fifo',
+        )
+        post_movements(self.company, self.user, [
+            MovementLine(self.product, self.source, 'in', Decimal('10'), unit_cost=Decimal('1.00')),
+            MovementLine(self.product, self.source, 'in', Decimal('10'), unit_cost=Decimal('2.00')),
+        ])
+
+    def layers(self, warehouse):
+        return list(CostLayer.objects.filter(product=self.product, warehouse=warehouse).order_by('received_at', 'id').values_list(
+            'unit_cost', 'quantity_remaining',
+        ))
+
+    def test_destination_receives_cost_of_consumed_layers(self):
+        reference, movements = post_transfer(self.company, self.user, [
+            TransferLine(self.product, self.source, self.destination, Decimal('15')),
+        ])
+        self.assertEqual({movement.reference for movement in movements}, {reference})
+        self.assertEqual([movement.quantity_change for movement in movements], [Decimal('-15'), Decimal('15')])
+        self.assertEqual([movement.unit_cost_at_movement for movement in movements], [Decimal('1.33'), Decimal('1.33')])
+
+        self.assertEqual(self.layers(self.source), [(Decimal('1.0000'), Decimal('0')), (Decimal('2.0000'), Decimal('5'))])
+        self.assertEqual(self.layers(self.destination), [(Decimal('1.3333'), Decimal('15'))])
+
+    def test_shortage_moves_nothing(self):
+        other = Product.objects.create(
+            company=self.company, sku='TRF-2', name='Short', category='Materia Prima', unit_cost=Decimal('1.00'),
+        )
+        with self.assertRaises(StockPostingError) as raised:
+            post_transfer(self.company, self.user, [
+                TransferLine(self.product, self.source, self.destination, Decimal('5')),
+                TransferLine(other, self.source, self.destination, Decimal('1')),
+            ])
+        self.assertEqual(raised.exception.line.product, other)
+        self.assertFalse(StockMovement.objects.filter(movement_type='transfer').exists())
+        self.assertEqual(self.layers(self.source), [(Decimal('1.0000'), Decimal('10')), (Decimal('2.0000'), Decimal('10'))])
+        self.assertEqual(self.layers(self.destination), [])
+
+    def test_same_warehouse_is_refused(self):
+        with self.assertRaises(StockPostingError):
+            post_transfer(self.company, self.user, [TransferLine(self.product, self.source, self.source, Decimal('1'))])
+
+
+class IncrementStockTests(TestCase):
+    """increment_stock suma en la base (upsert); el respaldo con SELECT ... FOR UPDATE da lo mismo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Upsert Test')
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.product = Product.objects.create(
+                company=cls.company, sku='UPS-1', name='Upserted', category='Materia Prima', unit_cost=Decimal('1.00'),
+            )
+            cls.other = Product.objects.create(
+                company=cls.company, sku='UPS-2', name='Other', category='Materia Prima', unit_cost=Decimal('1.00'),
+            )
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+        self.key = (self.product.pk, self.warehouse.pk)
+        self.other_key = (self.other.pk, self.warehouse.pk)
+
+    def check_increments(self):
+        stocks = services.increment_stock(self.company, {self.key: Decimal('5.5'), self.other_key: Decimal('2')})
+        self.assertEqual(stocks[self.key].quantity, Decimal('5.500'))
+        stocks = services.increment_stock(self.company, {self.key: Decimal('-1.25')})
+        self.assertEqual(stocks[self.key].quantity, Decimal('4.250'))
+        self.assertEqual(Stock.objects.get(product=self.product).quantity, Decimal('4.25'))
+        self.assertEqual(Stock.objects.count(), 2)
+
+        with self.assertRaises(StockPostingError) as raised:
+            services.increment_stock(self.company, {self.key: Decimal('-5'), self.other_key: Decimal('1')})
+        self.assertEqual((raised.exception.key, raised.exception.available), (self.key, Decimal('4.25')))
+
+        stocks = services.increment_stock(self.company, {self.key: Decimal('-5')}, allow_negative=True)
+        self.assertEqual(stocks[self.key].quantity, Decimal('-0.750'))
+        # Una entrada a un saldo negativo siempre procede
+        stocks = services.increment_stock(self.company, {self.key: Decimal('0.5')})
+        self.assertEqual(stocks[self.key].quantity, Decimal('-0.250'))
+        self.assertEqual(Stock.objects.get(product=self.other).quantity, Decimal('2'))
+
+    def test_upsert(self):
+        if not services._supports_returning_upsert():
+            self.skipTest('El backend no soporta INSERT ... ON CONFLICT ... RETURNING')
+        self.check_increments()
+
+    def test_locked_fallback(self):
+        with mock.patch.object(services, '_supports_returning_upsert', return_value=False):
+            self.check_increments()
+
+    def test_new_row_cannot_start_negative(self):
+        with self.assertRaises(StockPostingError) as raised:
+            services.increment_stock(self.company, {self.key: Decimal('-1')})
+        self.assertEqual(raised.exception.available, Decimal('0'))
+        self.assertFalse(Stock.objects.exists())
+
+
+class ReorderAlertTests(TestCase):
+    """Un faltante se notifica una vez al cruzar el punto de reorden, no en cada lote mientras siga abajo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Reorder Test')
+        cls.user = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', employee_id='ROP-1', password='x', company=cls.company,
+        )
+        cls.viewer = CustomUser.objects.create_user(
+            username='viewer', email='viewer@example.com', employee_id='ROP-2', password='x', company=cls.company,
+        )
+        CompanyMembership.objects.create(user=cls.user, company=cls.company, role='operator')
+        CompanyMembership.objects.create(user=cls.viewer, company=cls.company, role='viewer')
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Central', code='CEN')
+            cls.products = [
+                Product.objects.create(
+                    company=cls.company, sku=f'ROP-{number}', name=f'Reordered {number}', category='Materia Prima',
+                    unit_cost=Decimal('1.00'),
+                )
+                for number in (1, 2)
+            ]
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+        for product in self.products:
+            ReorderPoint.objects.create(
+                company=self.company, product=product, warehouse=self.warehouse,
+                reorder_point=Decimal('5'), max_quantity=Decimal('20'),
+            )
+        self.post([(product, 'in', '10') for product in self.products])
+
+    def post(self, lines):
+        with self.captureOnCommitCallbacks(execute=True):
+            post_movements(self.company, self.user, [
+                MovementLine(product, self.warehouse, movement_type, Decimal(quantity))
+                for product, movement_type, quantity in lines
+            ])
+
+    def messages(self):
+        return list(Notification.objects.filter(user=self.user).order_by('pk').values_list('message', flat=True))
+
+    def test_alert_once_until_recovered(self):
+        product = self.products[0]
+        self.post([(product, 'out', '6')])
+        self.assertEqual(self.messages(), ['Stock bajo: ROP-1 en CEN (4 / mínimo 5)'])
+        self.assertIsNotNone(ReorderPoint.objects.get(product=product).alerted_at)
+
+        self.post([(product, 'out', '1')])
+        self.assertEqual(reorder.evaluate(self.company), (0, 0))
+        self.assertEqual(len(self.messages()), 1)
+
+        self.post([(product, 'in', '10')])
+        self.assertIsNone(ReorderPoint.objects.get(product=product).alerted_at)
+        self.post([(product, 'out', '9')])
+        self.assertEqual(len(self.messages()), 2)
+
+    def test_one_notification_per_batch(self):
+        self.post([(product, 'out', '5') for product in self.products])
+        self.assertEqual(self.messages(), ['2 productos llegaron a su punto de reorden: ROP-1, ROP-2'])
+        self.assertFalse(Notification.objects.filter(user=self.viewer).exists())
 
-# Create your tests here.
+    def test_rolled_back_batch_does_not_alert(self):
+        with self.assertRaises(StockPostingError):
+            self.post([(self.products[0], 'out', '6'), (self.products[1], 'out', '11')])
+        self.assertEqual(self.messages(), [])
+        self.assertFalse(ReorderPoint.objects.filter(alerted_at__isnull=False).exists())
@@ -10,11 +10,15 @@ urlpatterns = [
     # Inventory
     path('inventory/', views.inventory_list, name='inventory_list'),
     path('product/create/', views.product_create, name='product_create'),
+    path('product/import/', views.product_import, name='product_import'),
     path('product/<int:pk>/edit/', views.product_edit, name='product_edit'),
     path('product/<int:pk>/adjust/', views.stock_adjustment, name='stock_adjustment'),
     path('product/<int:pk>/delete/', views.product_delete, name='product_delete'),
     path('product/<int:pk>/history/', views.product_history, name='product_history'),
+    path('inventory/transfer/', views.stock_transfer, name='stock_transfer'),
     path('inventory/export/csv/', views.export_inventory_csv, name='export_inventory_csv'),
+    path('inventory/classification/', views.inventory_classification, name='inventory_classification'),
+    path('inventory/classification/refresh/', views.inventory_classification_refresh, name='inventory_classification_refresh'),
 
     # Warehouses
     path('warehouses/', views.warehouse_list, name='warehouse_list'),
@@ -22,6 +26,12 @@ urlpatterns = [
     path('warehouse/<int:pk>/edit/', views.warehouse_edit, name='warehouse_edit'),
     path('warehouse/<int:pk>/delete/', views.warehouse_delete, name='warehouse_delete'),
 
+    # Reorder points
+    path('reorder/', views.reorder_point_list, name='reorder_point_list'),
+    path('reorder/create/', views.reorder_point_create, name='reorder_point_create'),
+    path('reorder/<int:pk>/edit/', views.reorder_point_edit, name='reorder_point_edit'),
+    path('reorder/forecast/', views.demand_forecast, name='demand_forecast'),
+
     # Suppliers
     path('suppliers/', views.supplier_list, name='supplier_list'),
     path('supplier/create/', views.supplier_create, name='supplier_create'),
@@ -0,0 +1,114 @@
+"""
+Logística Valuation - Incremental inventory valuation summary
+KoreBase ERP System
+
+InventoryValuation guarda, por empresa, almacén, tipo y categoría, la cantidad
+y el valor a costo estándar. Cada posteo de movimientos y cada cambio de
+unit_cost/categoría de un producto aplica solo su delta; rebuild() recalcula
+todo desde Stock cuando se necesita reconciliar.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from .models import InventoryValuation, Stock
+
+
+def _bucket(warehouse_id, product_type, category):
+    return (warehouse_id, product_type, category)
+
+
+def apply_deltas(company, deltas):
+    """
+    Add {(warehouse_id, product_type, category): (quantity, value)} to the summary.
+
+    Missing buckets are inserted at zero first, then every bucket is incremented
+    in the database (value = value + delta) in a fixed order, so concurrent
+    batches never lose an update nor deadlock on the summary rows.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        InventoryValuation.objects.bulk_create(
+            [
+                InventoryValuation(company=company, warehouse_id=warehouse_id, product_type=product_type, category=category)
+                for warehouse_id, product_type, category in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        for (warehouse_id, product_type, category), (quantity, value) in sorted(deltas.items()):
+            InventoryValuation.objects.filter(
+                company=company,
+                warehouse_id=warehouse_id,
+                product_type=product_type,
+                category=category,
+            ).update(quantity=F('quantity') + quantity, value=F('value') + value)
+
+
+def record_movements(company, movements):
+    """Fold a batch of freshly posted StockMovements into the summary"""
+    deltas = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    for movement in movements:
+        product = movement.product
+        delta = deltas[_bucket(movement.warehouse_id, product.product_type, product.category)]
+        delta[0] += movement.quantity_change
+        delta[1] += movement.quantity_change * product.unit_cost
+    apply_deltas(company, deltas)
+
+
+def revalue_product(product, old_unit_cost, old_product_type, old_category):
+    """
+    Move a product's stock value after its unit_cost, type or category changed.
+
+    Only the product's own Stock rows are read (one per warehouse).
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    stock_rows = Stock.objects.filter(company=product.company, product=product).values_list('warehouse_id', 'quantity')
+    for warehouse_id, quantity in stock_rows:
+        old = deltas[_bucket(warehouse_id, old_product_type, old_category)]
+        old[0] -= quantity
+        old[1] -= quantity * old_unit_cost
+        new = deltas[_bucket(warehouse_id, product.product_type, product.category)]
+        new[0] += quantity
+        new[1] += quantity * product.unit_cost
+    apply_deltas(product.company, deltas)
+
+
+@transaction.atomic
+def rebuild(company):
+    """Recompute the whole summary of a tenant from Stock (grouped in the database)"""
+    InventoryValuation.objects.filter(company=company).delete()
+
+    grouped = Stock.objects.filter(company=company).values(
+        'warehouse_id', 'product__product_type', 'product__category'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_value=Sum(ExpressionWrapper(
+            F('quantity') * F('product__unit_cost'),
+            output_field=DecimalField(max_digits=20, decimal_places=5),
+        )),
+    ).order_by()
+
+    rows = [
+        InventoryValuation(
+            company=company,
+            warehouse_id=row['warehouse_id'],
+            product_type=row['product__product_type'],
+            category=row['product__category'],
+            quantity=row['total_quantity'] or Decimal('0'),
+            value=row['total_value'] or Decimal('0'),
+        )
+        for row in grouped
+    ]
+    InventoryValuation.objects.bulk_create(rows)
+    return len(rows)
+
+
+def total_value(company, **filters):
+    """Sum of the summary rows of a tenant, optionally filtered (category=..., warehouse=...)"""
+    total = InventoryValuation.objects.filter(company=company, **filters).aggregate(t=Sum('value'))['t']
+    return total or Decimal('0.00')
@@ -2,36 +2,45 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import Sum, Q, DecimalField, Value, F
+from django.db.models import Sum, Q, DecimalField, Value, F, OuterRef, Subquery
 from django.db.models.functions import Coalesce
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from core.notifications import notify
+from core import search_cache, synonyms
+from core.middleware import tenant_context
 from core.views import require_can_write
 import csv
 from datetime import datetime
 from decimal import Decimal
 
-from .models import Product, Stock, Warehouse, Supplier, StockMovement, SatProductCode, SatUnitCode
-from .forms import ProductForm, WarehouseForm, SupplierForm, StockMovementForm
+import numpy as np
+
+from .models import Product, Stock, Warehouse, Supplier, StockMovement, SatUnitCode, ReorderPoint
+from .forms import (
+    ProductForm, WarehouseForm, SupplierForm, StockMovementForm, ProductImportForm,
+    StockTransferForm, StockTransferLineFormSet, ReorderPointForm, ForecastForm,
+)
+from . import checkpoints, classification, forecasting, reorder, sat_index, valuation
+from .product_import import PRODUCT_FIELDS, ProductImportError, import_products
+from .services import MovementLine, StockPostingError, TransferLine, post_movements, post_transfer
 
 
 @login_required
 def index(request):
     """Logística dashboard"""
-    total_value_data = Stock.objects.aggregate(
-        total=Sum(F('quantity') * F('product__unit_cost'), output_field=DecimalField())
-    )
-    total_value = total_value_data['total'] or Decimal('0.00')
+    total_value = valuation.total_value(request.user.company)
 
     recent_movements = StockMovement.objects.select_related(
         'product', 'warehouse', 'user'
-    ).order_by('-timestamp')[:5]
+    ).order_by('-timestamp', '-id')[:5]
 
     context = {
         'total_products': Product.objects.filter(active=True).count(),
         'total_warehouses': Warehouse.objects.filter(active=True).count(),
         'total_suppliers': Supplier.objects.filter(active=True).count(),
         'total_value': total_value,
+        'low_stock_count': reorder.below_reorder_point(request.user.company).count(),
         'recent_products': Product.objects.filter(active=True).annotate(
             total_stock=Coalesce(Sum('stock__quantity'), Value(0), output_field=DecimalField())
         ).order_by('-created_at')[:5],
@@ -40,12 +49,12 @@ def index(request):
     return render(request, 'logistica/index.html', context)
 
 
-@login_required
-def inventory_list(request):
-    """List all inventory with stock levels, filters, and search"""
-    products = Product.objects.filter(active=True).annotate(
-        total_stock=Coalesce(Sum('stock__quantity'), Value(0), output_field=DecimalField())
-    )
+INVENTORY_PAGE_SIZE = 50
+
+
+def _inventory_queryset(request):
+    """Active products filtered by the inventory list search/category params"""
+    products = Product.objects.filter(active=True)
 
     query = request.GET.get('q')
     if query:
@@ -59,14 +68,89 @@ def inventory_list(request):
     if category:
         products = products.filter(category__iexact=category)
 
-    categories = Product.objects.filter(active=True).values_list('category', flat=True).distinct()
+    if request.GET.get('low_stock'):
+        products = products.filter(pk__in=reorder.below_reorder_point(request.user.company).values('product_id'))
+
+    # Clases de la última clasificación guardada (manage.py classify_inventory)
+    abc = request.GET.get('abc')
+    if abc in ('A', 'B', 'C'):
+        products = products.filter(classification__abc_class=abc)
+    xyz = request.GET.get('xyz')
+    if xyz in ('X', 'Y', 'Z'):
+        products = products.filter(classification__xyz_class=xyz)
+
+    return products
+
+
+def _total_stock_subquery():
+    """Correlated SUM(stock.quantity) so the aggregate only runs for the rows actually fetched"""
+    totals = Stock.objects.filter(product=OuterRef('pk')).values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return Coalesce(Subquery(totals), Value(0), output_field=DecimalField())
+
+
+def _parse_as_of(request):
+    """Optional ?as_of=YYYY-MM-DD filter: returns (date, cutoff datetime) or (None, None)"""
+    try:
+        day = parse_date(request.GET.get('as_of') or '')
+    except ValueError:
+        day = None
+    if day is None:
+        return None, None
+    return day, checkpoints.end_of_day(day)
+
+
+@login_required
+def inventory_list(request):
+    """List inventory with stock levels, filters and search (keyset-paginated by SKU)"""
+    as_of, cutoff = _parse_as_of(request)
+    products = _inventory_queryset(request).annotate(
+        abc_class=F('classification__abc_class'), xyz_class=F('classification__xyz_class'),
+    )
+    if cutoff is None:
+        products = products.annotate(total_stock=_total_stock_subquery())
+
+    # Keyset pagination: SKU is unique per tenant, so "sku > cursor" is stable and index-backed
+    after = request.GET.get('after')
+    if after:
+        products = products.filter(sku__gt=after)
+    page = list(products.order_by('sku')[:INVENTORY_PAGE_SIZE + 1])
+
+    next_page_query = ''
+    if len(page) > INVENTORY_PAGE_SIZE:
+        page = page[:INVENTORY_PAGE_SIZE]
+        params = request.GET.copy()
+        params['after'] = page[-1].sku
+        next_page_query = params.urlencode()
+
+    if cutoff is not None:
+        # Existencia histórica: corte más cercano + movimientos posteriores, solo para esta página
+        totals = checkpoints.product_totals_as_of(request.user.company, cutoff, [p.pk for p in page])
+        for product in page:
+            product.total_stock = totals.get(product.pk, Decimal('0'))
 
     context = {
-        'products': products,
-        'categories': categories,
-        'search_query': query or '',
-        'current_category': category or ''
+        'products': page,
+        'next_page_query': next_page_query,
+        'is_next_page': bool(after),
     }
+
+    # Filtros y scroll infinito vía HTMX solo necesitan las filas de la tabla
+    if request.htmx:
+        return render(request, 'logistica/partials/inventory_rows.html', context)
+
+    query = request.GET.get('q')
+    category = request.GET.get('category')
+    context.update({
+        'categories': Product.objects.filter(active=True).order_by('category').values_list('category', flat=True).distinct(),
+        'search_query': query or '',
+        'current_category': category or '',
+        'as_of': as_of,
+        'low_stock': request.GET.get('low_stock', ''),
+        'current_abc': request.GET.get('abc', ''),
+        'current_xyz': request.GET.get('xyz', ''),
+    })
     return render(request, 'logistica/inventory_list.html', context)
 
 
@@ -89,6 +173,44 @@ def product_create(request):
     return render(request, 'logistica/product_form.html', {'form': form, 'title': 'Nuevo Producto'})
 
 
+IMPORT_ERRORS_SHOWN = 500
+
+
+@login_required
+@require_can_write
+def product_import(request):
+    """Bulk product import from CSV/XLSX, with optional opening stock and dry-run"""
+    result = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_products(
+                    request.user.company, request.user, upload.file, upload.name,
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except ProductImportError as exc:
+                messages.error(request, str(exc))
+            else:
+                summary = (f'{result.created} productos nuevos, {result.updated} actualizados, '
+                           f'{result.opening_lines} saldos iniciales, {result.skipped_rows} filas con errores.')
+                if result.dry_run:
+                    messages.info(request, f'Validación sin guardar: {summary}')
+                else:
+                    messages.success(request, f'Importación completada: {summary}')
+                    notify(request.user, f'Importación de productos: {summary}', 'success', '/logistica/inventory/')
+    else:
+        form = ProductImportForm()
+
+    return render(request, 'logistica/product_import.html', {
+        'form': form,
+        'result': result,
+        'errors': result.errors[:IMPORT_ERRORS_SHOWN] if result else [],
+        'columns': list(PRODUCT_FIELDS) + ['warehouse', 'opening_quantity'],
+    })
+
+
 @login_required
 @require_can_write
 def product_edit(request, pk):
@@ -128,19 +250,59 @@ def product_delete(request, pk):
     })
 
 
+HISTORY_PAGE_SIZE = 100
+
+
 @login_required
 def product_history(request, pk):
-    """View product movement history (Traceability)"""
+    """View product movement history (Traceability), cursor-paginated, optionally as of a past date"""
     product = get_object_or_404(Product, pk=pk)
-    movements = StockMovement.objects.filter(product=product).select_related('warehouse', 'user').order_by('-timestamp')
-
-    stock_by_warehouse = Stock.objects.filter(product=product, quantity__gt=0).select_related('warehouse')
+    movements = StockMovement.objects.filter(product=product).select_related('warehouse', 'user')
+
+    as_of, cutoff = _parse_as_of(request)
+    if cutoff is not None:
+        movements = movements.filter(timestamp__lt=cutoff)
+
+    # Keyset (timestamp, id) descendente: servido por stockmov_co_prod_ts_idx sin OFFSET
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        anchor = StockMovement.objects.filter(product=product, pk=before).values_list('timestamp', flat=True).first()
+        if anchor is not None:
+            movements = movements.filter(Q(timestamp__lt=anchor) | Q(timestamp=anchor, pk__lt=before))
+    page = list(movements.order_by('-timestamp', '-id')[:HISTORY_PAGE_SIZE + 1])
+
+    next_page_query = ''
+    if len(page) > HISTORY_PAGE_SIZE:
+        page = page[:HISTORY_PAGE_SIZE]
+        params = request.GET.copy()
+        params['before'] = page[-1].pk
+        next_page_query = params.urlencode()
 
     context = {
         'product': product,
-        'movements': movements,
-        'stock_by_warehouse': stock_by_warehouse,
+        'movements': page,
+        'next_page_query': next_page_query,
+        'is_next_page': bool(before),
     }
+
+    if request.htmx:
+        return render(request, 'logistica/partials/movement_rows.html', context)
+
+    if cutoff is not None:
+        balances = checkpoints.stock_as_of(request.user.company, cutoff, product_ids=[product.pk])
+        warehouses = Warehouse.objects.in_bulk([warehouse_id for (_, warehouse_id), qty in balances.items() if qty])
+        stock_by_warehouse = [
+            {'warehouse': warehouses[warehouse_id], 'quantity': qty}
+            for (_, warehouse_id), qty in sorted(balances.items(), key=lambda item: item[0][1])
+            if qty and warehouse_id in warehouses
+        ]
+    else:
+        stock_by_warehouse = Stock.objects.filter(product=product, quantity__gt=0).select_related('warehouse')
+
+    context.update({
+        'stock_by_warehouse': stock_by_warehouse,
+        'as_of': as_of,
+    })
     return render(request, 'logistica/product_history.html', context)
 
 
@@ -160,45 +322,19 @@ def stock_adjustment(request, pk):
             reference = form.cleaned_data['reference']
             notes = form.cleaned_data['notes']
 
-            stock, created = Stock.objects.select_for_update().get_or_create(
-                product=product,
-                warehouse=warehouse,
-                company=request.user.company,  # Multi-Tenant
-                defaults={'quantity': Decimal('0.000')}
-            )
-
-            quantity_change = Decimal('0.000')
-
-            if movement_type == 'in':
-                stock.quantity += quantity
-                quantity_change = quantity
-            elif movement_type == 'out':
-                if stock.quantity < quantity:
-                    messages.error(request, f'Stock insuficiente en {warehouse.name}. Disponible: {stock.quantity}')
-                    return render(request, 'logistica/stock_adjustment.html', {'form': form, 'product': product})
-                stock.quantity -= quantity
-                quantity_change = -quantity
-            elif movement_type == 'adjustment':
-                quantity_change = quantity - stock.quantity
-                stock.quantity = quantity
-
-            stock.save()
-
-            StockMovement.objects.create(
-                company=request.user.company,  # Multi-Tenant
-                product=product,
-                warehouse=warehouse,
-                quantity_change=quantity_change,
-                movement_type=movement_type,
-                reference=reference,
-                notes=notes,
-                user=request.user,
-                unit_cost_at_movement=product.unit_cost,
-                running_balance=stock.quantity
-            )
-
-            messages.success(request, 'Movimiento registrado exitosamente.')
-            return redirect('logistica:product_history', pk=product.pk)
+            try:
+                post_movements(request.user.company, request.user, [
+                    MovementLine(product, warehouse, movement_type, quantity, reference, notes),
+                ])
+            except StockPostingError as exc:
+                # Solo el faltante trae available; los demás errores ya traen su propio mensaje
+                if exc.available is not None:
+                    messages.error(request, f'Stock insuficiente en {warehouse.name}. Disponible: {exc.available}')
+                else:
+                    messages.error(request, str(exc))
+            else:
+                messages.success(request, 'Movimiento registrado exitosamente.')
+                return redirect('logistica:product_history', pk=product.pk)
     else:
         form = StockMovementForm(company=request.user.company)
 
@@ -213,39 +349,112 @@ def stock_adjustment(request, pk):
 
 
 @login_required
-def export_inventory_csv(request):
-    """Export currently filtered inventory to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="inventario_{datetime.now().strftime("%Y%m%d")}.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['SKU', 'Nombre', 'Categoría', 'Costo Unitario', 'Stock Total', 'Descripción'])
+@require_can_write
+def stock_transfer(request):
+    """Move stock between two warehouses; every line posts in one batch"""
+    company = request.user.company
+    product_qs = Product.objects.filter(active=True, company=company).order_by('sku')
 
-    products = Product.objects.filter(active=True).annotate(
-        total_stock=Coalesce(Sum('stock__quantity'), Value(0), output_field=DecimalField())
+    if request.method == 'POST':
+        form = StockTransferForm(request.POST, company=company)
+        formset = StockTransferLineFormSet(request.POST, form_kwargs={'product_qs': product_qs})
+        if form.is_valid() and formset.is_valid():
+            source = form.cleaned_data['source']
+            destination = form.cleaned_data['destination']
+            lines = [
+                TransferLine(line['product'], source, destination, line['quantity'])
+                for line in formset.cleaned_data if line
+            ]
+            try:
+                reference, _ = post_transfer(
+                    company, request.user, lines,
+                    reference=form.cleaned_data['reference'], notes=form.cleaned_data['notes'],
+                )
+            except StockPostingError as exc:
+                if exc.available is not None:
+                    messages.error(
+                        request,
+                        f'Stock insuficiente de {exc.line.product.sku} en {source.name}. Disponible: {exc.available}',
+                    )
+                else:
+                    messages.error(request, str(exc))
+            else:
+                messages.success(
+                    request,
+                    f'Transferencia {reference} registrada: {len(lines)} producto(s) de {source.name} a {destination.name}.',
+                )
+                return redirect('logistica:stock_transfer')
+    else:
+        initial = []
+        product = product_qs.filter(pk=request.GET.get('product')).first() if request.GET.get('product', '').isdigit() else None
+        if product:
+            initial = [{'product': product}]
+        form = StockTransferForm(company=company)
+        formset = StockTransferLineFormSet(initial=initial, form_kwargs={'product_qs': product_qs})
+
+    recent_transfers = (
+        StockMovement.objects.filter(movement_type='transfer', quantity_change__gt=0)
+        .select_related('product', 'warehouse')
+        .order_by('-timestamp', '-id')[:10]
     )
+    return render(request, 'logistica/stock_transfer.html', {
+        'form': form,
+        'formset': formset,
+        'recent_transfers': recent_transfers,
+    })
 
-    query = request.GET.get('q')
-    if query:
-        products = products.filter(
-            Q(sku__icontains=query) |
-            Q(name__icontains=query)
-        )
 
-    category = request.GET.get('category')
-    if category:
-        products = products.filter(category__iexact=category)
+class _Echo:
+    """Pseudo-buffer for csv.writer: returns each row instead of storing it"""
+    def write(self, value):
+        return value
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _export_rows_as_of(products, company, cutoff):
+    """Keyset-chunked export rows with the stock total as of `cutoff`"""
+    # El generador corre después de que el middleware limpió el tenant del hilo
+    with tenant_context(company):
+        after = None
+        while True:
+            chunk = products.order_by('sku')
+            if after is not None:
+                chunk = chunk.filter(sku__gt=after)
+            chunk = list(chunk.values_list(
+                'pk', 'sku', 'name', 'category', 'unit_cost', 'description'
+            )[:EXPORT_CHUNK_SIZE])
+            if not chunk:
+                return
+            totals = checkpoints.product_totals_as_of(company, cutoff, [row[0] for row in chunk])
+            for pk, sku, name, category, unit_cost, description in chunk:
+                yield (sku, name, category, unit_cost, totals.get(pk, Decimal('0')), description)
+            after = chunk[-1][1]
 
-    for product in products:
-        writer.writerow([
-            product.sku,
-            product.name,
-            product.category,
-            product.unit_cost,
-            product.total_stock,
-            product.description
-        ])
 
+@login_required
+def export_inventory_csv(request):
+    """Export currently filtered inventory to CSV (streamed, same filters as inventory_list)"""
+    _, cutoff = _parse_as_of(request)
+    if cutoff is not None:
+        rows = _export_rows_as_of(_inventory_queryset(request), request.user.company, cutoff)
+    else:
+        rows = _inventory_queryset(request).annotate(
+            total_stock=_total_stock_subquery()
+        ).order_by('sku').values_list(
+            'sku', 'name', 'category', 'unit_cost', 'total_stock', 'description'
+        ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield writer.writerow(['SKU', 'Nombre', 'Categoría', 'Costo Unitario', 'Stock Total', 'Descripción'])
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="inventario_{datetime.now().strftime("%Y%m%d")}.csv"'
     return response
 
 
@@ -335,6 +544,214 @@ def warehouse_delete(request, pk):
     })
 
 
+# ------ Reorder Points ------
+
+REORDER_PAGE_SIZE = 50
+
+
+@login_required
+def reorder_point_list(request):
+    """Reorder points with current stock and suggested order quantity (keyset-paginated by SKU/warehouse)"""
+    company = request.user.company
+    points = reorder.with_on_hand(ReorderPoint.objects.filter(company=company)).select_related('product', 'warehouse')
+
+    query = request.GET.get('q')
+    if query:
+        points = points.filter(Q(product__sku__icontains=query) | Q(product__name__icontains=query))
+    warehouse = request.GET.get('warehouse', '')
+    if warehouse.isdigit():
+        points = points.filter(warehouse_id=warehouse)
+    below = request.GET.get('below')
+    if below:
+        points = points.filter(active=True, on_hand__lte=F('reorder_point'))
+
+    # Cursor = id del último punto; la posición real es (SKU, código de almacén), única por empresa
+    after = request.GET.get('after', '')
+    anchor = None
+    if after.isdigit():
+        anchor = ReorderPoint.objects.filter(pk=after, company=company).values('product__sku', 'warehouse__code').first()
+    if anchor:
+        points = points.filter(
+            Q(product__sku__gt=anchor['product__sku'])
+            | Q(product__sku=anchor['product__sku'], warehouse__code__gt=anchor['warehouse__code'])
+        )
+    page = list(points.order_by('product__sku', 'warehouse__code')[:REORDER_PAGE_SIZE + 1])
+
+    next_page_query = ''
+    if len(page) > REORDER_PAGE_SIZE:
+        page = page[:REORDER_PAGE_SIZE]
+        params = request.GET.copy()
+        params['after'] = page[-1].pk
+        next_page_query = params.urlencode()
+
+    for point in page:
+        point.is_below = point.active and point.on_hand <= point.reorder_point
+        point.suggested = max(point.max_quantity - point.on_hand, Decimal('0')) if point.is_below else None
+
+    context = {
+        'points': page,
+        'next_page_query': next_page_query,
+        'is_next_page': bool(anchor),
+    }
+    if request.htmx:
+        return render(request, 'logistica/partials/reorder_rows.html', context)
+
+    context.update({
+        'warehouses': Warehouse.objects.filter(active=True, company=company).order_by('code'),
+        'search_query': query or '',
+        'current_warehouse': warehouse,
+        'below': below,
+    })
+    return render(request, 'logistica/reorder_point_list.html', context)
+
+
+def _save_reorder_point(request, form, message):
+    point = form.save(commit=False)
+    point.company = request.user.company  # Multi-Tenant assignment
+    point.save()
+    # Un mínimo nuevo o más alto puede dejar al producto en alerta de inmediato
+    reorder.evaluate(point.company, {(point.product_id, point.warehouse_id)})
+    messages.success(request, message.format(point=point))
+    return redirect('logistica:reorder_point_list')
+
+
+@login_required
+@require_can_write
+def reorder_point_create(request):
+    """Create reorder parameters for a product in a warehouse"""
+    company = request.user.company
+    if request.method == 'POST':
+        form = ReorderPointForm(request.POST, company=company)
+        if form.is_valid():
+            return _save_reorder_point(request, form, 'Punto de reorden de {point.product.sku} en {point.warehouse.code} creado.')
+    else:
+        # ?product= desde el inventario; el pronóstico de demanda también sugiere almacén, mínimo y máximo
+        initial = {name: request.GET[name] for name in ('product', 'warehouse', 'reorder_point', 'max_quantity') if request.GET.get(name)}
+        if not initial.get('product', '').isdigit():
+            initial.pop('product', None)
+        form = ReorderPointForm(company=company, initial=initial or None)
+    return render(request, 'logistica/reorder_point_form.html', {'form': form, 'title': 'Nuevo Punto de Reorden'})
+
+
+@login_required
+@require_can_write
+def reorder_point_edit(request, pk):
+    company = request.user.company
+    point = get_object_or_404(ReorderPoint, pk=pk, company=company)  # Tenant-safe
+    if request.method == 'POST':
+        form = ReorderPointForm(request.POST, instance=point, company=company)
+        if form.is_valid():
+            return _save_reorder_point(request, form, 'Punto de reorden de {point.product.sku} en {point.warehouse.code} actualizado.')
+    else:
+        form = ReorderPointForm(instance=point, company=company)
+    return render(request, 'logistica/reorder_point_form.html', {'form': form, 'title': 'Editar Punto de Reorden', 'point': point})
+
+
+FORECAST_ROWS_SHOWN = 200
+
+
+@login_required
+def demand_forecast(request):
+    """Demand forecast and suggested order quantities for every product with outbound history"""
+    company = request.user.company
+    # Sin parámetros (p. ej. solo ?export=csv) se usan los valores por defecto
+    bound = any(name in request.GET for name in ForecastForm.base_fields)
+    form = ForecastForm(request.GET if bound else None, company=company)
+    if form.is_bound and not form.is_valid():
+        return render(request, 'logistica/demand_forecast.html', {'form': form, 'rows': []})
+
+    options = form.cleaned_data if form.is_bound else {name: field.initial for name, field in form.fields.items()}
+    warehouse = options.get('warehouse')
+    params = forecasting.ForecastParams(
+        bucket=options['bucket'], window=options['window'], alpha=options['alpha'], method=options['method'],
+        service_level=float(options['service_level']),
+        lead_time_days=options['lead_time_days'], review_days=options['review_days'],
+    )
+    result = forecasting.forecast_company(company, params, warehouse=warehouse)
+
+    if request.GET.get('export') == 'csv':
+        rows = forecasting.csv_rows(company, result)
+        writer = csv.writer(_Echo())
+
+        def stream():
+            yield writer.writerow(forecasting.CSV_HEADER)
+            for row in rows:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="pronostico_demanda.csv"'
+        return response
+
+    # Primero lo que más urge pedir; empates por demanda diaria
+    order = np.lexsort((-result.smoothed, -result.suggested))[:FORECAST_ROWS_SHOWN]
+    products = Product.objects.in_bulk([int(result.product_ids[index]) for index in order])
+    rows = []
+    for index in order:
+        product = products.get(int(result.product_ids[index]))
+        if product is None:
+            continue
+        rows.append({
+            'product': product,
+            'moving_average': result.moving_average[index],
+            'smoothed': result.smoothed[index],
+            'safety_stock': result.safety_stock[index],
+            'reorder_point': result.reorder_point[index],
+            'order_up_to': result.order_up_to[index],
+            'on_hand': result.on_hand[index],
+            'suggested': result.suggested[index],
+        })
+
+    return render(request, 'logistica/demand_forecast.html', {
+        'form': form,
+        'rows': rows,
+        'warehouse': warehouse,
+        'product_count': len(result.product_ids),
+        'to_order_count': int(np.count_nonzero(result.suggested)),
+        'export_query': request.GET.urlencode() if bound else '',
+    })
+
+
+@login_required
+def inventory_classification(request):
+    """ABC / XYZ matrix of the stored classification, linking each cell to the filtered inventory"""
+    cells, computed_at = classification.summary(request.user.company)
+    total_value = sum((cell['consumption_value'] for cell in cells.values()), Decimal('0'))
+    matrix = []
+    for abc in ('A', 'B', 'C'):
+        row = []
+        for xyz in ('X', 'Y', 'Z'):
+            cell = cells.get((abc, xyz), {'count': 0, 'consumption_value': Decimal('0'), 'inventory_value': Decimal('0')})
+            row.append({
+                **cell,
+                'abc': abc,
+                'xyz': xyz,
+                'share': cell['consumption_value'] / total_value * 100 if total_value else Decimal('0'),
+            })
+        matrix.append((abc, row))
+
+    return render(request, 'logistica/inventory_classification.html', {
+        'matrix': matrix,
+        'computed_at': computed_at,
+        'product_count': sum(cell['count'] for cell in cells.values()),
+        'total_value': total_value,
+        'thresholds': {
+            'a': int(classification.A_SHARE * 100), 'b': int(classification.B_SHARE * 100),
+            'x': classification.X_MAX_CV, 'y': classification.Y_MAX_CV,
+            'days': classification.HISTORY_DAYS,
+        },
+    })
+
+
+@login_required
+@require_can_write
+def inventory_classification_refresh(request):
+    """Recompute the tenant's ABC / XYZ classification now (POST)"""
+    if request.method == 'POST':
+        counts = classification.classify(request.user.company)
+        messages.success(request, f'Clasificación ABC/XYZ recalculada: {sum(counts.values())} productos.')
+    return redirect('logistica:inventory_classification')
+
+
 # ------ Suppliers ------
 
 @login_required
@@ -413,84 +830,57 @@ def supplier_delete(request, pk):
     })
 
 
+SAT_PAGE_SIZE = 30
+
+
 @login_required
 def sat_product_search(request):
-    """HTMX endpoint to search SAT Product Codes globally with Infinite Scroll"""
+    """HTMX endpoint to search SAT Product Codes globally with Infinite Scroll (keyset, no COUNT)"""
     query = request.GET.get('q', '').strip()
     sort_dir = request.GET.get('sort', 'asc')
-    page_num = request.GET.get('page', 1)
-    
-    search_term = query.lower()
-    queryset = SatProductCode.objects.filter(active=True)
     
-    order_by_field = 'description' if sort_dir == 'asc' else '-description'
-
-    if not search_term:
-        # Case: Empty search -> load entire catalog ordered
-        results_qs = queryset.order_by(order_by_field)
-    elif search_term.isdigit():
-        if len(search_term) == 8:
-            # Case 1: Exact ID (8 digits) -> filter directly
-            results_qs = queryset.filter(code=search_term)
-        else:
-            # Case 1.5: Partial ID -> match prefix (e.g. typing "6010" finds "60102401")
-            results_qs = queryset.filter(code__startswith=search_term).order_by('code')
-    else:
-        # Case 2: Text search with hybrid logic
-        aliases = {
-            "abarrotes": ["alimentos", "comestibles"],
-            "software": ["programa", "app"],
-            "computadora": ["computador", "pc", "laptop"],
-            "flete": ["transporte", "envio", "logistica"],
-            "refresco": ["bebida", "soda"]
-        }
-        
-        expanded_terms = search_term.split()
-        for k, v in aliases.items():
-            if k in search_term:
-                expanded_terms.extend(v)
-                
-        search_str = " ".join(expanded_terms)
-        
-        from django.db import connection
-        
-        if connection.vendor == 'postgresql':
-            from django.contrib.postgres.search import TrigramWordSimilarity
-            from django.db.models import CharField, Q
-            from django.contrib.postgres.lookups import Unaccent
-            CharField.register_lookup(Unaccent)
-            
-            q_exact = Q()
-            for token in expanded_terms:
-                q_exact &= Q(description__unaccent__icontains=token)
-                
-            res_exact = queryset.filter(q_exact).order_by(order_by_field)
-            
-            if res_exact.exists():
-                results_qs = res_exact.annotate(
-                    similarity=TrigramWordSimilarity(search_str, 'description')
-                ).order_by('-similarity', order_by_field)
-            else:
-                results_qs = queryset.annotate(
-                    similarity=TrigramWordSimilarity(search_str, 'description')
-                ).filter(similarity__gt=0.15).order_by('-similarity', order_by_field)
+    search_term = search_cache.normalize_query(query)
+    index = sat_index.get_index()
+    reverse = sort_dir != 'asc'
+    # ?after=<similarity>:<code> de la última fila entregada
+    cursor = request.GET.get('after')
+    after = index.parse_cursor(cursor)
+    if cursor and after is None:
+        # La clave del cursor ya no está en el catálogo: no hay más páginas que servir
+        return HttpResponse('')
+
+    def compute():
+        if not search_term:
+            # Case: Empty search -> load entire catalog ordered
+            return index.catalog(reverse=reverse, after=after, limit=SAT_PAGE_SIZE + 1)
+        elif search_term.isdigit():
+            # Case 1: exact (8 digits) or partial ID -> code prefix (e.g. typing "6010" finds "60102401")
+            return index.search_code(search_term, after=after, limit=SAT_PAGE_SIZE + 1)
         else:
-            from django.db.models import Q
-            from django.db.models.functions import Length
-            q_exact = Q()
-            for token in expanded_terms:
-                q_exact &= Q(description__icontains=token)
-            results_qs = queryset.filter(q_exact).annotate(
-                name_len=Length('description')
-            ).order_by('name_len', order_by_field)
-            
-    from django.core.paginator import Paginator
-    paginator = Paginator(results_qs, 30)
-    page_obj = paginator.get_page(page_num)
-    
+            # Case 2: accent-folded token/prefix search with synonyms and typo fallback
+            return index.search(
+                search_term,
+                synonyms=synonyms.synonym_map(request.user.company),
+                reverse=reverse,
+                after=after,
+                limit=SAT_PAGE_SIZE + 1,
+            )
+
+    results = search_cache.cached_search(
+        'sat_product', request.user.company, search_term, compute, sort=sort_dir, cursor=cursor,
+    )
+
+    next_page_query = ''
+    if len(results) > SAT_PAGE_SIZE:
+        results = results[:SAT_PAGE_SIZE]
+        params = request.GET.copy()
+        params['after'] = results[-1].cursor
+        next_page_query = params.urlencode()
+
     return render(request, 'logistica/partials/sat_search_results.html', {
-        'page_obj': page_obj,
-        'results': page_obj.object_list,
+        'results': results,
+        'next_page_query': next_page_query,
+        'is_next_page': after is not None,
         'type': 'product',
         'q': query,
         'sort': sort_dir
@@ -504,34 +894,23 @@ def sat_unit_search(request):
     if len(query) < 1:
         return HttpResponse('')
     
-    aliases = {
-        "kilo": ["kilogramo", "kgm"],
-        "kilogramo": ["kilo", "kgm"],
-        "litro": ["ltr", "litros"],
-        "litros": ["ltr", "litro"],
-        "pieza": ["h87", "piezas", "pza", "pz"],
-        "piezas": ["h87", "pieza", "pza", "pz"],
-        "caja": ["xbx", "cajas"],
-        "cajas": ["xbx", "caja"],
-    }
-    
-    expanded_terms = [query.lower()]
-    for k, v in aliases.items():
-        if k in query.lower():
-            expanded_terms.extend(v)
-            
-    q_exact = Q()
-    for token in expanded_terms:
-        q_exact |= Q(code__icontains=token) | Q(name__icontains=token)
-        
-    from django.db.models.functions import Length
-    
-    results = SatUnitCode.objects.filter(
-        q_exact,
-        active=True
-    ).annotate(
-        name_len=Length('name')
-    ).order_by('name_len', 'code')[:15]
+    def compute():
+        expanded_terms = synonyms.expand_terms(request.user.company, search_cache.normalize_query(query))
+
+        q_exact = Q()
+        for token in expanded_terms:
+            q_exact |= Q(code__icontains=token) | Q(name__icontains=token)
+
+        from django.db.models.functions import Length
+
+        return list(SatUnitCode.objects.filter(
+            q_exact,
+            active=True
+        ).annotate(
+            name_len=Length('name')
+        ).order_by('name_len', 'code')[:15])
+
+    results = search_cache.cached_search('sat_unit', request.user.company, query, compute)
     
     return render(request, 'logistica/partials/sat_search_results.html', {
         'results': results,
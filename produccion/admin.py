@@ -9,11 +9,11 @@ class BOMLineInline(admin.TabularInline):
 
 @admin.register(BillOfMaterial)
 class BillOfMaterialAdmin(admin.ModelAdmin):
-    list_display = ['product', 'version', 'active', 'created_at', 'created_by']
+    list_display = ['product', 'version', 'active', 'rolled_up_cost', 'created_at', 'created_by']
     list_filter = ['active', 'created_at']
     search_fields = ['product__sku', 'product__name']
     inlines = [BOMLineInline]
-    readonly_fields = ['created_at', 'created_by']
+    readonly_fields = ['created_at', 'created_by', 'rolled_up_cost', 'cost_rolled_at']
     
     def save_model(self, request, obj, form, change):
         if not obj.pk:
@@ -0,0 +1,61 @@
+"""
+Producción Availability - Pre-release material check
+KoreBase ERP System
+
+Antes de liberar una orden se compara lo que consumirá al completarse (BOM ×
+cantidad planificada) con el Stock de su almacén. Una sola consulta agrupada
+por (orden, componente) trae el requerimiento y la existencia, así que revisar
+una orden o todas las pendientes del tablero cuesta lo mismo. Cada orden se
+evalúa contra la existencia completa, sin descontar lo que piden las demás.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from logistica.models import Stock
+
+
+ZERO_QTY = Decimal('0.000')
+
+
+class Shortage(NamedTuple):
+    """A component the order needs more of than its warehouse holds"""
+    component_id: int
+    required: Decimal
+    on_hand: Decimal
+
+    @property
+    def missing(self):
+        return self.required - self.on_hand
+
+
+def shortages(company, orders):
+    """
+    {order pk: [Shortage]} for the orders of the `orders` queryset that lack
+    material; orders without BOM or with everything on hand are left out.
+    """
+    on_hand = Stock.objects.filter(
+        company=company, product=OuterRef('bom__lines__component'), warehouse=OuterRef('warehouse'),
+    ).values('quantity')[:1]
+    quantity = DecimalField(max_digits=30, decimal_places=6)
+    rows = orders.filter(company=company, bom__isnull=False).values('pk', 'bom__lines__component').annotate(
+        required=Sum(ExpressionWrapper(F('bom__lines__quantity') * F('quantity_planned'), output_field=quantity)),
+        on_hand=Coalesce(Subquery(on_hand), Value(ZERO_QTY), output_field=quantity),
+    ).order_by('pk', 'bom__lines__component')
+
+    found = {}
+    for row in rows:
+        if row['bom__lines__component'] is None:
+            continue  # BOM sin líneas
+        required = Decimal(str(row['required'])).quantize(ZERO_QTY)
+        available = max(Decimal(str(row['on_hand'])).quantize(ZERO_QTY), ZERO_QTY)
+        if required > available:
+            found.setdefault(row['pk'], []).append(Shortage(row['bom__lines__component'], required, available))
+    return found
+
+
+def order_shortages(company, order):
+    """[Shortage] of one work order (empty when it can be released)"""
+    return shortages(company, type(order).objects.filter(pk=order.pk)).get(order.pk, [])
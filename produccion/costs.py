@@ -0,0 +1,174 @@
+"""
+Producción Costs - Rolled-up standard cost per BOM
+KoreBase ERP System
+
+Cada BOM guarda su costo de materiales acumulado: Σ cantidad × costo del
+componente, donde el costo de un subensamble es el acumulado de su BOM activa
+(versión más alta) y el de un material comprado su unit_cost. Cuando cambia
+el costo de un producto o una línea de BOM solo se recalculan las BOMs que lo
+usan, directa o indirectamente: el índice de uso (BOMLine por componente) se
+recorre hacia arriba un nivel por consulta y los afectados se recalculan
+hijos antes que padres. Las señales juntan todos los cambios de una
+transacción en un solo recálculo al confirmarse.
+"""
+import threading
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica.costing import quantize_cost
+from logistica.models import Product
+
+from .models import BillOfMaterial, BOMLine
+
+
+WHERE_USED_CHUNK_SIZE = 2000
+WRITE_BATCH_SIZE = 1000
+
+_pending = threading.local()
+
+
+def where_used(company, product_ids):
+    """{bom_id: product_id} of every BOM containing one of `product_ids` at any level"""
+    boms = {}
+    seen = set(product_ids)
+    frontier = sorted(seen)
+    while frontier:
+        parents = set()
+        for offset in range(0, len(frontier), WHERE_USED_CHUNK_SIZE):
+            rows = BOMLine.objects.filter(
+                bom__company=company, component_id__in=frontier[offset:offset + WHERE_USED_CHUNK_SIZE],
+            ).values_list('bom_id', 'bom__product_id').distinct()
+            for bom_id, product_id in rows:
+                boms[bom_id] = product_id
+                parents.add(product_id)
+        frontier = sorted(parents - seen)
+        seen.update(frontier)
+    return boms
+
+
+def component_costs(company, product_ids):
+    """
+    {product_id: (unit cost, bom_id or None)}: the rolled-up cost of the
+    product's active BOM when it is a sub-assembly, else its unit_cost.
+    """
+    costs = dict.fromkeys(product_ids)
+    for pk, unit_cost in Product.objects.filter(company=company, pk__in=costs).values_list('pk', 'unit_cost'):
+        costs[pk] = (unit_cost, None)
+    active = BillOfMaterial.objects.filter(company=company, active=True, product_id__in=costs)
+    seen = set()
+    for bom_id, product_id, rolled_up in active.order_by('product_id', '-version').values_list(
+        'pk', 'product_id', 'rolled_up_cost',
+    ):
+        if product_id in seen:
+            continue
+        seen.add(product_id)
+        if rolled_up is not None:
+            costs[product_id] = (rolled_up, bom_id)
+        else:
+            costs[product_id] = (costs[product_id][0], bom_id)
+    return costs
+
+
+def _recompute(company, boms):
+    """Recompute and store the rolled-up cost of the `boms` queryset, children first"""
+    products = dict(boms.values_list('pk', 'product_id'))
+    if not products:
+        return 0
+    lines = defaultdict(list)
+    for bom_id, component_id, quantity in BOMLine.objects.filter(bom__in=boms.values('pk')).values_list(
+        'bom_id', 'component_id', 'quantity',
+    ):
+        lines[bom_id].append((component_id, quantity))
+    costs = component_costs(company, {component_id for rows in lines.values() for component_id, _ in rows})
+
+    # Una BOM espera a las BOMs activas de sus componentes que también se recalculan
+    waiting = defaultdict(int)
+    dependents = defaultdict(list)
+    for bom_id, rows in lines.items():
+        for component_id, _ in rows:
+            child = costs[component_id][1]
+            if child in products and child != bom_id:
+                waiting[bom_id] += 1
+                dependents[child].append(bom_id)
+    ready = deque(sorted(bom_id for bom_id in products if not waiting[bom_id]))
+    ordered = []
+    while ready:
+        bom_id = ready.popleft()
+        ordered.append(bom_id)
+        for parent in dependents[bom_id]:
+            waiting[parent] -= 1
+            if not waiting[parent]:
+                ready.append(parent)
+    # Un ciclo no tiene orden válido: esas BOMs usan el último costo guardado de sus hijos
+    ordered.extend(sorted(set(products) - set(ordered)))
+
+    now = timezone.now()
+    rolled = {}
+    for bom_id in ordered:
+        total = Decimal('0')
+        for component_id, quantity in lines[bom_id]:
+            unit_cost, child = costs[component_id]
+            total += quantity * rolled.get(child, unit_cost)
+        rolled[bom_id] = quantize_cost(total)
+
+    BillOfMaterial.objects.bulk_update(
+        [BillOfMaterial(pk=bom_id, rolled_up_cost=cost, cost_rolled_at=now) for bom_id, cost in rolled.items()],
+        ['rolled_up_cost', 'cost_rolled_at'],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+    return len(rolled)
+
+
+def refresh(company, bom_ids=(), product_ids=()):
+    """
+    Recompute `bom_ids` and every BOM that uses, at any level, one of
+    `product_ids` or the product of one of `bom_ids`. Returns the number of
+    BOMs written.
+    """
+    bom_ids = set(bom_ids)
+    product_ids = set(product_ids)
+    product_ids.update(
+        BillOfMaterial.objects.filter(company=company, pk__in=bom_ids).values_list('product_id', flat=True)
+    )
+    bom_ids.update(where_used(company, product_ids))
+    return _recompute(company, BillOfMaterial.objects.filter(company=company, pk__in=bom_ids))
+
+
+def rebuild(company):
+    """Recompute the rolled-up cost of every BOM of `company`"""
+    return _recompute(company, BillOfMaterial.objects.filter(company=company))
+
+
+class _Batch(dict):
+    """{company_id: (bom_ids, product_ids)} refreshed when its transaction commits"""
+
+    def __call__(self):
+        if getattr(_pending, 'batch', None) is self:
+            _pending.batch = None
+        for company in Company.objects.filter(pk__in=self):
+            with tenant_context(company):
+                refresh(company, *self[company.pk])
+
+
+def schedule(company_id, bom_ids=(), product_ids=()):
+    """
+    Queue a refresh for when the current transaction commits; every change
+    of one transaction (a BOM and all its lines) is refreshed together.
+    """
+    connection = transaction.get_connection()
+    batch = getattr(_pending, 'batch', None)
+    # El lote vive mientras su callback siga en la transacción: un rollback lo
+    # descarta junto con los ids que juntó, y tras el commit se empieza otro
+    registered = batch is not None and any(callback is batch for _, callback, _ in connection.run_on_commit)
+    if not registered:
+        batch = _pending.batch = _Batch()
+    queued_boms, queued_products = batch.setdefault(company_id, (set(), set()))
+    queued_boms.update(bom_ids)
+    queued_products.update(product_ids)
+    if not registered:
+        transaction.on_commit(batch)
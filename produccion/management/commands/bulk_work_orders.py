@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company, CustomUser
+from produccion import services
+from produccion.models import WorkOrder
+
+
+class Command(BaseCommand):
+    help = (
+        "Inicia (release) o completa (complete) un conjunto de órdenes de trabajo en una sola "
+        "transacción; al completar, el consumo de todas las órdenes se registra en un solo lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['release', 'complete'])
+        parser.add_argument('orders', nargs='*', help="Números de orden")
+        parser.add_argument('--company', required=True, help="UUID de la empresa")
+        parser.add_argument('--user', required=True, help="Usuario que registra los movimientos")
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Todas las órdenes pendientes (release) o en proceso (complete)",
+        )
+        parser.add_argument('--best-effort', action='store_true', help="Omitir las órdenes con error y procesar las demás")
+        parser.add_argument('--force', action='store_true', help="release: iniciar aunque falte material")
+
+    def handle(self, *args, **options):
+        if bool(options['orders']) == options['all']:
+            raise CommandError("Indique números de orden o --all (no ambos)")
+        company = Company.objects.filter(pk=options['company']).first()
+        if company is None:
+            raise CommandError(f"Empresa no encontrada: {options['company']}")
+        user = CustomUser.objects.filter(company=company, username=options['user']).first()
+        if user is None:
+            raise CommandError(f"Usuario no encontrado en {company.name}: {options['user']}")
+
+        with tenant_context(company):
+            orders = WorkOrder.objects.filter(company=company)
+            if options['all']:
+                orders = orders.filter(status='pending' if options['action'] == 'release' else 'in_progress')
+            else:
+                orders = orders.filter(work_order_number__in=options['orders'])
+            pks = list(orders.values_list('pk', flat=True))
+            missing = set(options['orders']) - set(orders.values_list('work_order_number', flat=True))
+            if missing and not options['best_effort']:
+                raise CommandError(f"Órdenes no encontradas: {', '.join(sorted(missing))}")
+
+            try:
+                if options['action'] == 'release':
+                    result = services.release_work_orders(
+                        company, user, pks, force=options['force'], best_effort=options['best_effort'],
+                    )
+                else:
+                    result = services.complete_work_orders(company, user, pks, best_effort=options['best_effort'])
+            except services.WorkOrderBatchError as exc:
+                for number, reason in exc.failures:
+                    self.stderr.write(f"    {number}: {reason}")
+                raise CommandError(f"{exc} No se aplicó ningún cambio.")
+
+        failures = result.failures + [(number, 'Orden no encontrada.') for number in sorted(missing)]
+        for number, reason in failures:
+            self.stdout.write(self.style.WARNING(f"    {number}: {reason}"))
+        self.stdout.write(f"[*] {company.name}: {len(result.done)} procesadas, {len(failures)} omitidas")
+        self.stdout.write(self.style.SUCCESS("[OK] Órdenes de trabajo procesadas"))
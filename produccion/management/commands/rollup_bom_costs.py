@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company
+from produccion import costs
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el costo estándar de materiales acumulado de todas las BOMs de cada empresa. "
+        "Los cambios normales se recalculan solos; úselo al instalar o tras cargas masivas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        for company in companies:
+            with tenant_context(company):
+                count = costs.rebuild(company)
+            self.stdout.write(f"[*] {company.name}: {count} BOMs")
+
+        self.stdout.write(self.style.SUCCESS("[OK] Costos de BOM recalculados"))
@@ -0,0 +1,71 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.middleware import tenant_context
+from core.models import Company
+from logistica.models import Product, Warehouse
+from produccion import mrp
+
+
+CSV_HEADER = ['almacen', 'sku', 'producto', 'tipo', 'requerimiento_bruto', 'existencia', 'ordenes_abiertas', 'requerimiento_neto']
+
+
+class Command(BaseCommand):
+    help = (
+        "Explota todas las órdenes de trabajo abiertas a través de las BOMs multinivel y "
+        "calcula el requerimiento neto (descontando existencias y lo pendiente de sus órdenes "
+        "abiertas) y los faltantes de materiales por almacén."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', help="UUID de la empresa (por defecto: todas)")
+        parser.add_argument('--output', help="CSV con los requerimientos netos (requiere --company)")
+        parser.add_argument('--shortages', action='store_true', help="Solo materiales con faltante")
+
+    def handle(self, *args, **options):
+        if options['output'] and not options['company']:
+            raise CommandError("--output requiere --company")
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+            if not companies.exists():
+                raise CommandError(f"Empresa no encontrada: {options['company']}")
+
+        for company in companies:
+            with tenant_context(company):
+                try:
+                    result = mrp.run(company)
+                except mrp.MRPError as exc:
+                    raise CommandError(f"{company.name}: {exc} (productos {exc.product_ids})")
+                requirements = [r for r in result.requirements if not options['shortages'] or r.shortage]
+                if options['output']:
+                    self._write(company, requirements, options['output'])
+            shortages = sum(1 for requirement in result.requirements if requirement.shortage)
+            self.stdout.write(
+                f"[*] {company.name}: {result.order_count} órdenes abiertas, "
+                f"{len(result.requirements)} requerimientos, {shortages} faltantes"
+            )
+            if result.orders_without_bom:
+                self.stdout.write(f"    Sin BOM activa: {', '.join(result.orders_without_bom)}")
+
+        self.stdout.write(self.style.SUCCESS("[OK] MRP calculado"))
+
+    def _write(self, company, requirements, path):
+        products = Product.objects.in_bulk({requirement.product_id for requirement in requirements})
+        warehouses = dict(Warehouse.objects.filter(company=company).values_list('pk', 'name'))
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(CSV_HEADER)
+            for requirement in requirements:
+                product = products[requirement.product_id]
+                writer.writerow([
+                    warehouses.get(requirement.warehouse_id, requirement.warehouse_id),
+                    product.sku,
+                    product.name,
+                    'fabricar' if requirement.make else 'comprar',
+                    requirement.gross,
+                    requirement.on_hand,
+                    requirement.scheduled,
+                    requirement.net,
+                ])
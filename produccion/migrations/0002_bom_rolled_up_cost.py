@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:33
+
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+COST_PLACES = Decimal('0.0001')
+
+
+def rollup_existing_boms(apps, schema_editor):
+    """
+    Initial rolled-up cost of every BOM, with the rules of produccion.costs:
+    a sub-assembly costs what its active (highest version) BOM rolls up to,
+    a purchased component its unit_cost; a BOM reached again through a cycle
+    counts its product's unit_cost.
+    """
+    BillOfMaterial = apps.get_model('produccion', 'BillOfMaterial')
+    BOMLine = apps.get_model('produccion', 'BOMLine')
+    Product = apps.get_model('logistica', 'Product')
+
+    lines = defaultdict(list)
+    for bom_id, component_id, quantity in BOMLine.objects.values_list('bom_id', 'component_id', 'quantity'):
+        lines[bom_id].append((component_id, quantity))
+    unit_costs = dict(Product.objects.filter(
+        pk__in={component_id for rows in lines.values() for component_id, _ in rows},
+    ).values_list('pk', 'unit_cost'))
+    active = {}
+    for bom_id, product_id in BillOfMaterial.objects.filter(active=True).order_by('product_id', '-version').values_list(
+        'pk', 'product_id',
+    ):
+        active.setdefault(product_id, bom_id)
+
+    rolled = {}
+    for root in BillOfMaterial.objects.values_list('pk', flat=True):
+        # Recorrido en postorden sin recursión: los hijos se calculan antes que el padre
+        stack, path = [root], set()
+        while stack:
+            bom_id = stack[-1]
+            if bom_id in rolled:
+                stack.pop()
+                continue
+            pending = [] if bom_id in path else [
+                active[component_id] for component_id, _ in lines[bom_id]
+                if active.get(component_id) not in (None, bom_id)
+                and active[component_id] not in rolled and active[component_id] not in path
+            ]
+            if pending:
+                path.add(bom_id)
+                stack.extend(pending)
+                continue
+            total = Decimal('0')
+            for component_id, quantity in lines[bom_id]:
+                child = active.get(component_id)
+                total += quantity * rolled.get(child, unit_costs.get(component_id) or Decimal('0'))
+            rolled[bom_id] = total.quantize(COST_PLACES, rounding=ROUND_HALF_UP)
+            path.discard(bom_id)
+            stack.pop()
+
+    now = timezone.now()
+    BillOfMaterial.objects.bulk_update(
+        [BillOfMaterial(pk=bom_id, rolled_up_cost=cost, cost_rolled_at=now) for bom_id, cost in rolled.items()],
+        ['rolled_up_cost', 'cost_rolled_at'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistica', '0001_initial'),
+        ('produccion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billofmaterial',
+            name='cost_rolled_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Costo Calculado'),
+        ),
+        migrations.AddField(
+            model_name='billofmaterial',
+            name='rolled_up_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=15, null=True, verbose_name='Costo Estándar de Materiales'),
+        ),
+        migrations.RunPython(rollup_existing_boms, migrations.RunPython.noop),
+    ]
@@ -16,6 +16,12 @@ class BillOfMaterial(TenantAwareModel):
     notes = models.TextField(blank=True, verbose_name="Notas")
     created_by = models.ForeignKey('core.CustomUser', on_delete=models.PROTECT, related_name='boms_created')
 
+    # Costo de materiales acumulado por todos los niveles (lo mantiene produccion.costs)
+    rolled_up_cost = models.DecimalField(
+        max_digits=15, decimal_places=4, null=True, blank=True, verbose_name="Costo Estándar de Materiales"
+    )
+    cost_rolled_at = models.DateTimeField(null=True, blank=True, verbose_name="Costo Calculado")
+
     class Meta:
         verbose_name = "Lista de Materiales"
         verbose_name_plural = "Listas de Materiales"
@@ -0,0 +1,196 @@
+"""
+Producción MRP - Multi-level material requirements
+KoreBase ERP System
+
+La estructura de todas las BOMs de la empresa se lee en dos consultas y se
+recorre en memoria. Las necesidades brutas de las órdenes abiertas se
+acumulan por producto y almacén; cada producto se procesa una sola vez, en
+orden topológico (todos sus padres antes que él): se neta contra Stock (una
+consulta agrupada) y contra las recepciones programadas (lo que aún falta
+producir de sus propias órdenes abiertas en ese almacén) y, si es un
+subensamble con BOM activa, solo lo que falta se explota al siguiente nivel. El costo depende del número de productos
+distintos, no del número de órdenes ni de la profundidad de las BOMs.
+"""
+from collections import defaultdict, deque
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db.models import Q
+
+from logistica.models import Stock
+
+from .models import BillOfMaterial, BOMLine, WorkOrder
+
+
+ZERO_QTY = Decimal('0.000')
+OPEN_STATUSES = ('pending', 'in_progress')
+STOCK_CHUNK_SIZE = 2000
+
+
+class MRPError(ValueError):
+    """The BOM structure cannot be exploded (e.g. a product contains itself)."""
+
+    def __init__(self, message, product_ids=()):
+        super().__init__(message)
+        self.product_ids = list(product_ids)
+
+
+class BomIndex:
+    """
+    In-memory BOM structure of one company.
+
+    Holds the lines of every active BOM (plus any extra bom_ids, e.g. the
+    inactive BOM an open order still points to). A product's own BOM is its
+    active BOM with the highest version. Lines repeating a component are
+    summed.
+    """
+
+    def __init__(self, company, bom_ids=()):
+        extra = Q(pk__in=list(bom_ids)) if bom_ids else Q(pk__in=[])
+        boms = BillOfMaterial.objects.filter(company=company).filter(Q(active=True) | extra)
+        self.active = {}
+        for pk, product_id, active in boms.order_by('product_id', '-version').values_list('pk', 'product_id', 'active'):
+            if active:
+                self.active.setdefault(product_id, pk)
+
+        lines = defaultdict(dict)
+        rows = BOMLine.objects.filter(bom__in=boms.values('pk')).values_list('bom_id', 'component_id', 'quantity')
+        for bom_id, component_id, quantity in rows:
+            lines[bom_id][component_id] = lines[bom_id].get(component_id, ZERO_QTY) + quantity
+        self._lines = {bom_id: list(components.items()) for bom_id, components in lines.items()}
+
+    def bom_lines(self, bom_id):
+        """[(component_id, quantity per unit)] of a BOM"""
+        return self._lines.get(bom_id, [])
+
+    def components(self, product_id):
+        """[(component_id, quantity per unit)] of the product's active BOM; [] if it is bought"""
+        bom_id = self.active.get(product_id)
+        return self.bom_lines(bom_id) if bom_id is not None else []
+
+    def topological(self, product_ids):
+        """
+        Every product reachable from `product_ids` through active BOMs, each
+        listed after all of its parents. Raises MRPError on a cycle.
+        """
+        reachable = set()
+        pending = list(product_ids)
+        while pending:
+            product_id = pending.pop()
+            if product_id in reachable:
+                continue
+            reachable.add(product_id)
+            pending.extend(component_id for component_id, _ in self.components(product_id))
+
+        parents = defaultdict(int)
+        for product_id in reachable:
+            for component_id, _ in self.components(product_id):
+                parents[component_id] += 1
+
+        ordered = []
+        ready = deque(sorted(product_id for product_id in reachable if not parents[product_id]))
+        while ready:
+            product_id = ready.popleft()
+            ordered.append(product_id)
+            for component_id, _ in self.components(product_id):
+                parents[component_id] -= 1
+                if not parents[component_id]:
+                    ready.append(component_id)
+
+        if len(ordered) < len(reachable):
+            cycle = sorted(reachable - set(ordered))
+            raise MRPError('Las listas de materiales forman un ciclo (un producto se contiene a sí mismo).', cycle)
+        return ordered
+
+
+class Requirement(NamedTuple):
+    """Net requirement of one product in one warehouse"""
+    warehouse_id: int
+    product_id: int
+    gross: Decimal
+    on_hand: Decimal
+    scheduled: Decimal  # pendiente de producir en órdenes abiertas del mismo producto y almacén
+    net: Decimal
+    make: bool  # True: subensamble a fabricar; False: material a comprar
+
+    @property
+    def shortage(self):
+        return ZERO_QTY if self.make else self.net
+
+
+class MRPResult(NamedTuple):
+    requirements: list
+    order_count: int
+    orders_without_bom: list
+
+
+def stock_levels(company, keys):
+    """{(product_id, warehouse_id): quantity} for the given keys, in grouped chunked queries"""
+    product_ids = sorted({product_id for product_id, _ in keys})
+    warehouse_ids = {warehouse_id for _, warehouse_id in keys}
+    levels = {}
+    for offset in range(0, len(product_ids), STOCK_CHUNK_SIZE):
+        rows = Stock.objects.filter(
+            company=company,
+            product_id__in=product_ids[offset:offset + STOCK_CHUNK_SIZE],
+            warehouse_id__in=warehouse_ids,
+        ).values_list('product_id', 'warehouse_id', 'quantity')
+        levels.update(((product_id, warehouse_id), quantity) for product_id, warehouse_id, quantity in rows)
+    return levels
+
+
+def run(company, warehouse=None):
+    """
+    Explode every open work order of `company` (optionally one warehouse).
+
+    The outstanding quantity of each order (planned - produced) is exploded
+    through the order's BOM, or the product's active BOM when the order has
+    none, and counts as a scheduled receipt of its product in its warehouse:
+    a sub-assembly requirement is netted against stock and those receipts
+    before the rest is exploded. Returns an MRPResult whose requirements are
+    ordered parents first.
+    """
+    orders = WorkOrder.objects.filter(company=company, status__in=OPEN_STATUSES)
+    if warehouse is not None:
+        orders = orders.filter(warehouse=warehouse)
+    orders = list(orders.values_list(
+        'work_order_number', 'product_id', 'bom_id', 'warehouse_id', 'quantity_planned', 'quantity_produced',
+    ))
+    index = BomIndex(company, {bom_id for _, _, bom_id, _, _, _ in orders if bom_id})
+
+    # Necesidades brutas de primer nivel: {product_id: {warehouse_id: cantidad}}
+    gross = defaultdict(lambda: defaultdict(Decimal))
+    scheduled = defaultdict(Decimal)
+    without_bom = []
+    for number, product_id, bom_id, warehouse_id, planned, produced in orders:
+        remaining = planned - produced
+        if remaining <= 0:
+            continue
+        scheduled[(product_id, warehouse_id)] += remaining
+        bom_id = bom_id or index.active.get(product_id)
+        if bom_id is None:
+            without_bom.append(number)
+            continue
+        for component_id, quantity in index.bom_lines(bom_id):
+            gross[component_id][warehouse_id] += quantity * remaining
+
+    ordered = index.topological(list(gross))
+    # Los subensambles heredan el almacén de la orden: todas las llaves posibles se conocen ya
+    warehouses = {warehouse_id for by_warehouse in gross.values() for warehouse_id in by_warehouse}
+    on_hand = stock_levels(company, {(product_id, warehouse_id) for product_id in ordered for warehouse_id in warehouses})
+
+    requirements = []
+    for product_id in ordered:
+        components = index.components(product_id)
+        for warehouse_id, quantity in sorted(gross[product_id].items()):
+            quantity = quantity.quantize(ZERO_QTY)
+            available = max(on_hand.get((product_id, warehouse_id), ZERO_QTY), ZERO_QTY)
+            receipts = scheduled.get((product_id, warehouse_id), ZERO_QTY).quantize(ZERO_QTY)
+            net = max(quantity - available - receipts, ZERO_QTY)
+            if net and components:
+                for component_id, per_unit in components:
+                    gross[component_id][warehouse_id] += per_unit * net
+            requirements.append(Requirement(
+                warehouse_id, product_id, quantity, available, receipts, net, bool(components),
+            ))
+    return MRPResult(requirements, len(orders), without_bom)
@@ -0,0 +1,155 @@
+"""
+Producción Services - Work order posting
+KoreBase ERP System
+
+Completar órdenes es un solo lote de post_movements: el consumo de todos los
+componentes de todas las órdenes y la entrada de cada producto terminado
+(costeada con lo que realmente emitió su orden) bloquean cada fila de Stock
+una sola vez, en una consulta ordenada, y se escriben con un bulk_create, sin
+importar cuántas órdenes ni cuántas líneas de BOM haya. Las operaciones por
+lote validan cada orden; con best_effort las que fallan se reportan y las
+demás se procesan.
+"""
+from typing import NamedTuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from logistica.services import ISSUED_COST, MovementLine, post_movements
+
+from . import availability
+from .models import BOMLine, WorkOrder
+
+
+class WorkOrderBatchError(ValueError):
+    """Raised when some orders of a batch cannot be processed; nothing is written."""
+
+    def __init__(self, message, failures=()):
+        super().__init__(message)
+        self.failures = list(failures)
+
+
+class BatchResult(NamedTuple):
+    """Work order numbers processed, and (number, reason) for those skipped"""
+    done: list
+    failures: list
+
+
+def completion_lines(order, bom_lines):
+    """MovementLines completing `order`: every BOM component out, then the finished good in"""
+    lines = [
+        MovementLine(
+            line.component,
+            order.warehouse,
+            'out',
+            line.quantity * order.quantity_produced,
+            f'Consumo {order.work_order_number}',
+            f'Producción de {order.product.name}',
+        )
+        for line in bom_lines
+    ]
+    lines.append(MovementLine(
+        order.product,
+        order.warehouse,
+        'in',
+        order.quantity_produced,
+        f'Entrada {order.work_order_number}',
+        'Finalización de Orden de Trabajo',
+        ISSUED_COST if lines else None,
+    ))
+    return lines
+
+
+def _post_completion(company, user, orders):
+    """Post the consumption and output of locked orders as one batch and mark them completed"""
+    bom_lines = {}
+    rows = BOMLine.objects.filter(bom_id__in={order.bom_id for order in orders if order.bom_id})
+    for line in rows.select_related('component').order_by('bom_id', 'sequence'):
+        bom_lines.setdefault(line.bom_id, []).append(line)
+
+    now = timezone.now()
+    lines = []
+    for order in orders:
+        order.quantity_produced = order.quantity_planned
+        order.completion_date = now
+        order.status = 'completed'
+        order.updated_at = now
+        lines.extend(completion_lines(order, bom_lines.get(order.bom_id, [])))
+
+    # Components may go negative (allow_negative): production is recorded as it happened
+    movements = post_movements(company, user, lines, allow_negative=True)
+    WorkOrder.objects.bulk_update(orders, ['quantity_produced', 'completion_date', 'status', 'updated_at'])
+    return movements
+
+
+def complete_work_order(company, user, order):
+    """
+    Complete `order` (locked with select_for_update, product and warehouse
+    loaded) and post its consumption and output as one batch. Returns the
+    created StockMovements.
+    """
+    return _post_completion(company, user, [order])
+
+
+def _lock(company, pks):
+    return list(
+        WorkOrder.objects.select_for_update().select_related('product', 'warehouse')
+        .filter(company=company, pk__in=pks).order_by('pk')
+    )
+
+
+def _checked(orders, pks, status, best_effort, extra_failures=None):
+    """Split locked orders into (valid, failures); raise unless best_effort"""
+    found = {order.pk for order in orders}
+    failures = [(str(pk), 'Orden no encontrada.') for pk in pks if pk not in found]
+    valid = []
+    for order in orders:
+        if order.status != status:
+            failures.append((order.work_order_number, f'Está {order.get_status_display()}.'))
+        elif extra_failures and order.pk in extra_failures:
+            failures.append((order.work_order_number, extra_failures[order.pk]))
+        else:
+            valid.append(order)
+    if failures and not best_effort:
+        raise WorkOrderBatchError(f'{len(failures)} orden(es) no se pueden procesar.', failures)
+    return valid, failures
+
+
+def release_work_orders(company, user, pks, force=False, best_effort=False):
+    """
+    Move pending orders to in_progress in one transaction.
+
+    Orders short of material (see availability) fail unless `force`. Without
+    best_effort any failure raises WorkOrderBatchError and nothing changes.
+    """
+    pks = list(dict.fromkeys(pks))
+    with transaction.atomic():
+        orders = _lock(company, pks)
+        short = {}
+        if not force:
+            pending = WorkOrder.objects.filter(pk__in=[order.pk for order in orders if order.status == 'pending'])
+            short = {
+                pk: f'Faltan {len(missing)} componente(s).'
+                for pk, missing in availability.shortages(company, pending).items()
+            }
+        valid, failures = _checked(orders, pks, 'pending', best_effort, short)
+        WorkOrder.objects.filter(pk__in=[order.pk for order in valid]).update(
+            status='in_progress', updated_at=timezone.now(),
+        )
+    return BatchResult([order.work_order_number for order in valid], failures)
+
+
+def complete_work_orders(company, user, pks, best_effort=False):
+    """
+    Complete in-progress orders in one transaction and one posting batch.
+
+    Consumption is aggregated across every order, so each Stock row is
+    locked and updated once. Without best_effort any failure raises
+    WorkOrderBatchError and nothing is posted.
+    """
+    pks = list(dict.fromkeys(pks))
+    with transaction.atomic():
+        valid, failures = _checked(_lock(company, pks), pks, 'in_progress', best_effort)
+        if valid:
+            _post_completion(company, user, valid)
+    return BatchResult([order.work_order_number for order in valid], failures)
@@ -0,0 +1,40 @@
+"""
+Producción Signals
+KoreBase ERP System
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from logistica.models import Product
+from logistica.signals import unit_costs_changed
+
+from . import costs
+from .models import BillOfMaterial, BOMLine
+
+
+@receiver(post_save, sender=Product)
+def refresh_costs_using_product(sender, instance, created, **kwargs):
+    # Lo guardado antes del save lo toma logistica.signals.remember_valuation_fields
+    before = getattr(instance, '_valuation_before', None)
+    if created or before is None or instance.company_id is None:
+        return
+    if before[0] != instance.unit_cost:
+        costs.schedule(instance.company_id, product_ids=[instance.pk])
+
+
+@receiver(unit_costs_changed)
+def refresh_costs_of_imported_products(sender, company_id, product_ids, **kwargs):
+    costs.schedule(company_id, product_ids=product_ids)
+
+
+@receiver(post_save, sender=BillOfMaterial)
+@receiver(post_delete, sender=BillOfMaterial)
+def refresh_costs_of_bom(sender, instance, **kwargs):
+    # version/active deciden qué BOM costea al producto en las BOMs que lo usan
+    costs.schedule(instance.company_id, bom_ids=[instance.pk], product_ids=[instance.product_id])
+
+
+@receiver(post_save, sender=BOMLine)
+@receiver(post_delete, sender=BOMLine)
+def refresh_costs_of_line(sender, instance, **kwargs):
+    costs.schedule(instance.bom.company_id, bom_ids=[instance.bom_id])
@@ -1,3 +1,298 @@
+import io
+from decimal import Decimal
+
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from core.middleware import tenant_context
+from core.models import Company, CustomUser
+from logistica.models import Product, Stock, StockMovement, Warehouse
+from logistica.product_import import import_products
+from logistica.services import MovementLine, post_movements
+
+from . import availability, costs, mrp, services
+from .models import BillOfMaterial, BOMLine, WorkOrder
+
+
+class ProductionTestCase(TestCase):
+    """Empresa, usuario y almacén comunes; helpers para productos, BOMs y órdenes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Production Test')
+        cls.user = CustomUser.objects.create_user(username='planner', password='x', company=cls.company)
+        with tenant_context(cls.company):
+            cls.warehouse = Warehouse.objects.create(company=cls.company, name='Planta', code='PLT')
+
+    def setUp(self):
+        self.enterContext(tenant_context(self.company))
+
+    def product(self, sku, unit_cost='0', product_type='raw'):
+        return Product.objects.create(
+            company=self.company, sku=sku, name=sku, category='Producción',
+            product_type=product_type, unit_cost=Decimal(unit_cost),
+        )
+
+    def bom(self, product, lines, version=1, active=True):
+        bom = BillOfMaterial.objects.create(
+            company=self.company, product=product, version=version, active=active, created_by=self.user,
+        )
+        for sequence, (component, quantity) in enumerate(lines):
+            BOMLine.objects.create(bom=bom, component=component, quantity=Decimal(quantity), sequence=sequence)
+        return bom
+
+    def order(self, number, product, quantity, bom=None, status='pending', produced='0'):
+        return WorkOrder.objects.create(
+            company=self.company, work_order_number=number, product=product, bom=bom,
+            quantity_planned=Decimal(quantity), quantity_produced=Decimal(produced), status=status,
+            warehouse=self.warehouse, start_date=timezone.now(), created_by=self.user,
+        )
+
+    def receive(self, product, quantity, unit_cost=None):
+        post_movements(self.company, self.user, [
+            MovementLine(product, self.warehouse, 'in', Decimal(quantity), unit_cost=unit_cost),
+        ])
+
+
+class MRPExplosionTests(ProductionTestCase):
+    """Explosión multinivel: neta contra existencias y lo pendiente de las órdenes abiertas"""
+
+    def requirements(self):
+        return {requirement.product_id: requirement for requirement in mrp.run(self.company).requirements}
+
+    def test_open_subassembly_orders_are_scheduled_receipts(self):
+        a, b = self.product('A'), self.product('B')
+        sub = self.product('SUB', product_type='component')
+        fin = self.product('FIN', product_type='finished')
+        sub_bom = self.bom(sub, [(a, '1.1'), (b, '0.4')])
+        fin_bom = self.bom(fin, [(sub, '2'), (a, '0.5')])
+        self.order('WO1', fin, '5', bom=fin_bom)
+        self.order('WO2', sub, '4', bom=sub_bom, status='in_progress', produced='1')
+        self.receive(sub, '2')
+        self.receive(a, '3')
+
+        found = self.requirements()
+        # SUB: 10 brutos - 2 en existencia - 3 pendientes de WO2 = 5 a fabricar
+        self.assertEqual(
+            (found[sub.pk].gross, found[sub.pk].on_hand, found[sub.pk].scheduled, found[sub.pk].net),
+            (Decimal('10.000'), Decimal('2.000'), Decimal('3.000'), Decimal('5.000')),
+        )
+        self.assertTrue(found[sub.pk].make)
+        self.assertEqual(found[sub.pk].shortage, Decimal('0'))
+        # A: 0.5 × 5 (WO1) + 1.1 × 3 (WO2) + 1.1 × 5 (SUB neto) = 11.3; B: 0.4 × 3 + 0.4 × 5 = 3.2
+        self.assertEqual((found[a.pk].gross, found[a.pk].net), (Decimal('11.300'), Decimal('8.300')))
+        self.assertEqual((found[b.pk].gross, found[b.pk].shortage), (Decimal('3.200'), Decimal('3.200')))
+
+    def test_orders_without_bom_are_reported(self):
+        loose = self.product('LOOSE', product_type='finished')
+        self.order('WO9', loose, '1')
+        result = mrp.run(self.company)
+        self.assertEqual(result.orders_without_bom, ['WO9'])
+        self.assertEqual(result.requirements, [])
+
+    def test_cycle_raises(self):
+        x, y = self.product('X', product_type='component'), self.product('Y', product_type='component')
+        top = self.product('TOP', product_type='finished')
+        self.bom(x, [(y, '1')])
+        self.bom(y, [(x, '1')])
+        self.order('WO3', top, '1', bom=self.bom(top, [(x, '1')]))
+        with self.assertRaises(mrp.MRPError) as raised:
+            mrp.run(self.company)
+        self.assertEqual(sorted(raised.exception.product_ids), sorted([x.pk, y.pk]))
+
+
+class WorkOrderCompletionTests(ProductionTestCase):
+    """Completar órdenes es un solo lote: el terminado entra al costo de lo que realmente se emitió"""
+
+    def setUp(self):
+        super().setUp()
+        self.a, self.b = self.product('A', '2.00'), self.product('B', '0.50')
+        self.fin = self.product('FIN', '99.00', product_type='finished')
+        self.fin_bom = self.bom(self.fin, [(self.a, '1.5'), (self.b, '2')])
+        self.receive(self.a, '10', Decimal('2.00'))
+        self.receive(self.b, '10', Decimal('0.50'))
+
+    def stock(self, product):
+        return Stock.objects.get(product=product, warehouse=self.warehouse).quantity
+
+    def test_finished_good_costed_from_goods_issued(self):
+        order = self.order('WO1', self.fin, '2', bom=self.fin_bom, status='in_progress')
+        result = services.complete_work_orders(self.company, self.user, [order.pk])
+        self.assertEqual((result.done, result.failures), (['WO1'], []))
+
+        # 3 A × 2.00 + 4 B × 0.50 = 8.00 por 2 piezas
+        receipt = StockMovement.objects.get(product=self.fin, reference='Entrada WO1')
+        self.assertEqual(receipt.unit_cost_at_movement, Decimal('4.00'))
+        self.assertEqual((self.stock(self.a), self.stock(self.b), self.stock(self.fin)), (Decimal('7'), Decimal('6'), Decimal('2')))
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.quantity_produced), ('completed', Decimal('2.000')))
+        self.assertIsNotNone(order.completion_date)
+
+    def test_batch_aggregates_consumption_across_orders(self):
+        first = self.order('WO1', self.fin, '2', bom=self.fin_bom, status='in_progress')
+        second = self.order('WO2', self.fin, '1', bom=self.fin_bom, status='in_progress')
+        services.complete_work_orders(self.company, self.user, [first.pk, second.pk])
+
+        self.assertEqual(self.stock(self.a), Decimal('5.5'))
+        self.assertEqual(self.stock(self.fin), Decimal('3'))
+        receipts = StockMovement.objects.filter(product=self.fin).order_by('reference')
+        self.assertEqual([movement.unit_cost_at_movement for movement in receipts], [Decimal('4.00'), Decimal('4.00')])
+
+    def test_components_may_go_negative(self):
+        order = self.order('WO1', self.fin, '10', bom=self.fin_bom, status='in_progress')
+        services.complete_work_orders(self.company, self.user, [order.pk])
+        self.assertEqual(self.stock(self.a), Decimal('-5'))
+
+
+class AvailabilityTests(ProductionTestCase):
+    """Revisión de material antes de liberar: BOM × cantidad planificada contra el almacén de la orden"""
+
+    def setUp(self):
+        super().setUp()
+        self.a, self.b = self.product('A'), self.product('B')
+        self.fin = self.product('FIN', product_type='finished')
+        self.fin_bom = self.bom(self.fin, [(self.a, '1.5'), (self.b, '2')])
+        self.receive(self.a, '10')
+        self.receive(self.b, '5')
+
+    def test_each_order_is_checked_against_full_stock(self):
+        small = self.order('WO1', self.fin, '2', bom=self.fin_bom)
+        large = self.order('WO2', self.fin, '4', bom=self.fin_bom)
+        self.order('WO3', self.fin, '1')
+
+        found = availability.shortages(self.company, WorkOrder.objects.all())
+        # WO1 pide 3 A y 4 B; WO2 pide 6 A y 8 B: solo falta B en WO2, sin descontar lo de WO1
+        self.assertEqual(list(found), [large.pk])
+        self.assertEqual(found[large.pk], [availability.Shortage(self.b.pk, Decimal('8.000'), Decimal('5.000'))])
+        self.assertEqual(found[large.pk][0].missing, Decimal('3.000'))
+        self.assertEqual(availability.order_shortages(self.company, small), [])
+
+    def test_missing_stock_row_counts_as_zero(self):
+        c = self.product('C')
+        order = self.order('WO1', self.fin, '1', bom=self.bom(self.fin, [(c, '1')], version=2))
+        self.assertEqual(
+            availability.order_shortages(self.company, order),
+            [availability.Shortage(c.pk, Decimal('1.000'), Decimal('0.000'))],
+        )
+
+    def test_release_refuses_short_orders_unless_forced(self):
+        order = self.order('WO1', self.fin, '4', bom=self.fin_bom)
+        with self.assertRaises(services.WorkOrderBatchError) as raised:
+            services.release_work_orders(self.company, self.user, [order.pk])
+        self.assertEqual(raised.exception.failures, [('WO1', 'Faltan 1 componente(s).')])
+
+        services.release_work_orders(self.company, self.user, [order.pk], force=True)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'in_progress')
+
+
+class BulkWorkOrderTests(ProductionTestCase):
+    """Liberar y completar por lote: best-effort reporta y sigue; sin él, todo o nada"""
+
+    def setUp(self):
+        super().setUp()
+        self.a = self.product('A', '1.00')
+        self.fin = self.product('FIN', product_type='finished')
+        self.fin_bom = self.bom(self.fin, [(self.a, '1')])
+        self.receive(self.a, '10', Decimal('1.00'))
+
+    def statuses(self):
+        return dict(WorkOrder.objects.values_list('work_order_number', 'status'))
+
+    def test_release_best_effort_reports_failures(self):
+        ready = self.order('WO1', self.fin, '5', bom=self.fin_bom)
+        done = self.order('WO2', self.fin, '1', bom=self.fin_bom, status='completed')
+        result = services.release_work_orders(self.company, self.user, [ready.pk, done.pk, 999999], best_effort=True)
+
+        self.assertEqual(result.done, ['WO1'])
+        self.assertEqual(result.failures, [('999999', 'Orden no encontrada.'), ('WO2', 'Está Completada.')])
+        self.assertEqual(self.statuses(), {'WO1': 'in_progress', 'WO2': 'completed'})
+
+    def test_release_all_or_nothing(self):
+        ready = self.order('WO1', self.fin, '5', bom=self.fin_bom)
+        short = self.order('WO2', self.fin, '50', bom=self.fin_bom)
+        with self.assertRaises(services.WorkOrderBatchError) as raised:
+            services.release_work_orders(self.company, self.user, [ready.pk, short.pk])
+        self.assertEqual(raised.exception.failures, [('WO2', 'Faltan 1 componente(s).')])
+        self.assertEqual(self.statuses(), {'WO1': 'pending', 'WO2': 'pending'})
+
+    def test_complete_best_effort_posts_valid_orders(self):
+        running = self.order('WO1', self.fin, '3', bom=self.fin_bom, status='in_progress')
+        pending = self.order('WO2', self.fin, '2', bom=self.fin_bom)
+        result = services.complete_work_orders(self.company, self.user, [running.pk, pending.pk], best_effort=True)
+
+        self.assertEqual((result.done, result.failures), (['WO1'], [('WO2', 'Está Pendiente.')]))
+        self.assertEqual(self.statuses(), {'WO1': 'completed', 'WO2': 'pending'})
+        self.assertEqual(Stock.objects.get(product=self.a).quantity, Decimal('7'))
+
+    def test_complete_all_or_nothing_posts_nothing(self):
+        running = self.order('WO1', self.fin, '3', bom=self.fin_bom, status='in_progress')
+        pending = self.order('WO2', self.fin, '2', bom=self.fin_bom)
+        movements = StockMovement.objects.count()
+        with self.assertRaises(services.WorkOrderBatchError):
+            services.complete_work_orders(self.company, self.user, [running.pk, pending.pk])
+
+        self.assertEqual(self.statuses(), {'WO1': 'in_progress', 'WO2': 'pending'})
+        self.assertEqual(StockMovement.objects.count(), movements)
+        self.assertEqual(Stock.objects.get(product=self.a).quantity, Decimal('10'))
+
+
+class CostRollupTests(ProductionTestCase):
+    """El costo estándar se recalcula al confirmar, solo en las BOMs que usan lo que cambió"""
+
+    def setUp(self):
+        super().setUp()
+        self.a, self.b = self.product('A', '2.00'), self.product('B', '1.00')
+        self.sub = self.product('SUB', product_type='component')
+        self.fin = self.product('FIN', product_type='finished')
+        self.other = self.product('OTHER', product_type='finished')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sub_bom = self.bom(self.sub, [(self.a, '2')])
+            self.fin_bom = self.bom(self.fin, [(self.sub, '3'), (self.a, '1')])
+            self.other_bom = self.bom(self.other, [(self.b, '4')])
+
+    def rolled(self, *boms):
+        return [BillOfMaterial.objects.get(pk=bom.pk).rolled_up_cost for bom in boms]
+
+    def set_cost(self, product, unit_cost):
+        product.unit_cost = Decimal(unit_cost)
+        product.save()
+
+    def test_new_boms_roll_up_every_level(self):
+        self.assertEqual(self.rolled(self.sub_bom, self.fin_bom, self.other_bom), [Decimal('4'), Decimal('14'), Decimal('4')])
+
+        BillOfMaterial.objects.update(rolled_up_cost=None)
+        self.assertEqual(costs.rebuild(self.company), 3)
+        self.assertEqual(self.rolled(self.sub_bom, self.fin_bom, self.other_bom), [Decimal('4'), Decimal('14'), Decimal('4')])
+
+    def test_unit_cost_change_refreshes_bom_that_use_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.set_cost(self.a, '3.00')
+        # SUB = 2 × 3; FIN = 3 × 6 + 3
+        self.assertEqual(self.rolled(self.sub_bom, self.fin_bom), [Decimal('6'), Decimal('21')])
+
+    def test_bom_line_change_refreshes_parents(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BOMLine.objects.create(bom=self.sub_bom, component=self.b, quantity=Decimal('1'), sequence=1)
+        self.assertEqual(self.rolled(self.sub_bom, self.fin_bom), [Decimal('5'), Decimal('17')])
+
+    def test_rolled_back_changes_are_not_refreshed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.set_cost(self.a, '3.00')
+                BillOfMaterial.objects.filter(pk=self.sub_bom.pk).update(rolled_up_cost=None)
+                Product.objects.filter(pk=self.a.pk).update(unit_cost=Decimal('9.00'))
+                raise RuntimeError
+            # La cola del rollback no debe colarse en el lote de la siguiente transacción
+            Product.objects.filter(pk=self.a.pk).update(unit_cost=Decimal('5.00'))
+            self.set_cost(self.b, '2.00')
+
+        self.assertEqual(self.rolled(self.sub_bom, self.fin_bom, self.other_bom), [Decimal('4'), Decimal('14'), Decimal('8')])
 
-# Create your tests here.
+    def test_import_schedules_refresh_for_changed_costs(self):
+        file = io.BytesIO('sku,unit_cost,name\nA,3.00,A\nB,1.00,Otro nombre\n'.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_products(self.company, self.user, file, 'productos.csv')
+        self.assertEqual((result.updated, result.errors), (2, []))
+        self.assertEqual(self.rolled(self.sub_bom, self.fin_bom, self.other_bom), [Decimal('6'), Decimal('21'), Decimal('4')])
@@ -15,8 +15,12 @@ urlpatterns = [
 
     # Work Orders
     path('orders/', views.workorder_list, name='workorder_list'),
+    path('orders/bulk/', views.workorder_bulk, name='workorder_bulk'),
     path('order/create/', views.workorder_create, name='workorder_create'),
     path('order/<int:pk>/', views.workorder_detail, name='workorder_detail'),
     path('order/<int:pk>/edit/', views.workorder_edit, name='workorder_edit'),
     path('order/<int:pk>/status/', views.workorder_status, name='workorder_status'),
+
+    # MRP
+    path('mrp/', views.mrp_run, name='mrp_run'),
 ]
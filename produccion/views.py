@@ -9,6 +9,7 @@ from django.db import transaction
 from django.db.models import Q, Count
 from core.views import require_can_write
 
+from . import availability, costs, mrp, services
 from .models import BillOfMaterial, BOMLine, WorkOrder
 from .forms import BillOfMaterialForm, BOMLineFormSet, WorkOrderForm
 from logistica.models import Product, Warehouse
@@ -31,6 +32,11 @@ def index(request):
     # Recent work orders
     recent_orders = WorkOrder.objects.select_related('product', 'warehouse').order_by('-created_at')[:5]
 
+    # Pending orders that cannot be released yet (one grouped query for all of them)
+    company = request.user.company
+    short = availability.shortages(company, WorkOrder.objects.filter(status='pending'))
+    blocked_orders = WorkOrder.objects.filter(pk__in=short).select_related('product').order_by('start_date')
+
     context = {
         'total_boms': total_boms,
         'total_work_orders': total_work_orders,
@@ -39,6 +45,7 @@ def index(request):
         'pending_orders': pending_orders,
         'in_progress_orders': in_progress_orders,
         'recent_orders': recent_orders,
+        'blocked_orders': [(order, len(short[order.pk])) for order in blocked_orders],
     }
     return render(request, 'produccion/index.html', context)
 
@@ -138,12 +145,19 @@ def bom_edit(request, pk):
 @login_required
 def bom_detail(request, pk):
     """View a BOM with all component lines"""
-    bom = get_object_or_404(BillOfMaterial, pk=pk)
-    lines = bom.lines.select_related('component').order_by('sequence')
+    bom = get_object_or_404(BillOfMaterial.objects.select_related('product', 'created_by'), pk=pk)
+    lines = list(bom.lines.select_related('component').order_by('sequence'))
+
+    # Costo vigente de cada componente: acumulado de su BOM activa o unit_cost (dos consultas)
+    component_costs = costs.component_costs(request.user.company, {line.component_id for line in lines})
+    rows = []
+    for line in lines:
+        unit_cost, subassembly = component_costs[line.component_id]
+        rows.append((line, unit_cost, line.quantity * unit_cost, subassembly))
 
     context = {
         'bom': bom,
-        'lines': lines,
+        'lines': rows,
     }
     return render(request, 'produccion/bom_detail.html', context)
 
@@ -192,6 +206,13 @@ def workorder_create(request):
             order.company = company  # Multi-Tenant
             order.save()
             messages.success(request, f'Orden "{order.work_order_number}" creada exitosamente.')
+            missing = availability.order_shortages(company, order)
+            if missing:
+                messages.warning(
+                    request,
+                    f'{len(missing)} componente(s) sin existencia suficiente en {order.warehouse.name}; '
+                    'la orden no podrá iniciarse hasta reabastecerlos.'
+                )
             return redirect('produccion:workorder_detail', pk=order.pk)
     else:
         form = WorkOrderForm(product_qs=product_qs, warehouse_qs=warehouse_qs, bom_qs=bom_qs)
@@ -238,9 +259,17 @@ def workorder_detail(request, pk):
     if order.bom:
         bom_lines = order.bom.lines.select_related('component').order_by('sequence')
 
+    # Faltantes de material solo mientras la orden no ha consumido
+    shortages = []
+    if order.status in ('pending', 'in_progress'):
+        shortages = availability.order_shortages(request.user.company, order)
+        components = Product.objects.in_bulk([shortage.component_id for shortage in shortages])
+        shortages = [(components[shortage.component_id], shortage) for shortage in shortages]
+
     context = {
         'order': order,
         'bom_lines': bom_lines,
+        'shortages': shortages,
     }
     return render(request, 'produccion/workorder_detail.html', context)
 
@@ -270,69 +299,27 @@ def workorder_status(request, pk):
             )
             return redirect('produccion:workorder_detail', pk=pk)
 
-        # If completing, update quantity_produced and manage inventory
+        # Release: block while components are missing, unless explicitly forced
+        if new_status == 'in_progress' and request.POST.get('force') != '1':
+            missing = availability.order_shortages(request.user.company, order)
+            if missing:
+                messages.error(
+                    request,
+                    f'No se puede iniciar "{order.work_order_number}": faltan {len(missing)} componente(s) '
+                    'en el almacén. Reabastezca o inicie con faltantes.'
+                )
+                return redirect('produccion:workorder_detail', pk=pk)
+
         if new_status == 'completed':
-            from django.utils import timezone
-            from logistica.models import Stock, StockMovement
-            from decimal import Decimal
-            
             # Lock the order to prevent double-completion
-            order = WorkOrder.objects.select_for_update().get(pk=order.pk)
-            
-            order.quantity_produced = order.quantity_planned
-            order.completion_date = timezone.now()
-            
-            # 1. Deduct components from stock
-            if order.bom:
-                for line in order.bom.lines.all():
-                    qty_to_deduct = line.quantity * order.quantity_produced
-                    stock_comp, _ = Stock.objects.select_for_update().get_or_create(
-                        company=order.company,
-                        product=line.component,
-                        warehouse=order.warehouse,
-                        defaults={'quantity': Decimal('0.000')}
-                    )
-                    stock_comp.quantity -= qty_to_deduct
-                    stock_comp.save()
-                    
-                    StockMovement.objects.create(
-                        company=order.company,
-                        product=line.component,
-                        warehouse=order.warehouse,
-                        quantity_change=-qty_to_deduct,
-                        movement_type='out',
-                        reference=f'Consumo {order.work_order_number}',
-                        notes=f'Producción de {order.product.name}',
-                        user=request.user,
-                        unit_cost_at_movement=line.component.unit_cost,
-                        running_balance=stock_comp.quantity
-                    )
-            
-            # 2. Add finished product to stock
-            stock_final, _ = Stock.objects.select_for_update().get_or_create(
-                company=order.company,
-                product=order.product,
-                warehouse=order.warehouse,
-                defaults={'quantity': Decimal('0.000')}
-            )
-            stock_final.quantity += order.quantity_produced
-            stock_final.save()
-            
-            StockMovement.objects.create(
-                company=order.company,
-                product=order.product,
-                warehouse=order.warehouse,
-                quantity_change=order.quantity_produced,
-                movement_type='in',
-                reference=f'Entrada {order.work_order_number}',
-                notes=f'Finalización de Orden de Trabajo',
-                user=request.user,
-                unit_cost_at_movement=order.product.unit_cost,
-                running_balance=stock_final.quantity
-            )
-
-        order.status = new_status
-        order.save()
+            order = WorkOrder.objects.select_for_update().select_related('product', 'warehouse').get(pk=order.pk)
+            if order.status != 'in_progress':
+                messages.error(request, f'La orden "{order.work_order_number}" ya no está En Proceso.')
+                return redirect('produccion:workorder_detail', pk=pk)
+            services.complete_work_order(request.user.company, request.user, order)
+        else:
+            order.status = new_status
+            order.save()
 
         status_labels = dict(WorkOrder.STATUS_CHOICES)
         messages.success(
@@ -341,3 +328,88 @@ def workorder_status(request, pk):
         )
 
     return redirect('produccion:workorder_detail', pk=pk)
+
+
+@login_required
+@require_can_write
+def workorder_bulk(request):
+    """Release or complete the selected work orders in one batch (POST)"""
+    if request.method != 'POST':
+        return redirect('produccion:workorder_list')
+
+    action = request.POST.get('action')
+    pks = [int(pk) for pk in request.POST.getlist('orders') if pk.isdigit()]
+    best_effort = request.POST.get('best_effort') == '1'
+    if action not in ('release', 'complete') or not pks:
+        messages.error(request, 'Seleccione al menos una orden y una acción.')
+        return redirect('produccion:workorder_list')
+
+    try:
+        if action == 'release':
+            result = services.release_work_orders(request.user.company, request.user, pks, best_effort=best_effort)
+        else:
+            result = services.complete_work_orders(request.user.company, request.user, pks, best_effort=best_effort)
+    except services.WorkOrderBatchError as exc:
+        details = '; '.join(f'{number}: {reason}' for number, reason in exc.failures)
+        messages.error(request, f'{exc} No se aplicó ningún cambio. {details}')
+        return redirect('produccion:workorder_list')
+
+    label = 'iniciada(s)' if action == 'release' else 'completada(s)'
+    if result.done:
+        messages.success(request, f'{len(result.done)} orden(es) {label}: {", ".join(result.done)}.')
+    if result.failures:
+        details = '; '.join(f'{number}: {reason}' for number, reason in result.failures)
+        messages.warning(request, f'{len(result.failures)} orden(es) omitida(s). {details}')
+    return redirect('produccion:workorder_list')
+
+
+# ==================== MRP ====================
+
+@login_required
+def mrp_run(request):
+    """Net requirements of all open work orders, exploded through multi-level BOMs, per warehouse"""
+    company = request.user.company
+    warehouses = Warehouse.objects.filter(company=company).order_by('name')
+    warehouse = None
+    warehouse_id = request.GET.get('warehouse')
+    if warehouse_id and warehouse_id.isdigit():
+        warehouse = warehouses.filter(pk=warehouse_id).first()
+    shortages_only = request.GET.get('shortages') == '1'
+
+    try:
+        result = mrp.run(company, warehouse=warehouse)
+    except mrp.MRPError as exc:
+        cycle = Product.objects.filter(pk__in=exc.product_ids).order_by('sku').values_list('sku', flat=True)
+        messages.error(request, f'{exc} Productos: {", ".join(cycle)}.')
+        result = mrp.MRPResult([], 0, [])
+
+    requirements = [
+        requirement for requirement in result.requirements
+        if not shortages_only or requirement.shortage
+    ]
+    products = Product.objects.in_bulk({requirement.product_id for requirement in requirements})
+    names = dict(warehouses.values_list('pk', 'name'))
+    by_warehouse = {}
+    for requirement in requirements:
+        by_warehouse.setdefault(requirement.warehouse_id, []).append({
+            'product': products[requirement.product_id],
+            'requirement': requirement,
+        })
+    groups = [
+        {
+            'warehouse': names.get(warehouse_id, warehouse_id),
+            'rows': sorted(rows, key=lambda row: row['product'].sku),
+            'shortage_count': sum(1 for row in rows if row['requirement'].shortage),
+        }
+        for warehouse_id, rows in sorted(by_warehouse.items(), key=lambda item: names.get(item[0], ''))
+    ]
+
+    return render(request, 'produccion/mrp.html', {
+        'groups': groups,
+        'warehouses': warehouses,
+        'current_warehouse': warehouse.pk if warehouse else '',
+        'shortages_only': shortages_only,
+        'order_count': result.order_count,
+        'orders_without_bom': result.orders_without_bom,
+        'shortage_count': sum(group['shortage_count'] for group in groups),
+    })